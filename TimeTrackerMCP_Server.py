@@ -1,7 +1,16 @@
+import asyncio
+import base64
+import contextlib
+import functools
+import hashlib
+import inspect
 import json
 import os
 import sys
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
 
 # Attempt to import the MCP SDK. This is the standard library for building
 # Model Context Protocol servers in Python.
@@ -21,11 +30,11 @@ from datetime import datetime
 # system Python that Claude Desktop's stdio config points at directly - not
 # just the one this repo happens to pin at any given time.
 try:
-    from mcp.server.fastmcp import FastMCP as _MCPServerClass
+    from mcp.server.fastmcp import FastMCP as _MCPServerClass, Context as _RequestContext
     MCP_MAJOR_VERSION = 1
 except ImportError:
     try:
-        from mcp.server.mcpserver import MCPServer as _MCPServerClass
+        from mcp.server.mcpserver import MCPServer as _MCPServerClass, Context as _RequestContext
         MCP_MAJOR_VERSION = 2
     except ImportError:
         print("Error: The required library is not installed.", file=sys.stderr)
@@ -48,7 +57,7 @@ sys.path.append(SCRIPT_DIR)
 os.chdir(SCRIPT_DIR)
 
 try:
-    from tt.TimeTracker import TimeTracker
+    from tt.TimeTracker import TimeTracker, file_stamp
 except ImportError as e:
     print(f"Error importing TimeTracker: {e}", file=sys.stderr)
     sys.exit(1)
@@ -80,10 +89,20 @@ _MCP_HOST = '127.0.0.1'
 _MCP_PORT = _config.get('mcp_port', 8700)
 _MCP_STREAMABLE_HTTP_PATH = '/mcp'
 
+
+
+@contextlib.asynccontextmanager
+async def _lifespan(server):
+    """Starts the watcher behind the resource update notifications (see Resources below)."""
+    _ensure_data_file_watcher()
+    yield {}
+
+
 if MCP_MAJOR_VERSION == 1:
-    mcp = _MCPServerClass("TimeControl", host=_MCP_HOST, port=_MCP_PORT, streamable_http_path=_MCP_STREAMABLE_HTTP_PATH)
+    mcp = _MCPServerClass("TimeControl", host=_MCP_HOST, port=_MCP_PORT, streamable_http_path=_MCP_STREAMABLE_HTTP_PATH,
+                          lifespan=_lifespan)
 else:
-    mcp = _MCPServerClass("TimeControl")
+    mcp = _MCPServerClass("TimeControl", lifespan=_lifespan)
 
 # stdio uses stdout as the JSON-RPC message channel itself, so nothing else
 # may write to it - unlike the HTTP transport, where stray console output is
@@ -93,16 +112,37 @@ else:
 _STDIO_MODE = _config.get('mcp_transport', 'http') == 'stdio'
 
 
+# The one TimeTracker this server works with, and file_stamp() of
+# config.json as it was when that instance was built. See get_tracker.
+_tracker = None
+_tracker_config_stamp = None
+
+
 def get_tracker():
     """
-    Returns a freshly loaded TimeTracker instance.
-
-    A new instance is created for every call instead of reusing one for the
-    whole server process, so this always sees the latest state on disk -
-    including changes made concurrently through the GUI or the SOAP
-    interface - and so its own changes are picked up by them immediately too.
+    Returns the server's TimeTracker, up to date with the data file on disk.
+
+    One instance is kept for the whole server process. Building a new one
+    for every call would parse and migrate the whole data file each time,
+    which for a long-running client session is most of what a tool call
+    costs. Instead, a cheap check (see TimeTracker.reload_if_changed) tells
+    whether the GUI, the SOAP interface or anything else has written the
+    file since this instance last read or saved it, and only then is it
+    re-read. Changes made here are on disk as soon as the tool returns, as
+    before.
+
+    config.json is checked the same way: if it changed - sync switched on,
+    a different data file - a new instance is built, which is what the old
+    per-call instance did implicitly.
     """
-    return TimeTracker()
+    global _tracker, _tracker_config_stamp
+    config_stamp = file_stamp(CONFIG_FILE)
+    if _tracker is None or config_stamp != _tracker_config_stamp:
+        _tracker = TimeTracker()
+        _tracker_config_stamp = config_stamp
+    else:
+        _tracker.reload_if_changed()
+    return _tracker
 
 
 def _call_protecting_stdio(fn, *args, **kwargs):
@@ -135,9 +175,229 @@ def parse_date(date_str, param_name):
         return None, f"Error: {param_name} must be in YYYY-MM-DD format."
 
 
+# --- Running tools off the event loop ---
+#
+# mcp 1 calls a plain function tool right on its event loop, and mcp 2 on a
+# thread of its own choosing. Under the first, an IMAP fetch or a long
+# report holds up every other request on the streamable-http transport;
+# under the second, two calls can use the one TimeTracker (see get_tracker)
+# at the same time. So every tool is registered through _tool() instead of
+# mcp.tool(): it runs on a small pool of worker threads, one at a time
+# where the tracker is concerned, within a time limit. The event loop stays
+# free for the protocol, resources and notifications meanwhile.
+#
+# A call that runs out of time, or that the client cancels, is told so
+# right away. Its thread cannot be stopped from outside, so what it does
+# afterwards must not count: a tool runs inside one tracker.batch(), and one
+# given up on by then is rolled back instead of saved - as is one that was
+# still waiting for the tracker. A tool that can stop early checks
+# _current_job().cancelled as well.
+#
+# fetch_emails_to_tasks is the one tool that does not hold the tracker
+# throughout. Nearly all of its time is spent waiting on the mail server,
+# and every other call would queue behind that; it takes the tracker only
+# to file each email (see _add_email_task).
+
+_TOOL_WORKERS = 4
+_DEFAULT_TOOL_TIMEOUT = 60
+_tool_executor = ThreadPoolExecutor(max_workers=_TOOL_WORKERS, thread_name_prefix="timecontrol-mcp")
+# Held by whatever uses the TimeTracker from a worker thread.
+_tracker_lock = threading.RLock()
+_job_local = threading.local()
+
+
+class _Job:
+    """What a tool running on a worker thread can see of the request it serves."""
+
+    def __init__(self, loop, ctx):
+        self.cancelled = threading.Event()
+        self._loop = loop
+        self._ctx = ctx
+
+    def report_progress(self, done, total=None):
+        """Sends a progress notification, if the client asked for them."""
+        if self._ctx is None or self.cancelled.is_set():
+            return
+        asyncio.run_coroutine_threadsafe(self._ctx.report_progress(done, total), self._loop)
+
+
+def _current_job():
+    """The _Job of the tool call this worker thread runs, or None outside one."""
+    return getattr(_job_local, "job", None)
+
+
+def _forget_tracker():
+    """
+    Drops the kept TimeTracker, so the next get_tracker() builds it afresh
+    from the data file.
+
+    For a tool that raised part way through. Its changes may be in memory
+    and not on disk, and nothing would ever notice: the file has not moved,
+    so reload_if_changed() sees no reason to re-read it, and the next tool
+    that saves would write the half-done change out with its own.
+    """
+    global _tracker
+    _tracker = None
+
+
+class _Abandoned(Exception):
+    """Rolls back the batch of a call its caller has stopped waiting for."""
+
+
+def _run_locked(job, fn, args, kwargs):
+    _job_local.job = job
+    try:
+        with _tracker_lock:
+            if job.cancelled.is_set():
+                return None
+            try:
+                with get_tracker().batch():
+                    result = fn(*args, **kwargs)
+                    if job.cancelled.is_set():
+                        raise _Abandoned()
+                return result
+            except _Abandoned:
+                return None
+            except BaseException:
+                _forget_tracker()
+                raise
+    finally:
+        _job_local.job = None
+
+
+def _run_unlocked(job, fn, args, kwargs):
+    _job_local.job = job
+    try:
+        return fn(*args, **kwargs)
+    finally:
+        _job_local.job = None
+
+
+async def _run_off_loop(fn, args=(), kwargs=None, timeout=_DEFAULT_TOOL_TIMEOUT, ctx=None, locked=True):
+    """
+    Runs fn on the worker pool and waits up to `timeout` seconds for it -
+    under _tracker_lock and inside one batch unless `locked` is False.
+    """
+    loop = asyncio.get_running_loop()
+    job = _Job(loop, ctx)
+    run = _run_locked if locked else _run_unlocked
+    future = loop.run_in_executor(_tool_executor, run, job, fn, args, kwargs or {})
+    try:
+        return await asyncio.wait_for(future, timeout)
+    except asyncio.TimeoutError:
+        job.cancelled.set()
+        raise TimeoutError(f"{fn.__name__} did not finish within {timeout} seconds.") from None
+    except asyncio.CancelledError:
+        job.cancelled.set()
+        raise
+
+
+def _tool(timeout=_DEFAULT_TOOL_TIMEOUT, locked=True):
+    """
+    Registers the decorated function as a tool, like mcp.tool(), but run
+    through _run_off_loop (see above). The function itself is returned
+    unchanged, so calling it directly still runs it right there.
+    """
+    def register(fn):
+        @functools.wraps(fn)
+        async def run(*args, ctx=None, **kwargs):
+            return await _run_off_loop(fn, args, kwargs, timeout, ctx, locked)
+
+        # The SDK reads the tool's parameters off its signature, and hands
+        # the request context to the parameter annotated with its Context
+        # class - used for progress notifications.
+        signature = inspect.signature(fn)
+        ctx_param = inspect.Parameter("ctx", inspect.Parameter.KEYWORD_ONLY, default=None,
+                                      annotation=_RequestContext)
+        run.__signature__ = signature.replace(parameters=[*signature.parameters.values(), ctx_param])
+        run.__annotations__ = {**fn.__annotations__, "ctx": _RequestContext}
+        mcp.tool()(run)
+        return fn
+    return register
+
+
+# --- Paging ---
+#
+# On a large data file, list_tasks, list_inactive_tasks and
+# generate_date_range_report can return more than fits into a client's
+# context window. Given `limit`, `max_chars` or `cursor`, they return one
+# page together with a summary of the whole result and a `next_cursor` to
+# pass back for the next page (None on the last one). Given none of them,
+# they return everything at once, as they always have.
+#
+# A cursor holds the position and the query it belongs to, so it cannot be
+# used to continue a different one. It also notes the state of the data
+# file; if that has changed since, the next page is still served, with
+# 'data_changed' set, since items may have shifted between pages.
+
+def _data_version(tracker):
+    return hashlib.sha1(repr(file_stamp(tracker.file_path)).encode()).hexdigest()[:12]
+
+
+def _encode_cursor(query, offset, version):
+    raw = json.dumps([query, offset, version]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, query):
+    """Returns (offset, version) from a cursor made by _encode_cursor for `query`."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_query, offset, version = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor.")
+    if cursor_query != query or not isinstance(offset, int) or offset < 0:
+        raise ValueError("This cursor belongs to a different query; start again without one.")
+    return offset, version
+
+
+def _paginate(tracker, items, query, limit, cursor, max_chars, size):
+    """
+    Cuts one page out of `items` (see above).
+
+    :param query: Identifies the request, e.g. the tool name and its filters.
+    :param size: Returns how many characters an item takes up in the reply.
+        Items are added while they fit into max_chars; the first one always
+        does, so a page is never empty while items remain.
+    :return: (page, info) - the page's items, and a dict with 'total',
+        'offset', 'returned', 'next_cursor' and 'data_changed'.
+    """
+    if limit is not None and limit < 1:
+        raise ValueError("limit must be at least 1.")
+    if max_chars is not None and max_chars < 1:
+        raise ValueError("max_chars must be at least 1.")
+    version = _data_version(tracker)
+    offset, data_changed = 0, False
+    if cursor:
+        offset, cursor_version = _decode_cursor(cursor, query)
+        data_changed = cursor_version != version
+
+    end = len(items) if limit is None else min(len(items), offset + limit)
+    page, used = [], 0
+    for item in items[offset:end]:
+        if max_chars is not None:
+            used += size(item)
+            if page and used > max_chars:
+                break
+        page.append(item)
+
+    next_offset = offset + len(page)
+    return page, {
+        "total": len(items),
+        "offset": offset,
+        "returned": len(page),
+        "next_cursor": _encode_cursor(query, next_offset, version) if next_offset < len(items) else None,
+        "data_changed": data_changed,
+    }
+
+
+def _json_size(item):
+    return len(json.dumps(item, ensure_ascii=False, default=str))
+
+
 # --- Main Project Management ---
 
-@mcp.tool()
+@_tool()
 def add_main_project(main_project_name: str) -> str:
     """Creates a new main project, unless one with that name already exists."""
     tracker = get_tracker()
@@ -148,7 +408,7 @@ def add_main_project(main_project_name: str) -> str:
     return f"Project '{main_project_name}' created."
 
 
-@mcp.tool()
+@_tool()
 def list_main_projects(status_filter: str = "open") -> list:
     """
     Lists main projects.
@@ -159,7 +419,7 @@ def list_main_projects(status_filter: str = "open") -> list:
     return tracker.list_main_projects(status_filter=status_filter)
 
 
-@mcp.tool()
+@_tool()
 def rename_main_project(old_name: str, new_name: str) -> str:
     """Renames a main project. Fails if a project with new_name already exists."""
     tracker = get_tracker()
@@ -168,7 +428,7 @@ def rename_main_project(old_name: str, new_name: str) -> str:
     return f"Error: Could not rename '{old_name}' - it may not exist, or '{new_name}' may already be taken."
 
 
-@mcp.tool()
+@_tool()
 def close_main_project(main_project_name: str) -> str:
     """Archives a main project (marks it 'closed') without deleting it."""
     tracker = get_tracker()
@@ -177,7 +437,7 @@ def close_main_project(main_project_name: str) -> str:
     return f"Error: Project '{main_project_name}' not found."
 
 
-@mcp.tool()
+@_tool()
 def reopen_main_project(main_project_name: str) -> str:
     """Reopens a previously closed main project."""
     tracker = get_tracker()
@@ -186,7 +446,7 @@ def reopen_main_project(main_project_name: str) -> str:
     return f"Error: Project '{main_project_name}' not found."
 
 
-@mcp.tool()
+@_tool()
 def delete_main_project(main_project_name: str) -> str:
     """
     Permanently deletes a main project, all of its tasks, and all of their
@@ -199,7 +459,7 @@ def delete_main_project(main_project_name: str) -> str:
     return f"Error: Project '{main_project_name}' not found."
 
 
-@mcp.tool()
+@_tool()
 def demote_main_project(main_project_to_demote: str, new_parent_main_project: str) -> str:
     """
     Converts a main project into a task under another main project. All of
@@ -210,14 +470,14 @@ def demote_main_project(main_project_to_demote: str, new_parent_main_project: st
     return message
 
 
-@mcp.tool()
+@_tool()
 def list_completed_main_projects() -> list:
     """Lists main projects that have no tasks, or only closed tasks."""
     tracker = get_tracker()
     return tracker.list_completed_main_projects()
 
 
-@mcp.tool()
+@_tool()
 def list_inactive_main_projects(inactive_weeks: int) -> list:
     """Lists main projects with no activity in the last `inactive_weeks` weeks."""
     tracker = get_tracker()
@@ -226,7 +486,7 @@ def list_inactive_main_projects(inactive_weeks: int) -> list:
 
 # --- Task Management ---
 
-@mcp.tool()
+@_tool()
 def add_task(
     main_project_name: str,
     task_name: str,
@@ -280,19 +540,49 @@ def add_task(
     return f"Task '{task_name}' created in project '{main_project_name}'."
 
 
-@mcp.tool()
-def list_tasks(main_project_name: str | None = None, status_filter: str = "open") -> list:
+@_tool()
+def list_tasks(
+    main_project_name: str | None = None,
+    status_filter: str = "open",
+    limit: int | None = None,
+    cursor: str | None = None,
+    max_chars: int | None = None,
+) -> list | dict | str:
     """
     Lists tasks, optionally restricted to a single main project.
 
+    On a large data file, page through the result instead of fetching it
+    all: pass `limit` and/or `max_chars`, then the returned `next_cursor` as
+    `cursor` (with the same filters) until it comes back null. A page is an
+    object with 'total', 'counts' (tasks per status over the whole result),
+    'offset', 'returned', 'next_cursor', 'data_changed' and 'tasks'.
+    Without any of the three, the plain list of all tasks is returned. A
+    cursor or limit that cannot be used is answered with an "Error: ..."
+    message.
+
     :param main_project_name: Restrict to this main project; omit to list tasks across all projects.
     :param status_filter: 'open', 'closed', or 'all'.
+    :param limit: At most this many tasks per page.
+    :param cursor: The next_cursor of the previous page.
+    :param max_chars: Keep a page's tasks within roughly this many characters of JSON.
     """
     tracker = get_tracker()
-    return tracker.list_tasks(main_project_name=main_project_name, status_filter=status_filter)
+    tasks = tracker.list_tasks(main_project_name=main_project_name, status_filter=status_filter)
+    if limit is None and cursor is None and max_chars is None:
+        return tasks
 
+    try:
+        page, info = _paginate(tracker, tasks, ["list_tasks", main_project_name, status_filter],
+                               limit, cursor, max_chars, _json_size)
+    except ValueError as e:
+        return f"Error: {e}"
+    counts = {}
+    for task in tasks:
+        counts[task.get("status")] = counts.get(task.get("status"), 0) + 1
+    return {**info, "counts": counts, "tasks": page}
 
-@mcp.tool()
+
+@_tool()
 def rename_task(main_project_name: str, old_task_name: str, new_task_name: str) -> str:
     """Renames a task within a main project."""
     tracker = get_tracker()
@@ -301,7 +591,7 @@ def rename_task(main_project_name: str, old_task_name: str, new_task_name: str)
     return f"Error: Could not rename '{old_task_name}' in project '{main_project_name}'."
 
 
-@mcp.tool()
+@_tool()
 def close_task(main_project_name: str, task_name: str) -> str:
     """Archives a task (marks it 'closed') without deleting it."""
     tracker = get_tracker()
@@ -310,7 +600,7 @@ def close_task(main_project_name: str, task_name: str) -> str:
     return f"Error: Task '{task_name}' not found in project '{main_project_name}'."
 
 
-@mcp.tool()
+@_tool()
 def reopen_task(main_project_name: str, task_name: str) -> str:
     """Reopens a previously closed task."""
     tracker = get_tracker()
@@ -319,7 +609,7 @@ def reopen_task(main_project_name: str, task_name: str) -> str:
     return f"Error: Task '{task_name}' not found in project '{main_project_name}'."
 
 
-@mcp.tool()
+@_tool()
 def delete_task(main_project_name: str, task_name: str) -> str:
     """
     Permanently deletes a task and all of its time entries. This cannot be
@@ -331,7 +621,7 @@ def delete_task(main_project_name: str, task_name: str) -> str:
     return f"Error: Task '{task_name}' not found in project '{main_project_name}'."
 
 
-@mcp.tool()
+@_tool()
 def delete_all_closed_tasks() -> str:
     """
     Permanently deletes every closed task (in every project) and its time
@@ -343,7 +633,7 @@ def delete_all_closed_tasks() -> str:
     return f"Deleted {count} closed task(s)."
 
 
-@mcp.tool()
+@_tool()
 def move_task(main_project_name: str, task_name: str, new_main_project_name: str) -> str:
     """Moves a task from one main project to another."""
     tracker = get_tracker()
@@ -351,7 +641,7 @@ def move_task(main_project_name: str, task_name: str, new_main_project_name: str
     return message
 
 
-@mcp.tool()
+@_tool()
 def promote_task_to_project(main_project_name: str, task_name: str) -> str:
     """
     Promotes a task to become its own new main project. Its time entries are
@@ -362,7 +652,7 @@ def promote_task_to_project(main_project_name: str, task_name: str) -> str:
     return message
 
 
-@mcp.tool()
+@_tool()
 def update_task(
     main_project_name: str,
     task_name: str,
@@ -422,7 +712,7 @@ def update_task(
     return f"Error: Could not update task '{task_name}' in project '{main_project_name}'."
 
 
-@mcp.tool()
+@_tool()
 def mark_task_done(main_project_name: str, task_name: str) -> str:
     """
     Marks a task as done. This just flags it as finished (it still shows up
@@ -432,8 +722,13 @@ def mark_task_done(main_project_name: str, task_name: str) -> str:
     return update_task(main_project_name, task_name, status="done")
 
 
-@mcp.tool()
-def list_inactive_tasks(inactive_weeks: int) -> list:
+@_tool()
+def list_inactive_tasks(
+    inactive_weeks: int,
+    limit: int | None = None,
+    cursor: str | None = None,
+    max_chars: int | None = None,
+) -> list | dict | str:
     """
     Lists tasks with no activity in the last `inactive_weeks` weeks, and
     tasks that were never worked on at all whose due date passed at least
@@ -443,12 +738,209 @@ def list_inactive_tasks(inactive_weeks: int) -> list:
     Closed tasks are excluded, but tasks already marked 'done' are included
     since they may still need to be closed. 'last_activity' is null for a
     task that was never worked on; 'due_date' says why it is listed.
+
+    Pages like list_tasks when `limit`, `cursor` or `max_chars` is given;
+    the page object carries the tasks under 'tasks'.
     """
     tracker = get_tracker()
-    return tracker.list_inactive_tasks(inactive_weeks)
+    tasks = tracker.list_inactive_tasks(inactive_weeks)
+    if limit is None and cursor is None and max_chars is None:
+        return tasks
+
+    try:
+        page, info = _paginate(tracker, tasks, ["list_inactive_tasks", inactive_weeks],
+                               limit, cursor, max_chars, _json_size)
+    except ValueError as e:
+        return f"Error: {e}"
+    return {**info, "tasks": page}
+
 
+# --- Bulk Task Management ---
+#
+# A client planning a week makes dozens of changes at once. Made one tool
+# call at a time, each of them is its own round trip, its own save of the
+# whole data file and its own write to the sync queue. The tools below take
+# a list and apply it inside one tracker.batch(): one save and one queue
+# write for the lot.
+#
+# Each item is a dict with the same fields as the single-item tool's
+# parameters. The result is a list with one short entry per item, in order -
+# "created", "updated", "closed" or "moved", "exists" for a task add_tasks
+# left alone, or "error: <reason>". An item that fails - refused, or raising
+# part way through - is reported and skipped, and the others are still
+# applied; whatever a raising item had already changed is kept with them.
+
+class _TaskNames:
+    """
+    Finds tasks by main project and name for one bulk call.
+
+    Built from the document once, instead of listing every task for every
+    item, and kept current as the items are applied: after each one, the
+    names it may have changed are looked up again, in their project only.
+    Where a project holds two tasks of one name, the first is found, as a
+    scan of list_tasks would.
+    """
 
-@mcp.tool()
+    def __init__(self, tracker):
+        self._tracker = tracker
+        self.projects = set()
+        self._tasks = {}
+        for project in tracker.data["projects"]:
+            # Tasks can be found in the hidden project, but not added to it:
+            # list_main_projects does not name it.
+            if project["main_project_name"] != tracker.HIDDEN_PROJECT:
+                self.projects.add(project["main_project_name"])
+            for task in project.get("tasks", []):
+                self._tasks.setdefault((project["main_project_name"], task["task_name"]), task)
+
+    def find(self, main_project_name, task_name):
+        return self._tasks.get((main_project_name, task_name))
+
+    def refresh(self, item):
+        """Looks up again every task name `item` may have added, renamed or moved."""
+        project_name, task_name = item.get('main_project_name'), item.get('task_name')
+        for key in {(project_name, task_name), (project_name, item.get('new_task_name')),
+                    (item.get('new_main_project_name'), task_name)}:
+            if None in key:
+                continue
+            self._tasks.pop(key, None)
+            project = self._tracker._get_project(key[0])
+            for task in (project or {}).get("tasks", []):
+                if task["task_name"] == key[1]:
+                    self._tasks[key] = task
+                    break
+
+
+def _bulk_apply(items, required, optional, apply_item):
+    """
+    Runs apply_item(tracker, item, names) for each item inside one
+    tracker.batch() and collects the results (see above); `names` is the
+    batch's _TaskNames. Items missing a required field, or carrying one the
+    tool does not know, are reported without being applied.
+    """
+    tracker = get_tracker()
+    results = []
+    with tracker.batch():
+        names = _TaskNames(tracker)
+        for item in items:
+            if not isinstance(item, dict):
+                results.append("error: item must be an object")
+                continue
+            missing = [k for k in required if not item.get(k)]
+            unknown = sorted(set(item) - set(required) - set(optional))
+            if missing:
+                results.append(f"error: missing {', '.join(missing)}")
+            elif unknown:
+                results.append(f"error: unknown field(s) {', '.join(unknown)}")
+            else:
+                try:
+                    results.append(apply_item(tracker, item, names))
+                except Exception as e:
+                    results.append(f"error: {e}")
+                finally:
+                    names.refresh(item)
+    return results
+
+
+def _valid_priority(priority):
+    return isinstance(priority, int) and 0 <= priority <= 9
+
+
+_NEW_TASK_FIELDS = ('due_date', 'today', 'note', 'recurring', 'frequency', 'userdefined_days', 'priority')
+_TASK_UPDATE_FIELDS = ('new_task_name', 'due_date', 'clear_due_date', 'today', 'note', 'status',
+                       'recurring', 'frequency', 'userdefined_days', 'priority')
+
+
+def _bulk_add_task(tracker, item, names):
+    if not _valid_priority(item.get('priority', 0)):
+        return "error: priority must be between 0 and 9"
+    project_name, task_name = item['main_project_name'], item['task_name']
+    if project_name not in names.projects:
+        return f"error: main project '{project_name}' not found"
+    if names.find(project_name, task_name) is not None:
+        return "exists"
+    tracker.add_task(project_name, task_name, **{k: item[k] for k in _NEW_TASK_FIELDS if k in item})
+    return "created"
+
+
+def _bulk_update_task(tracker, item, names):
+    if item.get('priority') is not None and not _valid_priority(item['priority']):
+        return "error: priority must be between 0 and 9"
+    project_name, task_name = item['main_project_name'], item['task_name']
+    task = names.find(project_name, task_name)
+    if task is None:
+        return f"error: task '{task_name}' not found in project '{project_name}'"
+    changes = {k: item[k] for k in _TASK_UPDATE_FIELDS if k in item}
+    if tracker.update_task(project_name, task_name, task_id=task.get('id'), **changes):
+        return "updated"
+    return f"error: could not update task '{task_name}'"
+
+
+def _bulk_close_task(tracker, item, names):
+    if tracker.close_task(item['main_project_name'], item['task_name']):
+        return "closed"
+    return f"error: task '{item['task_name']}' not found in project '{item['main_project_name']}'"
+
+
+def _bulk_move_task(tracker, item, names):
+    success, message = tracker.move_task(item['main_project_name'], item['task_name'], item['new_main_project_name'])
+    return "moved" if success else f"error: {message}"
+
+
+@_tool()
+def add_tasks(tasks: list[dict]) -> list[str]:
+    """
+    Creates many tasks in one call. Prefer this over repeated add_task calls.
+
+    :param tasks: One object per task with 'main_project_name' and 'task_name',
+        and optionally any of add_task's other parameters (due_date, today,
+        note, recurring, frequency, userdefined_days, priority). The main
+        projects must already exist.
+    :return: One entry per task, in order: "created", "exists" (left as it
+        is), or "error: <reason>".
+    """
+    return _bulk_apply(tasks, ('main_project_name', 'task_name'), _NEW_TASK_FIELDS, _bulk_add_task)
+
+
+@_tool()
+def update_tasks(updates: list[dict]) -> list[str]:
+    """
+    Updates many tasks in one call. Prefer this over repeated update_task calls.
+
+    :param updates: One object per task with 'main_project_name' and
+        'task_name', plus the fields to change, named as update_task's
+        parameters (new_task_name, due_date, clear_due_date, today, note,
+        status, recurring, frequency, userdefined_days, priority). Fields left
+        out are not changed.
+    :return: One entry per task, in order: "updated" or "error: <reason>".
+    """
+    return _bulk_apply(updates, ('main_project_name', 'task_name'), _TASK_UPDATE_FIELDS, _bulk_update_task)
+
+
+@_tool()
+def close_tasks(tasks: list[dict]) -> list[str]:
+    """
+    Archives many tasks in one call (see close_task).
+
+    :param tasks: One object per task with 'main_project_name' and 'task_name'.
+    :return: One entry per task, in order: "closed" or "error: <reason>".
+    """
+    return _bulk_apply(tasks, ('main_project_name', 'task_name'), (), _bulk_close_task)
+
+
+@_tool()
+def move_tasks(moves: list[dict]) -> list[str]:
+    """
+    Moves many tasks to other main projects in one call (see move_task).
+
+    :param moves: One object per task with 'main_project_name', 'task_name'
+        and 'new_main_project_name'.
+    :return: One entry per task, in order: "moved" or "error: <reason>".
+    """
+    return _bulk_apply(moves, ('main_project_name', 'task_name', 'new_main_project_name'), (), _bulk_move_task)
+
+
+@_tool()
 def cleanup_overdue_today_tasks() -> str:
     """Removes the 'today' flag from tasks whose due date is now in the past."""
     tracker = get_tracker()
@@ -456,7 +948,7 @@ def cleanup_overdue_today_tasks() -> str:
     return "Removed the 'today' flag from overdue tasks." if changed else "Nothing to clean up."
 
 
-@mcp.tool()
+@_tool()
 def set_today_flag_for_due_tasks() -> str:
     """Marks open tasks whose due date is today as 'today' tasks."""
     tracker = get_tracker()
@@ -466,7 +958,7 @@ def set_today_flag_for_due_tasks() -> str:
 
 # --- Time Tracking ---
 
-@mcp.tool()
+@_tool()
 def start_work(main_project_name: str, task_name: str) -> str:
     """
     Starts time tracking on a task. Both the project and the task must
@@ -483,7 +975,7 @@ def start_work(main_project_name: str, task_name: str) -> str:
     )
 
 
-@mcp.tool()
+@_tool()
 def stop_work() -> str:
     """Stops the currently running time tracking session, if any."""
     tracker = get_tracker()
@@ -492,7 +984,7 @@ def stop_work() -> str:
     return "No time tracking session was active."
 
 
-@mcp.tool()
+@_tool()
 def get_current_work() -> dict | None:
     """Returns the task currently being worked on, or None if no session is active."""
     tracker = get_tracker()
@@ -501,7 +993,26 @@ def get_current_work() -> dict | None:
 
 # --- Email Import ---
 
-@mcp.tool()
+def _add_email_task(subject, body):
+    """
+    Files one fetched email as a task, holding the tracker for just that.
+
+    :return: False, without filing it, once the call has been given up on:
+        the client has been told it failed, and will fetch again.
+    """
+    job = _current_job()
+    with _tracker_lock:
+        if job is not None and job.cancelled.is_set():
+            return False
+        try:
+            get_tracker().add_email_task(subject, body)
+        except BaseException:
+            _forget_tracker()
+            raise
+    return True
+
+
+@_tool(timeout=300, locked=False)
 def fetch_emails_to_tasks() -> str:
     """
     Fetches emails from the IMAP account configured in config.json and turns
@@ -509,8 +1020,14 @@ def fetch_emails_to_tasks() -> str:
     note). Requires email import to be enabled and configured first - this
     cannot be set up from here.
     """
-    tracker = get_tracker()
-    count, error = tracker.fetch_emails_to_tasks()
+    with _tracker_lock:
+        tracker = get_tracker()
+    job = _current_job()
+    if job is None:
+        count, error = tracker.fetch_emails_to_tasks(create_task=_add_email_task)
+    else:
+        count, error = tracker.fetch_emails_to_tasks(progress=job.report_progress, cancelled=job.cancelled.is_set,
+                                                     create_task=_add_email_task)
     if error:
         return f"Error fetching emails: {error}"
     if count:
@@ -520,7 +1037,7 @@ def fetch_emails_to_tasks() -> str:
 
 # --- Reporting ---
 
-@mcp.tool()
+@_tool(timeout=120)
 def generate_daily_report(report_date: str | None = None) -> str:
     """
     Generates a daily time report as Markdown. Omit report_date for today.
@@ -533,7 +1050,7 @@ def generate_daily_report(report_date: str | None = None) -> str:
     return _call_protecting_stdio(get_tracker().generate_daily_report, date_obj)
 
 
-@mcp.tool()
+@_tool(timeout=120)
 def generate_detailed_daily_report(report_date: str | None = None) -> str:
     """
     Generates a detailed daily report as Markdown, listing individual time
@@ -547,13 +1064,27 @@ def generate_detailed_daily_report(report_date: str | None = None) -> str:
     return _call_protecting_stdio(get_tracker().generate_detailed_daily_report, date_obj)
 
 
-@mcp.tool()
-def generate_date_range_report(start_date: str, end_date: str) -> str:
+@_tool(timeout=120)
+def generate_date_range_report(
+    start_date: str,
+    end_date: str,
+    limit: int | None = None,
+    cursor: str | None = None,
+    max_chars: int | None = None,
+) -> str:
     """
     Generates a time report as Markdown for a date range (inclusive).
 
+    For a long range, page through it by main project: pass `limit` (projects
+    per page) and/or `max_chars`, then the cursor named at the end of each
+    page as `cursor` (with the same dates) until no cursor is named. Every
+    page starts with the total time of the whole range.
+
     :param start_date: Start date in YYYY-MM-DD format.
     :param end_date: End date in YYYY-MM-DD format.
+    :param limit: At most this many main projects per page.
+    :param cursor: The cursor named at the end of the previous page.
+    :param max_chars: Keep a page within roughly this many characters.
     """
     start_obj, error = parse_date(start_date, "start_date")
     if error:
@@ -561,24 +1092,272 @@ def generate_date_range_report(start_date: str, end_date: str) -> str:
     end_obj, error = parse_date(end_date, "end_date")
     if error:
         return error
-    return _call_protecting_stdio(get_tracker().generate_date_range_report, start_obj, end_obj)
-
+    tracker = get_tracker()
+    if limit is None and cursor is None and max_chars is None:
+        return _call_protecting_stdio(tracker.generate_date_range_report, start_obj, end_obj)
 
-@mcp.tool()
+    summary = tracker.summarize_date_range(start_obj, end_obj)
+    if not summary:
+        return f"No time tracked between {start_date} and {end_date}."
+    sections = ["\n".join(tracker.format_date_range_section(p)) for p in summary]
+    try:
+        page, info = _paginate(tracker, sections, ["generate_date_range_report", start_date, end_date],
+                               limit, cursor, max_chars, len)
+    except ValueError as e:
+        return f"Error: {e}"
+
+    total = tracker._format_duration(sum((p["total"] for p in summary), timedelta()))
+    first, last = info["offset"] + 1, info["offset"] + info["returned"]
+    lines = [
+        f"# Time Report: {start_date} to {end_date}\n",
+        f"**Total Time in Period: {total}** across {info['total']} main project(s); "
+        f"this page shows {first}-{last}.\n",
+    ]
+    if info["data_changed"]:
+        lines.append("_The data changed since the previous page; projects may have shifted._\n")
+    lines.extend(page)
+    if info["next_cursor"]:
+        lines.append(f"More projects follow: call again with cursor=\"{info['next_cursor']}\".")
+    return "\n".join(lines)
+
+
+@_tool(timeout=120)
 def generate_task_report(main_project_name: str, task_name: str) -> str:
     """Generates a detailed report as Markdown for a single task."""
     return _call_protecting_stdio(get_tracker().generate_task_report, main_project_name, task_name)
 
 
-@mcp.tool()
+@_tool(timeout=120)
 def generate_main_project_report(main_project_name: str) -> str:
     """Generates a detailed report as Markdown for a single main project, including a breakdown across its tasks."""
     return _call_protecting_stdio(get_tracker().generate_main_project_report, main_project_name)
 
 
+# --- Resources ---
+#
+# What is running now, what is marked for today, and a day's report, as
+# resources a client can read and subscribe to instead of calling
+# get_current_work or list_tasks over and over to notice a change.
+#
+# Each view is rendered once per state of the data file and kept until the
+# file changes, for the _VIEW_CACHE_SIZE views read most recently. A watcher
+# on the server's event loop stats the file once a second; when it has
+# changed, the two fixed views and those with a subscriber are rendered
+# again, and for those that came out differently an update notification
+# goes out - to sessions that subscribed with resources/subscribe, and on
+# mcp 2's subscriptions/listen streams.
+
+RESOURCE_CURRENT_WORK = "timecontrol://current-work"
+RESOURCE_TODAY = "timecontrol://today"
+_DAILY_REPORT_PREFIX = "timecontrol://reports/daily/"
+_WATCH_INTERVAL = 1.0
+# Every daily report ever read has a URI of its own, so the cache is bounded;
+# views being followed are never the ones dropped (see _keep_view).
+_VIEW_CACHE_SIZE = 16
+
+# uri -> (data version, content), least recently used first; see _render_view.
+_view_cache = OrderedDict()
+# uri -> set of sessions that subscribed to it with resources/subscribe.
+_resource_subscribers = {}
+_watched_version = None
+_watcher_task = None
+
+
+def _build_view(tracker, uri):
+    """Renders the resource at `uri` from the tracker's current data."""
+    if uri == RESOURCE_CURRENT_WORK:
+        return json.dumps(tracker.get_current_work(), indent=2, ensure_ascii=False)
+    if uri == RESOURCE_TODAY:
+        # The same list as the GUI's Today's Tasks tab.
+        today_tasks = [t for t in tracker.list_tasks(status_filter='open') if t.get('today')]
+        return json.dumps(today_tasks, indent=2, ensure_ascii=False)
+    if uri.startswith(_DAILY_REPORT_PREFIX):
+        date_str = uri[len(_DAILY_REPORT_PREFIX):]
+        date_obj, error = parse_date(date_str, "date")
+        if error or date_obj is None:
+            raise ValueError(error or "Error: date must be in YYYY-MM-DD format.")
+        # Not copied to the clipboard: nobody asked for this one, and the
+        # watcher renders it again whenever the data changes.
+        return _call_protecting_stdio(tracker.generate_daily_report, date_obj, copy_to_clipboard=False)
+    raise ValueError(f"Unknown resource: {uri}")
+
+
+def _render_view(uri):
+    """Returns the resource at `uri`, rendered at most once per state of the data file."""
+    tracker = get_tracker()
+    version = _data_version(tracker)
+    cached = _view_cache.get(uri)
+    if cached is not None and cached[0] == version:
+        _view_cache.move_to_end(uri)
+        return cached[1]
+    content = _build_view(tracker, uri)
+    _keep_view(uri, (version, content))
+    return content
+
+
+def _followed_views():
+    """The views the watcher renders again on every change of the data file."""
+    # The two fixed views are always among them: on mcp 2's
+    # subscriptions/listen streams, nothing tells this server who follows what.
+    return ({RESOURCE_CURRENT_WORK, RESOURCE_TODAY}
+            | {uri for uri, sessions in _resource_subscribers.items() if sessions})
+
+
+def _keep_view(uri, entry):
+    """
+    Caches a rendered view, dropping the least recently used ones beyond
+    _VIEW_CACHE_SIZE. A followed view is kept regardless: it is what the
+    next rendering is compared with to decide whether to notify.
+    """
+    _view_cache[uri] = entry
+    _view_cache.move_to_end(uri)
+    if len(_view_cache) <= _VIEW_CACHE_SIZE:
+        return
+    followed = _followed_views()
+    for old in [u for u in _view_cache if u not in followed][:len(_view_cache) - _VIEW_CACHE_SIZE]:
+        del _view_cache[old]
+
+
+@mcp.resource(RESOURCE_CURRENT_WORK, name="current-work", mime_type="application/json",
+              description="The task currently being worked on, or null.")
+async def current_work_resource() -> str:
+    return await _run_off_loop(_render_view, (RESOURCE_CURRENT_WORK,))
+
+
+@mcp.resource(RESOURCE_TODAY, name="today", mime_type="application/json",
+              description="Open tasks marked for today, as on the GUI's Today's Tasks tab.")
+async def today_resource() -> str:
+    return await _run_off_loop(_render_view, (RESOURCE_TODAY,))
+
+
+@mcp.resource(_DAILY_REPORT_PREFIX + "{date}", name="daily-report", mime_type="text/markdown",
+              description="The daily report for a date (YYYY-MM-DD).")
+async def daily_report_resource(date: str) -> str:
+    return await _run_off_loop(_render_view, (_DAILY_REPORT_PREFIX + date,), timeout=120)
+
+
+def _subscribe(session, uri):
+    """Registers a resources/subscribe and renders the view, so its next change can be told apart."""
+    _resource_subscribers.setdefault(uri, set()).add(session)
+    try:
+        _render_view(uri)
+    except ValueError:
+        pass
+
+
+def _unsubscribe(session, uri):
+    _resource_subscribers.get(uri, set()).discard(session)
+
+
+def _register_subscription_handlers():
+    """
+    Serves resources/subscribe and resources/unsubscribe, which neither SDK
+    does on its own. Registering them is also what makes the server
+    advertise subscription support to the client.
+    """
+    if MCP_MAJOR_VERSION == 1:
+        lowlevel = mcp._mcp_server
+
+        @lowlevel.subscribe_resource()
+        async def handle_subscribe(uri):
+            await _run_off_loop(_subscribe, (lowlevel.request_context.session, str(uri)))
+            _ensure_data_file_watcher()
+
+        @lowlevel.unsubscribe_resource()
+        async def handle_unsubscribe(uri):
+            _unsubscribe(lowlevel.request_context.session, str(uri))
+    else:
+        import mcp_types
+
+        async def handle_subscribe(ctx, params):
+            await _run_off_loop(_subscribe, (ctx.session, str(params.uri)))
+            _ensure_data_file_watcher()
+            return mcp_types.EmptyResult()
+
+        async def handle_unsubscribe(ctx, params):
+            _unsubscribe(ctx.session, str(params.uri))
+            return mcp_types.EmptyResult()
+
+        mcp._lowlevel_server.add_request_handler(
+            "resources/subscribe", mcp_types.SubscribeRequestParams, handle_subscribe)
+        mcp._lowlevel_server.add_request_handler(
+            "resources/unsubscribe", mcp_types.UnsubscribeRequestParams, handle_unsubscribe)
+
+
+_register_subscription_handlers()
+
+
+async def _notify_resource_updated(uri):
+    for session in list(_resource_subscribers.get(uri, ())):
+        try:
+            await session.send_resource_updated(uri)
+        except Exception:
+            # The client has gone away without unsubscribing.
+            _resource_subscribers[uri].discard(session)
+    if MCP_MAJOR_VERSION == 2:
+        from mcp.server.subscriptions import ResourceUpdated
+        await mcp._subscriptions.publish(ResourceUpdated(uri=uri))
+
+
+def _changed_views():
+    """
+    If the data file changed since the last look, renders every view someone
+    is following (see _followed_views) and returns those that came out
+    differently. Views that were merely read before are left for the next
+    read to render.
+    """
+    global _watched_version
+    version = _data_version(get_tracker())
+    if version == _watched_version:
+        return []
+    _watched_version = version
+
+    changed = []
+    for uri in sorted(_followed_views()):
+        before = _view_cache.get(uri)
+        try:
+            content = _render_view(uri)
+        except Exception:
+            continue
+        # A view rendered here for the first time has nothing to differ
+        # from; from now on it has.
+        if before is not None and before[1] != content:
+            changed.append(uri)
+    return changed
+
+
+async def _publish_changed_views():
+    """Sends an update notification for each view _changed_views reports."""
+    for uri in await _run_off_loop(_changed_views):
+        await _notify_resource_updated(uri)
+
+
+async def _watch_data_file():
+    while True:
+        await asyncio.sleep(_WATCH_INTERVAL)
+        try:
+            await _publish_changed_views()
+        except Exception:
+            # A half-written or unreadable data file must not end the watch;
+            # the next round tries again.
+            pass
+
+
+def _ensure_data_file_watcher():
+    """Starts _watch_data_file on the running event loop, once."""
+    global _watcher_task
+    if _watcher_task is not None and not _watcher_task.done():
+        return
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return
+    _watcher_task = loop.create_task(_watch_data_file())
+
+
 # --- Misc ---
 
-@mcp.tool()
+@_tool()
 def get_version() -> str:
     """Returns the TimeControl application version."""
     return get_tracker().get_version()
@@ -28,7 +28,7 @@ CONFIG_FILE = 'config.json'
 
 
 # --- Data models for REST responses/requests ---
-# These mirror the ComplexModel classes in TimeTrackerSOAP_Server.py one for
+# These mirror the ComplexModel classes in TimeTrackerSOAP_Service.py one for
 # one, just expressed as Pydantic models instead of spyne models.
 
 class MainProject(BaseModel):
@@ -143,7 +143,7 @@ def get_tracker():
     including changes made concurrently through the GUI, the SOAP interface,
     or the MCP server - and so its own changes are picked up by them
     immediately too. Mirrors get_tracker() in TimeTrackerMCP_Server.py and
-    the 'method_call' event listener in TimeTrackerSOAP_Server.py.
+    the 'method_call' event listener in TimeTrackerSOAP_Service.py.
     """
     return TimeTracker()
 
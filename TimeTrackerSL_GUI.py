@@ -1,5 +1,6 @@
 import json
 import os
+import socket
 import subprocess
 import sys
 import webbrowser
@@ -22,6 +23,12 @@ except ImportError:
 
 CONFIG_FILE = 'config.json'
 ICON_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sl', 'icon.png')
+# Upper bound on waiting for the Streamlit server before the window is opened
+# regardless - it then shows the browser's own "cannot connect" page until
+# the server is up, which is no worse than what a fixed delay used to give.
+# A warm start is ready in about a second; a first start after an update, or
+# on a slow disk, can take many times that.
+STREAMLIT_STARTUP_TIMEOUT = 60
 
 
 def _is_frozen():
@@ -79,6 +86,32 @@ def _run_streamlit_subprocess(port, headless):
     ]
     stcli.main()
 
+def _wait_until_serving(port, process, timeout=STREAMLIT_STARTUP_TIMEOUT):
+    """
+    Waits until the Streamlit server accepts connections.
+
+    This used to be a fixed two-second sleep: too long on a warm start, where
+    the server is up well before that, and too short on a cold one, where the
+    window then opened onto a connection error. Polling the port ends the
+    wait the moment there is something to show.
+
+    :param port: The port the server was told to listen on.
+    :param process: Its subprocess.Popen; the wait ends early if it exits.
+    :param timeout: Seconds after which to give up waiting.
+    :return: True if the server is accepting connections.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            return False
+        try:
+            with socket.create_connection(("127.0.0.1", int(port)), timeout=0.5):
+                return True
+        except OSError:
+            time.sleep(0.1)
+    return False
+
+
 def _set_macos_dock_icon():
     """
     Replaces the Dock icon shown while this app runs.
@@ -186,6 +219,7 @@ def start_streamlit_server():
     7. Terminates the Streamlit subprocess when the `pywebview` window is closed.
     """
 
+    started = time.monotonic()
     port = 8501 # Default Streamlit port
     width = 800
     height = 600
@@ -246,9 +280,13 @@ def start_streamlit_server():
         if mcp_process and mcp_process.poll() is None:
             mcp_process.terminate()
 
+    def report_startup(stage):
+        print(f"{stage} after {time.monotonic() - started:.2f}s.")
+
     if webview and view_mode == 'webview':
         _set_macos_dock_icon()
-        time.sleep(2) # Wait for Streamlit to initialize
+        if _wait_until_serving(port, process):
+            report_startup("Streamlit server ready")
 
         x, y = _safe_window_position(x, y, int(width), int(height))
 
@@ -264,6 +302,8 @@ def start_streamlit_server():
         
         # Save state when closing the window
         window.events.closing += lambda: save_window_state(window)
+        # The time a user actually waits for: until the app is on screen.
+        window.events.loaded += lambda: report_startup("Window loaded")
         
         # Monitor the Streamlit process and close the window if it exits
         def monitor_streamlit(proc, win):
@@ -298,7 +338,8 @@ def start_streamlit_server():
         if not webview:
             print("Warning: 'webview' module not found. Opening in system browser instead.")
 
-        time.sleep(2)
+        if _wait_until_serving(port, process):
+            report_startup("Streamlit server ready")
         webbrowser.open(f"http://localhost:{port}")
         try:
             process.wait()
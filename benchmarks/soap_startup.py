@@ -0,0 +1,107 @@
+"""
+Startup-time benchmark for TimeTrackerSOAP_Server.py.
+
+Starts the real server as a subprocess, in a throwaway directory with its
+own config.json, data.json and WSDL cache, and reports three moments:
+
+- listening:  the port accepts a connection
+- wsdl:       the first ?wsdl request has been answered
+- first rpc:  a get_version call has been answered
+
+It does this twice - once with an empty WSDL cache, as on the first start
+after an install or update, and once with the cache the first run left
+behind, as on every start after that.
+
+Run from the repository root:
+
+    python benchmarks/soap_startup.py [--runs N] [--port PORT]
+"""
+
+import argparse
+import json
+import os
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+SERVER_SCRIPT = os.path.join(REPO_ROOT, 'TimeTrackerSOAP_Server.py')
+
+GET_VERSION = (
+    '<soap11env:Envelope xmlns:soap11env="http://schemas.xmlsoap.org/soap/envelope/" '
+    'xmlns:tns="spyne.examples.timecontrol">'
+    '<soap11env:Body><tns:get_version/></soap11env:Body></soap11env:Envelope>'
+).encode('utf-8')
+
+
+def _wait(condition, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if condition():
+            return time.perf_counter()
+        time.sleep(0.002)
+    raise RuntimeError("server did not get there within %ss" % timeout)
+
+
+def _port_open(port):
+    try:
+        with socket.create_connection(('127.0.0.1', port), timeout=0.2):
+            return True
+    except OSError:
+        return False
+
+
+def measure(sandbox, port):
+    """Starts the server once and returns the three timings in seconds."""
+    env = dict(os.environ, XDG_CACHE_HOME=os.path.join(sandbox, 'cache'),
+               LOCALAPPDATA=os.path.join(sandbox, 'cache'))
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, SERVER_SCRIPT], cwd=sandbox, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        listening = _wait(lambda: process.poll() is None and _port_open(port))
+        urllib.request.urlopen('http://localhost:%d/?wsdl' % port, timeout=30).read()
+        wsdl = time.perf_counter()
+        request = urllib.request.Request(
+            'http://localhost:%d/' % port, data=GET_VERSION,
+            headers={'Content-Type': 'text/xml; charset=utf-8'})
+        urllib.request.urlopen(request, timeout=30).read()
+        rpc = time.perf_counter()
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+    return listening - started, wsdl - started, rpc - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--port', type=int, default=8690)
+    args = parser.parse_args()
+
+    sandbox = tempfile.mkdtemp(prefix='timecontrol_soap_bench_')
+    try:
+        with open(os.path.join(sandbox, 'config.json'), 'w', encoding='utf-8') as f:
+            json.dump({"soap_port": args.port, "data_file": "data.json", "language": "en"}, f)
+
+        for label, keep_cache in (('cold cache', False), ('warm cache', True)):
+            samples = []
+            for _ in range(args.runs):
+                if not keep_cache:
+                    shutil.rmtree(os.path.join(sandbox, 'cache'), ignore_errors=True)
+                samples.append(measure(sandbox, args.port))
+            print(label)
+            for i, name in enumerate(('listening', 'wsdl', 'first rpc')):
+                print("  %-10s median %7.1f ms" % (
+                    name, 1000 * statistics.median(s[i] for s in samples)))
+    finally:
+        shutil.rmtree(sandbox, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
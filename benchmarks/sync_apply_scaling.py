@@ -0,0 +1,94 @@
+"""
+Scaling benchmark for tt.sync_apply.apply_ops.
+
+Builds a synthetic operation log of the kind a snapshot adoption or a seed
+replay produces - projects, tasks and time entries being created, then a
+good share of them moved and deleted - and applies it to an empty document
+in one call, at several sizes. Reports the time per size and per thousand
+operations; the per-thousand figure staying flat as the size doubles is
+what linear scaling looks like.
+
+Run from the repository root:
+
+    python benchmarks/sync_apply_scaling.py [--sizes 12500,25000,50000,100000] [--runs N]
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from tt.sync_apply import apply_ops  # noqa: E402
+
+
+def synthetic_log(size, seed=1):
+    """
+    About `size` operations over 20 projects and 50 tasks: entries created,
+    then roughly a third of them moved, a tenth deleted, and some tasks moved
+    between projects and deleted. The task count is fixed, so the lists grow
+    with the log - the shape where rebuilding a list per operation hurts.
+    Every deletion is tombstoned under a fresh uid, so '_deleted' grows too.
+    """
+    rng = random.Random(seed)
+    ops = []
+
+    def op(**fields):
+        fields['s'] = len(ops) + 1
+        ops.append(fields)
+
+    projects = ['p%015d' % n for n in range(20)]
+    for uid in projects:
+        op(op='project.create', uid=uid, f={'name': uid})
+
+    tasks, entries = [], []
+    for n in range(50):
+        uid = 't%015d' % n
+        tasks.append(uid)
+        op(op='task.create', uid=uid, project=rng.choice(projects), f={'task_name': uid})
+
+    while len(ops) < size * 0.55:
+        uid = 'e%015d' % len(entries)
+        entries.append(uid)
+        op(op='entry.add', uid=uid, task=rng.choice(tasks),
+           start='2026-01-01 09:00:00', end='2026-01-01 10:00:00')
+
+    while len(ops) < size * 0.85:
+        op(op='entry.move', uid=rng.choice(entries), task=rng.choice(tasks))
+    while len(ops) < size * 0.95:
+        op(op='entry.delete', uid=rng.choice(entries))
+    while len(ops) < size * 0.96:
+        op(op='task.move', uid=rng.choice(tasks), project=rng.choice(projects))
+    while len(ops) < size:
+        op(op='task.delete', uid='x%015d' % len(ops))
+    return ops
+
+
+def measure(size, runs):
+    ops = synthetic_log(size)
+    samples = []
+    for _ in range(runs):
+        document = {'projects': [], 'next_id': 1, '_deleted': [], 'schema_version': 2}
+        started = time.perf_counter()
+        apply_ops(document, ops)
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', default='12500,25000,50000,100000')
+    parser.add_argument('--runs', type=int, default=3)
+    args = parser.parse_args()
+
+    for size in (int(s) for s in args.sizes.split(',')):
+        seconds = measure(size, args.runs)
+        print("%7d ops  %8.1f ms  %6.2f ms per 1000" % (
+            size, 1000 * seconds, 1000 * seconds / (size / 1000)))
+
+
+if __name__ == '__main__':
+    main()
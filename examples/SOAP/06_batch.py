@@ -0,0 +1,61 @@
+"""
+Example: Do several things in one round trip via the TimeControl SOAP
+interface - import a list of tasks, then run a short sequence of different
+operations as one batch.
+
+Prerequisites:
+    - The SOAP server is running: python TimeTrackerSOAP_Server.py
+    - The 'zeep' package is installed: pip install zeep
+    - 01_create_project.py has been run at least once (or the project
+      already exists for another reason).
+
+Like 02_create_task.py, this script checks for the tasks it creates first,
+so it is safe to run more than once.
+"""
+
+from zeep import Client
+
+SOAP_URL = "http://localhost:8600/?wsdl"
+PROJECT_NAME = "SOAP Example Project"
+IMPORTED_TASKS = ["Review SOAP examples", "Publish SOAP examples"]
+
+
+def main():
+    client = Client(SOAP_URL)
+
+    # Every SOAP call is a full HTTP request carrying an XML envelope, so
+    # a client that creates twenty tasks with twenty add_task() calls spends
+    # most of its time on the wire. add_tasks() takes the whole list at once
+    # and the server saves its data file once for all of them.
+    existing_tasks = client.service.list_tasks(PROJECT_NAME, "all") or []
+    existing_names = {t.task_name for t in existing_tasks}
+    new_tasks = [name for name in IMPORTED_TASKS if name not in existing_names]
+    if new_tasks:
+        # An array parameter is passed as a dict holding the list under the
+        # name of its item type. Fields left out of an item take the same
+        # defaults add_task() would use.
+        added = client.service.add_tasks(
+            PROJECT_NAME,
+            {"NewTaskModel": [{"task_name": name, "priority": 3} for name in new_tasks]},
+        )
+        print(f"Imported {added} task(s) into '{PROJECT_NAME}'.")
+    else:
+        print(f"All tasks already exist in '{PROJECT_NAME}', nothing to import.")
+
+    # execute_batch() goes one step further: a list of *different*
+    # operations, each named by the method it stands for. It is all or
+    # nothing - if one step fails (say, a task that does not exist), none
+    # of the steps are kept, and the result tells you which one it was.
+    results = client.service.execute_batch({"BatchOperationModel": [
+        {"op": "update_task", "main_project_name": PROJECT_NAME,
+         "task_name": IMPORTED_TASKS[0], "today": True},
+        {"op": "start_work", "main_project_name": PROJECT_NAME,
+         "task_name": IMPORTED_TASKS[0]},
+        {"op": "stop_work"},
+    ]}) or []
+    for i, result in enumerate(results, start=1):
+        print(f"Batch step {i}: success={result.success} {result.message or ''}".rstrip())
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,10 @@ require_once __DIR__ . '/lib/oplog.php';
 ini_set('display_errors', '0');
 ini_set('log_errors', '1');
 
+// Replies are JSON - a page of the log repeats the same keys five hundred
+// times - and shrink to a fraction when the client accepts gzip.
+tc_compress_output();
+
 // The transport is checked before anything else - before the credential is
 // looked at, and before the server says anything at all about its own state.
 // A bearer token is worth exactly as much as the channel carrying it, so
@@ -132,7 +136,11 @@ switch ($action) {
             tc_fail(401, 'invalid_token', 'Token is missing, expired or revoked.');
         }
         $state = tc_log_state($store, $session['uid']);
-        tc_ok(['head' => (int)$state['head'], 'server_time' => time()]);
+        // Which compressed request bodies this server reads. Here because
+        // head is what a client asks before anything else, and an older
+        // server simply leaves it out - which reads as "none".
+        tc_ok(['head' => (int)$state['head'], 'server_time' => time(),
+               'encodings' => tc_encodings()]);
         break;
 
     // -----------------------------------------------------------------
@@ -253,7 +261,7 @@ switch ($action) {
         if ($seq < 1) {
             tc_fail(400, 'bad_seq', 'seq must be the sequence number this document covers.');
         }
-        $raw = tc_raw_body(TC_SNAPSHOT_MAX_BYTES);
+        $raw = tc_raw_body(TC_SNAPSHOT_MAX_BYTES, TC_SNAPSHOT_MAX_INFLATED);
         $bad = tc_snapshot_validate($raw);
         if ($bad !== null) {
             tc_fail(400, $bad, 'The snapshot was rejected: ' . $bad . '.');
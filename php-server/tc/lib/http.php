@@ -12,6 +12,20 @@
 // legitimately exceeds it and says so explicitly; everything else stays here.
 const TC_BODY_MAX = 1048576;
 
+// What a compressed body may expand to. The limit above is on the bytes that
+// travel, which is what the host's own request limits and the upload time
+// are about; this one is on what has to fit in memory once it is unpacked,
+// and a few kilobytes of gzip can claim gigabytes. Four times the wire limit
+// leaves room for operations with long notes, which is where compression
+// earns its keep, without letting a body balloon past what a shared host's
+// memory_limit survives decoding.
+const TC_BODY_INFLATED_MAX = 4194304;
+
+// The request encodings this server understands, best first. Advertised in
+// the head reply so a client only ever compresses for a server that said it
+// can read the result - an older one would take the bytes for broken JSON.
+const TC_ENCODINGS = ['gzip', 'deflate'];
+
 function tc_send_headers($code)
 {
     http_response_code($code);
@@ -42,6 +56,68 @@ function tc_ok(array $payload = [])
     tc_json(200, ['ok' => true] + $payload);
 }
 
+/**
+ * The encodings a client may compress request bodies with, or none.
+ *
+ * Empty when zlib's incremental interface is missing - the extension is
+ * optional, and promising what tc_inflate() cannot deliver would turn every
+ * compressed push into a failure.
+ */
+function tc_encodings()
+{
+    return function_exists('inflate_init') ? TC_ENCODINGS : [];
+}
+
+/**
+ * Compresses the reply when the client asked for it.
+ *
+ * ob_gzhandler does the negotiation itself - it reads Accept-Encoding, sets
+ * Content-Encoding and Vary, and passes the bytes through untouched for a
+ * client that did not ask. Skipped when the host already compresses
+ * everything through zlib.output_compression, which would otherwise encode
+ * the reply twice.
+ */
+function tc_compress_output()
+{
+    if (extension_loaded('zlib') && !ini_get('zlib.output_compression')) {
+        ob_start('ob_gzhandler');
+    }
+}
+
+/**
+ * Unpacks a compressed body, refusing it once it passes $limit.
+ *
+ * Fed through in small pieces rather than handed to gzdecode() whole, so the
+ * limit is checked as the output grows instead of after all of it has been
+ * allocated - the difference between refusing a compression bomb and being
+ * killed by one.
+ *
+ * @param string $encoding One of TC_ENCODINGS.
+ */
+function tc_inflate($raw, $encoding, $limit)
+{
+    $context = @inflate_init($encoding === 'gzip' ? ZLIB_ENCODING_GZIP : ZLIB_ENCODING_DEFLATE);
+    if ($context === false) {
+        tc_fail(415, 'unsupported_encoding', 'This server cannot read ' . $encoding . ' bodies.');
+    }
+    $out = '';
+    $length = strlen($raw);
+    for ($at = 0; $at < $length; $at += 8192) {
+        $last = $at + 8192 >= $length;
+        $piece = @inflate_add($context, substr($raw, $at, 8192),
+                              $last ? ZLIB_FINISH : ZLIB_SYNC_FLUSH);
+        if ($piece === false) {
+            tc_fail(400, 'bad_encoding', 'The request body is not valid ' . $encoding . '.');
+        }
+        $out .= $piece;
+        if (strlen($out) > $limit) {
+            tc_fail(413, 'body_too_large',
+                    'The request body expands past ' . $limit . ' bytes.');
+        }
+    }
+    return $out;
+}
+
 /**
  * Reads the request body as it arrived, refusing anything over the limit.
  *
@@ -52,11 +128,15 @@ function tc_ok(array $payload = [])
  * simply gone. Refusing is the only safe answer, and the client can then send
  * the batch in smaller pieces.
  *
- * @param int $limit Bytes. Raised only for the snapshot upload, which is a
- *                   whole document by nature and is read only after the
- *                   token has been checked.
+ * A body sent with Content-Encoding is unpacked here, so every caller sees
+ * the document itself whichever way it travelled.
+ *
+ * @param int $limit         Bytes on the wire. Raised only for the snapshot
+ *                           upload, which is a whole document by nature and
+ *                           is read only after the token has been checked.
+ * @param int $inflatedLimit Bytes once unpacked, for a compressed body.
  */
-function tc_raw_body($limit = TC_BODY_MAX)
+function tc_raw_body($limit = TC_BODY_MAX, $inflatedLimit = TC_BODY_INFLATED_MAX)
 {
     $raw = file_get_contents('php://input', false, null, 0, $limit + 1);
     if ($raw === false) {
@@ -66,7 +146,14 @@ function tc_raw_body($limit = TC_BODY_MAX)
         tc_fail(413, 'body_too_large',
                 'The request body exceeds ' . $limit . ' bytes.');
     }
-    return $raw;
+    $encoding = strtolower(trim($_SERVER['HTTP_CONTENT_ENCODING'] ?? ''));
+    if ($encoding === '' || $encoding === 'identity' || $raw === '') {
+        return $raw;
+    }
+    if (!in_array($encoding, tc_encodings(), true)) {
+        tc_fail(415, 'unsupported_encoding', 'This server cannot read ' . $encoding . ' bodies.');
+    }
+    return tc_inflate($raw, $encoding, $inflatedLimit);
 }
 
 /**
@@ -76,9 +163,9 @@ function tc_raw_body($limit = TC_BODY_MAX)
  * anyone, and neither an enormous body nor a deeply nested structure should
  * be able to exhaust memory before the credential has even been looked at.
  */
-function tc_body($limit = TC_BODY_MAX)
+function tc_body($limit = TC_BODY_MAX, $inflatedLimit = TC_BODY_INFLATED_MAX)
 {
-    $raw = tc_raw_body($limit);
+    $raw = tc_raw_body($limit, $inflatedLimit);
     if ($raw === '') {
         return [];
     }
@@ -37,6 +37,12 @@ const TC_PULL_MAX_OPS  = 500;
 // client can recognise and stop retrying on.
 const TC_SNAPSHOT_MAX_BYTES = 4194304;   // 4 MiB
 
+// The same document unpacked, for one that arrived compressed. Its size on
+// the wire is what TC_SNAPSHOT_MAX_BYTES bounds; this bounds what is decoded
+// for validation and stored. Twice rather than four times the wire limit, as
+// ordinary bodies get: the whole document is decoded at once here.
+const TC_SNAPSHOT_MAX_INFLATED = 8388608;   // 8 MiB
+
 // How long the segments a snapshot replaced stay on disk. Space is not the
 // urgent problem - months of growth is - and a snapshot that turns out to be
 // wrong is only discovered by someone noticing, which takes days rather than
@@ -392,7 +398,7 @@ function tc_snapshot_validate($raw)
     if ($raw === '') {
         return 'snapshot_empty';
     }
-    if (strlen($raw) > TC_SNAPSHOT_MAX_BYTES) {
+    if (strlen($raw) > TC_SNAPSHOT_MAX_INFLATED) {
         return 'snapshot_too_large';
     }
     $doc = json_decode($raw, true, 64);
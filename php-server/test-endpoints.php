@@ -18,6 +18,7 @@
  */
 
 require_once __DIR__ . '/tc/lib/store.php';
+require_once __DIR__ . '/tc/lib/http.php';   // the body limits
 
 const TC_BCRYPT_COST_TEST = 4;   // this is a test, not a password store
 
@@ -67,14 +68,17 @@ function tc_copytree($from, $to)
 }
 
 /**
- * One request. Returns [status, decoded body, raw body].
+ * One request. Returns [status, decoded body, raw body, response headers].
+ *
+ * @param array $headers Further request headers, as complete lines.
  */
-function tc_request($base, $method, $query, $body = null, $token = null)
+function tc_request($base, $method, $query, $body = null, $token = null, array $headers = [])
 {
     $context = ['http' => [
         'method' => $method,
         'header' => "Content-Type: application/json\r\n"
-                    . ($token ? "X-TC-Token: $token\r\n" : ''),
+                    . ($token ? "X-TC-Token: $token\r\n" : '')
+                    . implode('', array_map(function ($h) { return $h . "\r\n"; }, $headers)),
         'ignore_errors' => true,
         'timeout' => 15,
     ]];
@@ -89,7 +93,7 @@ function tc_request($base, $method, $query, $body = null, $token = null)
             $status = (int)$m[1];
         }
     }
-    return [$status, json_decode((string)$raw, true), (string)$raw];
+    return [$status, json_decode((string)$raw, true), (string)$raw, $http_response_header ?? []];
 }
 
 // --- set up a throwaway installation ---------------------------------------
@@ -280,5 +284,74 @@ tc_check('a push past the ordinary limit still is too',
          $status === 413 && ($body['error'] ?? '') === 'body_too_large',
          $status . ' ' . json_encode($body));
 
+print("\nCompressed bodies\n");
+[$status, $body] = tc_request($base, 'GET', ['a' => 'head'], null, $token);
+tc_check('head says which encodings are read',
+         in_array('gzip', $body['encodings'] ?? [], true), json_encode($body));
+$head = (int)($body['head'] ?? 0);
+
+// Past the ordinary limit unpacked, far below it on the wire. The limit is
+// about the bytes that travel, so this one is taken.
+$notes = json_encode(['base_seq' => $head, 'ops' => [
+    ['op' => 'task.set', 'lc' => 901, 'uid' => sprintf('%016x', 9),
+     'f' => ['note' => str_repeat('Prüfstand ', 150000)]]]], JSON_UNESCAPED_UNICODE);
+[$status, $body] = tc_request($base, 'POST', ['a' => 'push'], gzencode($notes), $token,
+                              ['Content-Encoding: gzip']);
+tc_check('a gzip push is unpacked and appended',
+         $status === 200 && ($body['head'] ?? 0) === $head + 1,
+         $status . ' ' . json_encode($body));
+
+$small = json_encode(['base_seq' => $head + 1, 'ops' => [
+    ['op' => 'task.set', 'lc' => 902, 'uid' => sprintf('%016x', 9), 'f' => ['priority' => 2]]]]);
+[$status, $body] = tc_request($base, 'POST', ['a' => 'push'], gzcompress($small), $token,
+                              ['Content-Encoding: deflate']);
+tc_check('and so is a deflate one',
+         $status === 200 && ($body['head'] ?? 0) === $head + 2,
+         $status . ' ' . json_encode($body));
+
+[$status, $body, $raw, $headers] = tc_request($base, 'GET', ['a' => 'pull', 'since' => $head],
+                                              null, $token, ['Accept-Encoding: gzip']);
+$decoded = json_decode((string)@gzdecode($raw), true);
+tc_check('a reply is compressed for a client that accepts it',
+         preg_grep('/^Content-Encoding:\s*gzip/i', $headers) && is_array($decoded),
+         implode(' | ', $headers));
+tc_check('and unpacks to the operations pushed',
+         count($decoded['ops'] ?? []) === 2
+         && strlen($decoded['ops'][0]['f']['note'] ?? '') === strlen(str_repeat('Prüfstand ', 150000)));
+
+$bomb = json_encode(['base_seq' => 0, 'ops' => [
+    ['op' => 'task.set', 'lc' => 903, 'uid' => sprintf('%016x', 9),
+     'f' => ['note' => str_repeat('x', TC_BODY_INFLATED_MAX)]]]]);
+[$status, $body] = tc_request($base, 'POST', ['a' => 'push'], gzencode($bomb), $token,
+                              ['Content-Encoding: gzip']);
+tc_check('one that expands past its own limit is refused',
+         $status === 413 && ($body['error'] ?? '') === 'body_too_large',
+         $status . ' ' . json_encode($body));
+
+[$status, $body] = tc_request($base, 'POST', ['a' => 'push'], 'not gzip at all', $token,
+                              ['Content-Encoding: gzip']);
+tc_check('a body that is not what it claims',
+         $status === 400 && ($body['error'] ?? '') === 'bad_encoding',
+         $status . ' ' . json_encode($body));
+
+[$status, $body] = tc_request($base, 'POST', ['a' => 'push'], $small, $token,
+                              ['Content-Encoding: br']);
+tc_check('an encoding this server does not read',
+         $status === 415 && ($body['error'] ?? '') === 'unsupported_encoding',
+         $status . ' ' . json_encode($body));
+
+$large = $document;
+$large['projects'][0]['tasks'] = [[
+    'uid' => sprintf('%016x', 2), 'id' => 1, 'task_name' => 'gross',
+    'note' => str_repeat('x', 6 * 1024 * 1024), 'status' => 'open',
+    'time_entries' => [],
+]];
+[$status, $body] = tc_request($base, 'POST', ['a' => 'snapshot', 'seq' => $head + 2],
+                              gzencode(json_encode($large, JSON_UNESCAPED_UNICODE)), $token,
+                              ['Content-Encoding: gzip']);
+tc_check('a snapshot past the wire limit unpacked, but not packed, is taken',
+         $status === 200 && ($body['snapshot_seq'] ?? 0) === $head + 2,
+         $status . ' ' . json_encode($body));
+
 printf("\n%d tests, %d failed\n", $GLOBALS['tc_tests'], $GLOBALS['tc_failed']);
 exit($GLOBALS['tc_failed'] === 0 ? 0 : 1);
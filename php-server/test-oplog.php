@@ -188,7 +188,7 @@ tc_test('bodies that are not a document', function ($store, $uid) {
     tc_assert_same('snapshot_has_no_projects', tc_snapshot_validate('{"projects":[]}'),
                    'an empty document');
     tc_assert_same('snapshot_too_large',
-                   tc_snapshot_validate('{"projects":[' . str_repeat('0', TC_SNAPSHOT_MAX_BYTES) . ']}'),
+                   tc_snapshot_validate('{"projects":[' . str_repeat('0', TC_SNAPSHOT_MAX_INFLATED) . ']}'),
                    'past the size limit');
     tc_assert_same(null, tc_snapshot_validate(tc_document()), 'a real document');
 });
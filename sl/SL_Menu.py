@@ -5,6 +5,7 @@ import sys
 import re
 import time
 import contextlib
+import threading
 from datetime import datetime, timedelta
 import shutil
 
@@ -338,7 +339,13 @@ else:
     # Reload from disk on every rerun (i.e. on every click/navigation), so
     # changes made by another process sharing the same data file - the SOAP
     # server, or the optional MCP server used by Claude - show up here too,
-    # without needing to restart the whole GUI session. _save_data() writes
+    # without needing to restart the whole GUI session. Only when the file
+    # actually changed, though: a rerun happens on every widget change, and
+    # re-parsing and migrating a large file each time made typing into a
+    # form visibly sluggish. The check is one stat() call; the tracker's
+    # own saves (including the synchronisation apply below, which writes
+    # through this same instance) update the token, so they never count
+    # as an outside change. _save_data() writes
     # atomically (temp file + os.replace), but this stays wrapped as a
     # defensive fallback: if the reload ever lands on an unreadable file
     # (e.g. a transient OS/antivirus lock), keep the previously loaded data
@@ -346,7 +353,7 @@ else:
     # runs on every auto-refresh tick too, used to reset the visible view
     # back to the main menu once the user reloaded after such a crash.
     try:
-        st.session_state.tracker.reload_data()
+        st.session_state.tracker.reload_if_changed()
     except (json.JSONDecodeError, OSError):
         pass
 
@@ -500,16 +507,39 @@ def _settings_section(section_key, label):
         finally:
             st.session_state.settings_expanded_sections[section_key] = st.session_state[widget_key]
 
+def _external_changes_waiting():
+    """
+    Whether a full rerun would show anything new: another process has
+    replaced the data file since this session last read or saved it, or the
+    synchronisation worker has filed records that the next run would apply.
+    Two stat() calls - nothing is read.
+    """
+    try:
+        if st.session_state.tracker.changed_on_disk():
+            return True
+    except Exception:
+        return True
+    if SYNC_AVAILABLE and st.session_state.tracker.op_outbox is not None:
+        return sync_engine.inbox_waiting()
+    return False
+
+
 @st.fragment(run_every=5)
 def _auto_refresh_on_external_changes():
     """
-    Periodically triggers a full rerun so changes made by another process
-    sharing the same data file (in particular the optional MCP server used
-    by Claude) become visible on their own, without the user needing to
-    click or navigate first. Only called while MCP is in use in some form
-    (see the call site below) - with the stdio transport this is always,
-    since an MCP client can be spawning that process independently of what
-    this app's own config says, so there's no reliable way to know it isn't.
+    Triggers a full rerun once changes made by another process sharing the
+    same data file (in particular the optional MCP server used by Claude), or
+    changes fetched by synchronisation, are waiting - so they become visible
+    on their own, without the user needing to click or navigate first. Only
+    called while MCP or synchronisation is in use (see the call site below)
+    - with the stdio transport this is always, since an MCP client can be
+    spawning that process independently of what this app's own config says,
+    so there's no reliable way to know it isn't.
+
+    The timer itself still ticks every `run_every` seconds, but a tick only
+    costs the stat() calls in _external_changes_waiting(). It used to rerun
+    the whole script unconditionally, which on an idle machine meant a
+    redraw - and a browser repaint - every five seconds for nothing.
 
     This function is invoked two different ways: inline, as a normal part of
     every full script run (a click anywhere in the app, navigate_to(), ...),
@@ -534,7 +564,7 @@ def _auto_refresh_on_external_changes():
     """
     ctx = get_script_run_ctx() if get_script_run_ctx else None
     if ctx is not None:
-        if ctx.fragment_ids_this_run:
+        if ctx.fragment_ids_this_run and _external_changes_waiting():
             st.rerun()
         return
 
@@ -544,7 +574,8 @@ def _auto_refresh_on_external_changes():
     now = time.monotonic()
     last_refresh = st.session_state.get("_last_auto_refresh")
     st.session_state["_last_auto_refresh"] = now
-    if last_refresh is not None and (now - last_refresh) >= 4:
+    if (last_refresh is not None and (now - last_refresh) >= 4
+            and _external_changes_waiting()):
         st.rerun()
 
 # --- UI Components ---
@@ -772,10 +803,8 @@ def render_toolbar(return_to):
     with t_col_report:
         with st.popover("▥", help=_("Reporting"), key="toolbar_report_popover"):
             if st.button(_("Daily Report (Today)"), use_container_width=True, key="pop_report_today"):
-                report = st.session_state.tracker.generate_daily_report()
                 st.session_state.context['return_to'] = return_to
-                st.session_state.context['report'] = report
-                navigate_to('view_report')
+                _request_report('generate_daily_report', datetime.now().date())
             if st.button(_("Daily Report (Specific Day)"), use_container_width=True, key="pop_report_spec"):
                 st.session_state.context['return_to'] = return_to
                 navigate_to('report_specific_day')
@@ -873,6 +902,391 @@ def view_work():
                 _task_planning_body()
 
 
+# The two working tabs used to rebuild their lists - list_tasks(), then
+# grouping, filtering and sorting - on every rerun, i.e. on every checkbox,
+# expander or tab click. The result only depends on the document and on the
+# options picked, so it is built once per change of either and shared: the
+# cache is keyed by the tracker's generation (which moves with every save and
+# every reload, see TimeTracker.generation) and by today's date, because the
+# due-date filters measure against it. Sessions holding the same document hit
+# the same entries. The tracker itself is passed underscored, which is
+# Streamlit's way of leaving an argument out of the cache key.
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _today_view_model(generation, day, show_only_open, sort_by_priority, _tracker):
+    """
+    Today's tasks, grouped by main project.
+
+    :return: (groups, any_today) - groups is a list of (main project name,
+             tasks) pairs in display order; any_today says whether anything
+             is marked for today at all, before the open-only filter.
+    """
+    today_tasks_all = [t for t in _tracker.list_tasks(status_filter='open') if t.get('today')]
+    today_tasks = [t for t in today_tasks_all if t.get('status') != 'done'] if show_only_open else today_tasks_all
+
+    grouped = {}
+    for task in today_tasks:
+        grouped.setdefault(task['main_project_name'], []).append(task)
+    if sort_by_priority:
+        # Sorted within each project group rather than flattened across
+        # all of them, so the existing per-project grouping/expanders
+        # stay intact - a stable sort keeps same-priority tasks in their
+        # original relative order.
+        for tasks_in_group in grouped.values():
+            tasks_in_group.sort(key=lambda t: t.get('priority', 0), reverse=True)
+    return list(grouped.items()), bool(today_tasks_all)
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _planning_view_model(generation, day, planning_filter, _tracker):
+    """
+    The task planning list for one filter.
+
+    :return: A list of (group, tasks) pairs in display order. For the weekly
+             overview a group is a weekday index (0 = Monday), starting at
+             today's; otherwise it is a main project name.
+    """
+    tasks = _tracker.list_tasks(planning_filter=planning_filter)
+    if planning_filter != 'weekly':
+        grouped = {}
+        for task in tasks:
+            grouped.setdefault(task['main_project_name'], []).append(task)
+        return list(grouped.items())
+
+    tasks_by_day = {}
+    for task in tasks:
+        due = task.get('due_date')
+        if due:
+            try:
+                day_idx = datetime.fromisoformat(due).weekday()
+                tasks_by_day.setdefault(day_idx, []).append(task)
+            except (ValueError, TypeError):
+                continue
+    # Start the overview at the current weekday
+    current_weekday = datetime.fromisoformat(day).weekday()
+    order = [(current_weekday + i) % 7 for i in range(7)]
+    return [(day_idx, tasks_by_day[day_idx]) for day_idx in order if day_idx in tasks_by_day]
+
+
+# Every button in the two task lists used to end in a full st.rerun(), which
+# runs this whole script again - reload check, synchronisation, toolbar,
+# header - just to redraw one row. Each group (a main project, or a weekday
+# in the weekly overview) is therefore a fragment of its own: a click inside
+# it reruns only that group. Groups rather than single rows, because a change
+# to one row can change its neighbours - marking a task done can hide it and
+# so change the count in the group's title, and a new priority can move it.
+# Whatever also shows elsewhere on the page still reruns the whole app:
+# starting work, and finishing the task the current-work banner is showing.
+#
+# A fragment rerun calls the function again with the arguments of its first
+# call, so the groups look their tasks up again rather than being handed
+# them - from the cached view models above, which costs nothing until a
+# change actually moved the generation.
+
+def _rerun_fragment():
+    """
+    Reruns the fragment this is called from, or the whole app when called
+    as part of a full run, where a fragment-scoped rerun is not allowed.
+    """
+    ctx = get_script_run_ctx() if get_script_run_ctx else None
+    if ctx is not None and ctx.fragment_ids_this_run:
+        st.rerun(scope="fragment")
+    st.rerun()
+
+
+# Streamlit's cost is per widget, and every task row is five of them: a
+# project with a few hundred tasks took seconds to draw and to send to the
+# browser. Lists longer than this are drawn a page at a time.
+_LIST_PAGE_SIZE = 25
+
+
+def _page_of(items, key, page_size=_LIST_PAGE_SIZE):
+    """
+    Draws jump controls above a long list and returns the part to show.
+
+    The page is kept in a plain session-state key, for the same reason as
+    the expander states above: it should survive a trip to the edit form and
+    back. A list no longer than one page is returned whole, without controls.
+
+    :param items: The full list.
+    :param key: A prefix unique to this list, for the state and the buttons.
+    :return: (offset of the first item shown, the items on the page)
+    """
+    if len(items) <= page_size:
+        return 0, items
+    state_key = f"{key}_page"
+    last_page = (len(items) - 1) // page_size
+    # The list can have shrunk since the page was picked.
+    page = min(st.session_state.get(state_key, 0), last_page)
+    st.session_state[state_key] = page
+
+    def go_to(target):
+        st.session_state[state_key] = target
+
+    start = page * page_size
+    end = min(start + page_size, len(items))
+    col_first, col_prev, col_position, col_next, col_last = st.columns([1, 1, 8, 1, 1])
+    with col_first:
+        st.button("⏮", key=f"{key}_first", disabled=page == 0, on_click=go_to, args=(0,))
+    with col_prev:
+        st.button("◀", key=f"{key}_prev", disabled=page == 0, on_click=go_to, args=(page - 1,))
+    with col_position:
+        st.caption(f"{start + 1}–{end} / {len(items)}")
+    with col_next:
+        st.button("▶", key=f"{key}_next", disabled=page == last_page, on_click=go_to, args=(page + 1,))
+    with col_last:
+        st.button("⏭", key=f"{key}_last", disabled=page == last_page, on_click=go_to, args=(last_page,))
+    return start, items[start:end]
+
+
+def _planning_group_tasks(planning_filter, group):
+    """This group's tasks from the planning view model, or None if it is gone."""
+    tracker = st.session_state.tracker
+    groups = _planning_view_model(
+        tracker.generation, datetime.now().date().isoformat(), planning_filter, tracker)
+    return dict(groups).get(group)
+
+
+@st.fragment
+def _planning_weekday_group(planning_filter, day_idx):
+    """One weekday of the weekly overview in the task planning tab."""
+    day_tasks = _planning_group_tasks(planning_filter, day_idx)
+    if day_tasks is None:
+        # The last task left this day; the page around it changes shape.
+        st.rerun()
+    current_work = st.session_state.tracker.get_current_work()
+    weekday_names = [_("Monday"), _("Tuesday"), _("Wednesday"), _("Thursday"), _("Friday"), _("Saturday"), _("Sunday")]
+    st.subheader(weekday_names[day_idx])
+    offset, page = _page_of(day_tasks, f"task_planning_weekly_{day_idx}")
+    # Layout für jede Aufgabe mit Bearbeiten-Button
+    for t_idx, task in enumerate(page, start=offset):
+        col_task, col_start_btn, col_edit_btn, col_today_btn, col_done_btn = st.columns([10, 1, 1, 1, 1])
+        with col_task:
+            name = task['task_name']
+            is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
+            is_done = task.get('status') == 'done'
+            display_name = f"{name} (done)" if is_done else name
+            if is_active: display_name = f"**{display_name}**"
+            today_info = " ⭐" if task.get('today') else ""
+            recurring_info = " ↻" if task.get('recurring') else ""
+            priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
+            if is_active:
+                bullet = "🔨"
+            elif is_done:
+                bullet = "✔"
+            else:
+                bullet = "-"
+            st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> **{task['main_project_name']}**: {display_name}{today_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
+        with col_start_btn:
+            if st.button("▶", key=f"start_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or task.get('status') == 'done'):
+                st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
+                st.rerun()
+        with col_edit_btn:
+            if st.button("✎", key=f"edit_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
+                st.session_state.context['selected_main'] = task['main_project_name']
+                st.session_state.context['selected_task'] = task['task_name']
+                st.session_state.context['selected_task_id'] = task.get('id')
+                st.session_state.context['return_to'] = 'task_planning'
+                navigate_to('edit_task_form')
+        with col_today_btn:
+            if st.button("★", key=f"today_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Today"), disabled=task.get('today', False)):
+                st.session_state.tracker.update_task(
+                    task['main_project_name'],
+                    task['task_name'],
+                    today=not task.get('today', False),
+                    recurring=task.get('recurring'),
+                    frequency=task.get('frequency'),
+                    userdefined_days=task.get('userdefined_days'),
+                    task_id=task.get('id'),
+                )
+                _rerun_fragment()
+        with col_done_btn:
+            if st.button("✓", key=f"done_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
+                st.session_state.tracker.update_task(
+                    task['main_project_name'],
+                    task['task_name'],
+                    status='done',
+                    recurring=task.get('recurring'),
+                    frequency=task.get('frequency'),
+                    userdefined_days=task.get('userdefined_days'),
+                    task_id=task.get('id'),
+                )
+                # The current-work banner shows this task too.
+                if is_active:
+                    st.rerun()
+                _rerun_fragment()
+
+
+@st.fragment
+def _planning_project_group(planning_filter, main_proj_name):
+    """One main project's expander in the task planning tab."""
+    sub_tasks = _planning_group_tasks(planning_filter, main_proj_name)
+    if sub_tasks is None:
+        st.rerun()
+    current_work = st.session_state.tracker.get_current_work()
+    expander_key = f"task_planning_expander_{main_proj_name}"
+    is_expanded = st.session_state.task_planning_expanded_projects.get(main_proj_name, True)
+    with st.expander(f"{main_proj_name} ({len(sub_tasks)})", expanded=is_expanded, key=expander_key, on_change="rerun"):
+        # The mirror-update in the `finally` below has to run even
+        # when a button below calls st.rerun() (or navigate_to(),
+        # which does the same) - that raises an exception to
+        # unwind the script right here, which would otherwise
+        # skip the mirror-update and snap this project's group
+        # shut instead of leaving it open on the way to/from
+        # editing a task.
+        try:
+            offset, page = _page_of(sub_tasks, expander_key)
+            for t_idx, task in enumerate(page, start=offset):
+                col_task, col_start_btn, col_edit_btn, col_today_btn, col_done_btn = st.columns([10, 1, 1, 1, 1])
+                with col_task:
+                    name = task['task_name']
+                    status = task.get('status')
+                    is_done = status == 'done'
+                    is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
+                    display_name = f"{name} (done)" if is_done else name
+                    if is_active: display_name = f"**{display_name}**"
+                    due_info = f" ({_('Due')}: {task['due_date']})" if task.get('due_date') else ""
+                    today_info = " ⭐" if task.get('today') else ""
+                    recurring_info = " ↻" if task.get('recurring') else ""
+                    priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
+                    if is_active:
+                        bullet = "🔨"
+                    elif is_done:
+                        bullet = "✔"
+                    else:
+                        bullet = "-"
+                    st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> {display_name}{due_info}{today_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
+                with col_start_btn:
+                    if st.button("▶", key=f"start_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or status == 'done'):
+                        st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
+                        st.rerun()
+                with col_edit_btn:
+                    if st.button("✎", key=f"edit_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
+                        st.session_state.context['selected_main'] = task['main_project_name']
+                        st.session_state.context['selected_task'] = task['task_name']
+                        st.session_state.context['selected_task_id'] = task.get('id')
+                        st.session_state.context['return_to'] = 'task_planning'
+                        navigate_to('edit_task_form')
+                with col_today_btn:
+                    if st.button("★", key=f"today_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Today"), disabled=task.get('today', False)):
+                        st.session_state.tracker.update_task(
+                            task['main_project_name'],
+                            task['task_name'],
+                            today=not task.get('today', False),
+                            recurring=task.get('recurring'),
+                            frequency=task.get('frequency'),
+                            userdefined_days=task.get('userdefined_days'),
+                            task_id=task.get('id'),
+                        )
+                        _rerun_fragment()
+                with col_done_btn:
+                    if st.button("✓", key=f"done_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
+                        st.session_state.tracker.update_task(
+                            task['main_project_name'],
+                            task['task_name'],
+                            status='done',
+                            recurring=task.get('recurring'),
+                            frequency=task.get('frequency'),
+                            userdefined_days=task.get('userdefined_days'),
+                            task_id=task.get('id'),
+                        )
+                        # The current-work banner shows this task too.
+                        if is_active:
+                            st.rerun()
+                        _rerun_fragment()
+        finally:
+            st.session_state.task_planning_expanded_projects[main_proj_name] = st.session_state[expander_key]
+
+
+@st.fragment
+def _today_project_group(main_proj_name):
+    """One main project's expander in the Today's Tasks tab."""
+    tracker = st.session_state.tracker
+    groups = _today_view_model(
+        tracker.generation, datetime.now().date().isoformat(),
+        st.session_state.today_show_only_open_value,
+        st.session_state.today_sort_by_priority_value, tracker)[0]
+    sub_tasks = dict(groups).get(main_proj_name)
+    if sub_tasks is None:
+        st.rerun()
+    current_work = tracker.get_current_work()
+    expander_key = f"today_expander_{main_proj_name}"
+    is_expanded = st.session_state.today_view_expanded_projects.get(main_proj_name, True)
+    with st.expander(f"{main_proj_name} ({len(sub_tasks)})", expanded=is_expanded, key=expander_key, on_change="rerun"):
+        # The mirror-update in the `finally` below has to run even
+        # when a button below calls st.rerun() (or navigate_to(),
+        # which does the same) - that raises an exception to unwind
+        # the script right here, which would otherwise skip the
+        # mirror-update and snap this project's group shut instead
+        # of leaving it open on the way to/from editing a task.
+        try:
+            offset, page = _page_of(sub_tasks, expander_key)
+            for t_idx, task in enumerate(page, start=offset): # Iterate through tasks in the group
+                col_task, col_priority, col_start_btn, col_edit_btn, col_done_btn = st.columns([7, 3, 1, 1, 1])
+                with col_task:
+                    name = task['task_name']
+                    status = task.get('status')
+                    is_done = status == 'done'
+                    is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
+                    display_name = f"{name} (done)" if is_done else name
+                    if is_active: display_name = f"**{display_name}**"
+                    due_info = f" ({_('Due')}: {task['due_date']})" if task.get('due_date') else ""
+                    recurring_info = " ↻" if task.get('recurring') else ""
+                    priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
+                    if is_active:
+                        bullet = "🔨"
+                    elif is_done:
+                        bullet = "✔"
+                    else:
+                        bullet = "-"
+                    st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> {display_name}{due_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
+                with col_priority:
+                    new_priority = st.number_input(
+                        _("Priority"), min_value=0, max_value=9,
+                        value=task.get('priority', 0), step=1,
+                        key=f"today_priority_{task['main_project_name']}_{task['task_name']}_{t_idx}",
+                        label_visibility="collapsed", help=_("0 (lowest) to 9 (highest)"),
+                    )
+                    if new_priority != task.get('priority', 0):
+                        st.session_state.tracker.update_task(
+                            task['main_project_name'],
+                            task['task_name'],
+                            recurring=task.get('recurring'),
+                            frequency=task.get('frequency'),
+                            userdefined_days=task.get('userdefined_days'),
+                            priority=new_priority,
+                            task_id=task.get('id'),
+                        )
+                        _rerun_fragment()
+                with col_start_btn:
+                    if st.button("▶", key=f"start_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or status == 'done'):
+                        st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
+                        st.rerun()
+                with col_edit_btn:
+                    if st.button("✎", key=f"edit_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
+                        st.session_state.context['selected_main'] = task['main_project_name']
+                        st.session_state.context['selected_task'] = task['task_name']
+                        st.session_state.context['selected_task_id'] = task.get('id')
+                        st.session_state.context['return_to'] = 'today_view'
+                        navigate_to('edit_task_form')
+                with col_done_btn:
+                    if st.button("✓", key=f"done_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
+                        st.session_state.tracker.update_task(
+                            task['main_project_name'],
+                            task['task_name'],
+                            status='done',
+                            recurring=task.get('recurring'),
+                            frequency=task.get('frequency'),
+                            userdefined_days=task.get('userdefined_days'),
+                            task_id=task.get('id'),
+                        )
+                        # The current-work banner shows this task too.
+                        if is_active:
+                            st.rerun()
+                        _rerun_fragment()
+        finally:
+            st.session_state.today_view_expanded_projects[main_proj_name] = st.session_state[expander_key]
+
 def _task_planning_body():
     """
     The task planning list: everything not closed, filtered by due date.
@@ -915,82 +1329,14 @@ def _task_planning_body():
 
     st.header(_("Tasks"))
 
-    current_work = st.session_state.tracker.get_current_work()
-    tasks = st.session_state.tracker.list_tasks(planning_filter=planning_filter)
+    tracker = st.session_state.tracker
+    task_groups = _planning_view_model(
+        tracker.generation, datetime.now().date().isoformat(), planning_filter, tracker)
 
-    if tasks:
+    if task_groups:
         if planning_filter == 'weekly':
-            weekday_names = [_("Monday"), _("Tuesday"), _("Wednesday"), _("Thursday"), _("Friday"), _("Saturday"), _("Sunday")]
-            tasks_by_day = {}
-            for task in tasks:
-                due = task.get('due_date')
-                if due:
-                    try:
-                        day_idx = datetime.fromisoformat(due).weekday()
-                        tasks_by_day.setdefault(day_idx, []).append(task)
-                    except (ValueError, TypeError):
-                        continue
-            
-            # Start the overview at the current weekday
-            current_weekday = datetime.now().weekday()
-            for i in range(7):
-                day_idx = (current_weekday + i) % 7
-                if day_idx in tasks_by_day:
-                    st.subheader(weekday_names[day_idx])
-                    # Layout für jede Aufgabe mit Bearbeiten-Button
-                    for t_idx, task in enumerate(tasks_by_day[day_idx]):
-                        col_task, col_start_btn, col_edit_btn, col_today_btn, col_done_btn = st.columns([10, 1, 1, 1, 1])
-                        with col_task:
-                            name = task['task_name']
-                            is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
-                            is_done = task.get('status') == 'done'
-                            display_name = f"{name} (done)" if is_done else name
-                            if is_active: display_name = f"**{display_name}**"
-                            today_info = " ⭐" if task.get('today') else ""
-                            recurring_info = " ↻" if task.get('recurring') else ""
-                            priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
-                            if is_active:
-                                bullet = "🔨"
-                            elif is_done:
-                                bullet = "✔"
-                            else:
-                                bullet = "-"
-                            st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> **{task['main_project_name']}**: {display_name}{today_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
-                        with col_start_btn:
-                            if st.button("▶", key=f"start_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or task.get('status') == 'done'):
-                                st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
-                                st.rerun()
-                        with col_edit_btn:
-                            if st.button("✎", key=f"edit_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
-                                st.session_state.context['selected_main'] = task['main_project_name']
-                                st.session_state.context['selected_task'] = task['task_name']
-                                st.session_state.context['selected_task_id'] = task.get('id')
-                                st.session_state.context['return_to'] = 'task_planning'
-                                navigate_to('edit_task_form')
-                        with col_today_btn:
-                            if st.button("★", key=f"today_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Today"), disabled=task.get('today', False)):
-                                st.session_state.tracker.update_task(
-                                    task['main_project_name'],
-                                    task['task_name'],
-                                    today=not task.get('today', False),
-                                    recurring=task.get('recurring'),
-                                    frequency=task.get('frequency'),
-                                    userdefined_days=task.get('userdefined_days'),
-                                    task_id=task.get('id'),
-                                )
-                                st.rerun()
-                        with col_done_btn:
-                            if st.button("✓", key=f"done_task_planning_weekly_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
-                                st.session_state.tracker.update_task(
-                                    task['main_project_name'],
-                                    task['task_name'],
-                                    status='done',
-                                    recurring=task.get('recurring'),
-                                    frequency=task.get('frequency'),
-                                    userdefined_days=task.get('userdefined_days'),
-                                    task_id=task.get('id'),
-                                )
-                                st.rerun()
+            for day_idx in dict(task_groups):
+                _planning_weekday_group(planning_filter, day_idx)
         else:
             # Group tasks by main project and show each group inside a
             # collapsible expander, so projects with many tasks don't crowd
@@ -1001,82 +1347,11 @@ def _task_planning_body():
             # the expander's own (key-bound) state would otherwise reset to
             # expanded every time this view is left (e.g. to edit a task)
             # and returned to.
-            tasks_grouped = {}
-            for task in tasks:
-                tasks_grouped.setdefault(task['main_project_name'], []).append(task)
-
             if "task_planning_expanded_projects" not in st.session_state:
                 st.session_state.task_planning_expanded_projects = {}
 
-            for main_proj_name, sub_tasks in tasks_grouped.items():
-                expander_key = f"task_planning_expander_{main_proj_name}"
-                is_expanded = st.session_state.task_planning_expanded_projects.get(main_proj_name, True)
-                with st.expander(f"{main_proj_name} ({len(sub_tasks)})", expanded=is_expanded, key=expander_key, on_change="rerun"):
-                    # The mirror-update in the `finally` below has to run even
-                    # when a button below calls st.rerun() (or navigate_to(),
-                    # which does the same) - that raises an exception to
-                    # unwind the script right here, which would otherwise
-                    # skip the mirror-update and snap this project's group
-                    # shut instead of leaving it open on the way to/from
-                    # editing a task.
-                    try:
-                        for t_idx, task in enumerate(sub_tasks):
-                            col_task, col_start_btn, col_edit_btn, col_today_btn, col_done_btn = st.columns([10, 1, 1, 1, 1])
-                            with col_task:
-                                name = task['task_name']
-                                status = task.get('status')
-                                is_done = status == 'done'
-                                is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
-                                display_name = f"{name} (done)" if is_done else name
-                                if is_active: display_name = f"**{display_name}**"
-                                due_info = f" ({_('Due')}: {task['due_date']})" if task.get('due_date') else ""
-                                today_info = " ⭐" if task.get('today') else ""
-                                recurring_info = " ↻" if task.get('recurring') else ""
-                                priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
-                                if is_active:
-                                    bullet = "🔨"
-                                elif is_done:
-                                    bullet = "✔"
-                                else:
-                                    bullet = "-"
-                                st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> {display_name}{due_info}{today_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
-                            with col_start_btn:
-                                if st.button("▶", key=f"start_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or status == 'done'):
-                                    st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
-                                    st.rerun()
-                            with col_edit_btn:
-                                if st.button("✎", key=f"edit_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
-                                    st.session_state.context['selected_main'] = task['main_project_name']
-                                    st.session_state.context['selected_task'] = task['task_name']
-                                    st.session_state.context['selected_task_id'] = task.get('id')
-                                    st.session_state.context['return_to'] = 'task_planning'
-                                    navigate_to('edit_task_form')
-                            with col_today_btn:
-                                if st.button("★", key=f"today_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Today"), disabled=task.get('today', False)):
-                                    st.session_state.tracker.update_task(
-                                        task['main_project_name'],
-                                        task['task_name'],
-                                        today=not task.get('today', False),
-                                        recurring=task.get('recurring'),
-                                        frequency=task.get('frequency'),
-                                        userdefined_days=task.get('userdefined_days'),
-                                        task_id=task.get('id'),
-                                    )
-                                    st.rerun()
-                            with col_done_btn:
-                                if st.button("✓", key=f"done_task_planning_{main_proj_name}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
-                                    st.session_state.tracker.update_task(
-                                        task['main_project_name'],
-                                        task['task_name'],
-                                        status='done',
-                                        recurring=task.get('recurring'),
-                                        frequency=task.get('frequency'),
-                                        userdefined_days=task.get('userdefined_days'),
-                                        task_id=task.get('id'),
-                                    )
-                                    st.rerun()
-                    finally:
-                        st.session_state.task_planning_expanded_projects[main_proj_name] = st.session_state[expander_key]
+            for main_proj_name in dict(task_groups):
+                _planning_project_group(planning_filter, main_proj_name)
     else:
         st.info(_("No tasks found."))
 
@@ -1134,10 +1409,6 @@ def _today_tasks_body():
     with st.container(key="today_view_work_divider"):
         st.divider()
 
-    # Here we show tasks that are explicitly marked as 'today' (⭐)
-    all_open = st.session_state.tracker.list_tasks(status_filter='open')
-    today_tasks_all = [t for t in all_open if t.get('today')]
-
     # A widget's own session-state entry (keyed via `key=`) is cleared by
     # Streamlit whenever the widget isn't instantiated during a script run
     # (e.g. while the edit-task form is showing) - so the checkbox appears to
@@ -1168,25 +1439,13 @@ def _today_tasks_body():
         )
         st.session_state.today_sort_by_priority_value = sort_by_priority
 
-    today_tasks = [t for t in today_tasks_all if t.get('status') != 'done'] if show_only_open else today_tasks_all
-
-    if today_tasks:
-        # Group tasks by main project for better organization
-        today_tasks_grouped = {}
-        for task in today_tasks:
-            main_proj = task['main_project_name']
-            if main_proj not in today_tasks_grouped:
-                today_tasks_grouped[main_proj] = []
-            today_tasks_grouped[main_proj].append(task)
-
-        if sort_by_priority:
-            # Sorted within each project group rather than flattened across
-            # all of them, so the existing per-project grouping/expanders
-            # stay intact - a stable sort keeps same-priority tasks in their
-            # original relative order.
-            for tasks_in_group in today_tasks_grouped.values():
-                tasks_in_group.sort(key=lambda t: t.get('priority', 0), reverse=True)
+    # Here we show tasks that are explicitly marked as 'today' (⭐)
+    tracker = st.session_state.tracker
+    today_tasks_grouped, any_today = _today_view_model(
+        tracker.generation, datetime.now().date().isoformat(),
+        show_only_open, sort_by_priority, tracker)
 
+    if today_tasks_grouped:
         # Each project's tasks are shown inside a collapsible expander so
         # projects with many tasks don't crowd out the rest of the list.
         # on_change="rerun" is required for st.expander to track its state in
@@ -1199,80 +1458,9 @@ def _today_tasks_body():
         if "today_view_expanded_projects" not in st.session_state:
             st.session_state.today_view_expanded_projects = {}
 
-        for main_proj_name, sub_tasks in today_tasks_grouped.items(): # Grouped by main project
-            expander_key = f"today_expander_{main_proj_name}"
-            is_expanded = st.session_state.today_view_expanded_projects.get(main_proj_name, True)
-            with st.expander(f"{main_proj_name} ({len(sub_tasks)})", expanded=is_expanded, key=expander_key, on_change="rerun"):
-                # The mirror-update in the `finally` below has to run even
-                # when a button below calls st.rerun() (or navigate_to(),
-                # which does the same) - that raises an exception to unwind
-                # the script right here, which would otherwise skip the
-                # mirror-update and snap this project's group shut instead
-                # of leaving it open on the way to/from editing a task.
-                try:
-                    for t_idx, task in enumerate(sub_tasks): # Iterate through tasks in the group
-                        col_task, col_priority, col_start_btn, col_edit_btn, col_done_btn = st.columns([7, 3, 1, 1, 1])
-                        with col_task:
-                            name = task['task_name']
-                            status = task.get('status')
-                            is_done = status == 'done'
-                            is_active = current_work and current_work['main_project_name'] == task['main_project_name'] and current_work['task_name'] == task['task_name']
-                            display_name = f"{name} (done)" if is_done else name
-                            if is_active: display_name = f"**{display_name}**"
-                            due_info = f" ({_('Due')}: {task['due_date']})" if task.get('due_date') else ""
-                            recurring_info = " ↻" if task.get('recurring') else ""
-                            priority_info = f" 🔺{task.get('priority', 0)}" if task.get('priority', 0) > 0 else ""
-                            if is_active:
-                                bullet = "🔨"
-                            elif is_done:
-                                bullet = "✔"
-                            else:
-                                bullet = "-"
-                            st.markdown(f"<span style='display: inline-block; width: 2rem;'>{bullet}</span> {display_name}{due_info}{recurring_info}{priority_info}", unsafe_allow_html=True)
-                        with col_priority:
-                            new_priority = st.number_input(
-                                _("Priority"), min_value=0, max_value=9,
-                                value=task.get('priority', 0), step=1,
-                                key=f"today_priority_{task['main_project_name']}_{task['task_name']}_{t_idx}",
-                                label_visibility="collapsed", help=_("0 (lowest) to 9 (highest)"),
-                            )
-                            if new_priority != task.get('priority', 0):
-                                st.session_state.tracker.update_task(
-                                    task['main_project_name'],
-                                    task['task_name'],
-                                    recurring=task.get('recurring'),
-                                    frequency=task.get('frequency'),
-                                    userdefined_days=task.get('userdefined_days'),
-                                    priority=new_priority,
-                                    task_id=task.get('id'),
-                                )
-                                st.rerun()
-                        with col_start_btn:
-                            if st.button("▶", key=f"start_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Start work on task"), disabled=is_active or status == 'done'):
-                                st.session_state.tracker.start_work(task['main_project_name'], task_id=task.get('id'))
-                                st.rerun()
-                        with col_edit_btn:
-                            if st.button("✎", key=f"edit_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Edit Task")):
-                                st.session_state.context['selected_main'] = task['main_project_name']
-                                st.session_state.context['selected_task'] = task['task_name']
-                                st.session_state.context['selected_task_id'] = task.get('id')
-                                st.session_state.context['return_to'] = 'today_view'
-                                navigate_to('edit_task_form')
-                        with col_done_btn:
-                            if st.button("✓", key=f"done_today_task_{task['main_project_name']}_{task['task_name']}_{t_idx}", help=_("Done"), disabled=is_done):
-                                st.session_state.tracker.update_task(
-                                    task['main_project_name'],
-                                    task['task_name'],
-                                    status='done',
-                                    recurring=task.get('recurring'),
-                                    frequency=task.get('frequency'),
-                                    userdefined_days=task.get('userdefined_days'),
-                                    task_id=task.get('id'),
-                                )
-                                st.rerun()
-                finally:
-                    st.session_state.today_view_expanded_projects[main_proj_name] = st.session_state[expander_key]
-    elif show_only_open and today_tasks_all:
+        for main_proj_name in dict(today_tasks_grouped): # Grouped by main project
+            _today_project_group(main_proj_name)
+    elif show_only_open and any_today:
         st.info(_("No open tasks for today."))
     else:
         st.info(_("No tasks for today."))
@@ -1551,11 +1739,8 @@ def view_reporting():
     tt = st.session_state.tracker
     
     if st.button(_("Daily Report (Today)"), use_container_width=True):
-        report = tt.generate_daily_report()
         st.session_state.context['return_to'] = 'reporting'
-        st.session_state.context['report'] = report
-        navigate_to('view_report')
-        st.rerun()
+        _request_report('generate_daily_report', datetime.now().date())
     if st.button(_("Daily Report (Specific Day)"), use_container_width=True):
         st.session_state.context['return_to'] = 'reporting'
         navigate_to('report_specific_day')
@@ -1685,6 +1870,22 @@ def view_settings():
                 # This code is unreachable due to os.execv in the called function
                 st.success(_("Restore complete. Please restart the application."))
 
+    with _settings_section("dependencies", _("Required Packages")):
+        # The check at startup is skipped while the environment looks
+        # unchanged since it last passed (see TimeTracker.
+        # _check_and_install_dependencies). This is the way round that, for
+        # a package removed in a way that went unnoticed.
+        st.caption(_("The startup check is skipped until packages are installed or removed."))
+        if st.button(_("Check again now"), use_container_width=True, key="settings_dependencies_btn"):
+            with st.spinner(_("Checking...")):
+                missing = st.session_state.tracker.initialize_dependencies(force=True)
+            if missing:
+                set_feedback(_("\nWarning: Some dependencies could not be installed: {packages}").format(
+                    packages=", ".join(missing)).strip(), 'error')
+            else:
+                set_feedback(_("All required packages are installed."))
+            st.rerun()
+
     with _settings_section("storage", _("Change Data Storage Location")):
         current_path = st.session_state.tracker.file_path
         st.markdown(f"**{_('Current data file')}:** `{current_path}`")
@@ -2352,6 +2553,17 @@ def view_list_inactive_tasks():
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'task_mgmt'))
 
+def _closed_tasks_table(rows):
+    """
+    Shows closed tasks as one read-only table.
+
+    Closed tasks pile up for as long as the data file lives, and nothing in
+    these lists is clickable - one markdown element per task made both
+    screens slow to open for no benefit. A single dataframe is one element
+    however long it gets, and scrolls and sorts in the browser.
+    """
+    st.dataframe(rows, hide_index=True, width="stretch")
+
 def view_list_closed_tasks():
     """
     Renders the view listing all closed tasks.
@@ -2359,19 +2571,18 @@ def view_list_closed_tasks():
     render_header(_("List All Closed Tasks"))
     
     main_projects = st.session_state.tracker.list_main_projects(status_filter='all')
-    found_any = False
+    closed_rows = []
     
     if main_projects:
         for mp in main_projects:
             mp_name = mp['main_project_name']
             closed_subs = st.session_state.tracker.list_tasks(main_project_name=mp_name, status_filter='closed')
-            if closed_subs:
-                found_any = True
-                st.markdown(f"**{mp_name}**")
-                for sp in closed_subs:
-                    st.markdown(f"- {sp['task_name']}")
+            for sp in closed_subs:
+                closed_rows.append({_("Project"): mp_name, _("Task"): sp['task_name']})
     
-    if not found_any:
+    if closed_rows:
+        _closed_tasks_table(closed_rows)
+    else:
         st.info(_("No closed tasks found."))
         
     if st.button(_("Back"), use_container_width=True):
@@ -2403,8 +2614,7 @@ def view_delete_all_closed_tasks():
     st.warning(_("Are you sure you want to delete {count} closed tasks? This action cannot be undone.").format(count=len(to_delete)))
     
     with st.expander(_("Show projects to delete")):
-        for mp, sp in to_delete:
-            st.markdown(f"- **{mp}** / {sp}")
+        _closed_tasks_table([{_("Project"): mp, _("Task"): sp} for mp, sp in to_delete])
 
     if st.button(_("Delete All"), type="primary", use_container_width=True):
         deleted_count = 0
@@ -2537,7 +2747,7 @@ def view_list_tasks():
     
     if tasks:
         st.markdown(_("Tasks for '{name}':").format(name=selected_main))
-        for t in tasks:
+        for t in _page_of(tasks, f"list_tasks_{selected_main}")[1]:
             name = t['task_name']
             status_text = f"({_('closed')})" if t['status'] == 'closed' else ""
             display_name = f"{name} (done)" if t['status'] == 'done' else name
@@ -3156,6 +3366,145 @@ def view_show_current_work():
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'today_view'))
 
+# --- Reports in the background ---
+#
+# A report used to be computed inside the script run that asked for it, and
+# a date range over a few years of data kept the whole interface frozen -
+# no redraw, no way out - until it was done. It now runs on a worker thread
+# while the result screen shows how far it got and offers to cancel.
+#
+# The worker reads its own copy of the document, loaded from the data file,
+# rather than the session's tracker: that one is reloaded and written by the
+# script thread while the report is being computed. Every save replaces the
+# file whole, so what the worker loads is always one consistent document,
+# and its generation says which. It loads it read-only: the worker must never
+# write the file the script thread owns, nor queue anything for sync.
+#
+# Finished reports are kept per session under (report, parameters,
+# generation), so going back to a report that was already computed - from
+# the result screen to the menu and back, say - shows it at once, and any
+# change to the data makes it be computed afresh.
+
+# Only the newest few: a report can be long, and session state lives for as
+# long as the browser tab does.
+_REPORT_CACHE_SIZE = 8
+# The reports that can say how far along they are; see summarize_date_range.
+_REPORTS_WITH_PROGRESS = {'generate_date_range_report'}
+
+
+class _ReportCancelled(Exception):
+    """Raised from a report's progress callback to abandon it."""
+
+
+class _ReportJob:
+    """One report being computed on a worker thread."""
+
+    def __init__(self, request):
+        self.request = request
+        self.done = 0
+        self.total = 0
+        self.cancelled = threading.Event()
+        self.finished = False
+        self.result = None
+        self.error = None
+        self.generation = None
+
+    def step(self, done, total):
+        """The progress callback handed to the report."""
+        if self.cancelled.is_set():
+            raise _ReportCancelled()
+        self.done, self.total = done, total
+
+    def run(self, file_path):
+        kind, args = self.request
+        try:
+            snapshot = TimeTracker(file_path=file_path, read_only=True)
+            self.generation = snapshot.generation
+            kwargs = {'progress': self.step} if kind in _REPORTS_WITH_PROGRESS else {}
+            self.result = getattr(snapshot, kind)(*args, **kwargs)
+        except _ReportCancelled:
+            pass
+        except Exception as exc:
+            self.error = str(exc)
+        finally:
+            self.finished = True
+
+
+def _request_report(kind, *args):
+    """
+    Opens the result screen for a report, which computes it in the
+    background unless it is already at hand.
+
+    :param kind: The name of the TimeTracker method that generates it.
+    :param args: Its arguments.
+    """
+    tracker = st.session_state.tracker
+    cached = st.session_state.get('report_results', {}).get((kind, args, tracker.generation))
+    if cached is not None:
+        # Generating a report copies it to the clipboard; one already at hand
+        # is copied here instead, once per request like a fresh one.
+        tracker._copy_to_clipboard(cached)
+    st.session_state.context['report_request'] = (kind, args)
+    navigate_to('view_report')
+
+
+def _report_for(request):
+    """
+    The finished report for a request, or None while it is being computed -
+    in which case the progress has been drawn in its place.
+    """
+    kind, args = request
+    tracker = st.session_state.tracker
+    results = st.session_state.setdefault('report_results', {})
+    cached = results.get((kind, args, tracker.generation))
+    if cached is not None:
+        return cached
+
+    job = st.session_state.get('report_job')
+    if job is not None and job.request == request and job.finished:
+        st.session_state.report_job = None
+        if job.error is not None:
+            st.error(job.error)
+            if st.button(_("Back"), use_container_width=True):
+                navigate_to(st.session_state.context.get('return_to', 'reporting'))
+            return None
+        if job.result is not None:
+            results[(kind, args, job.generation)] = job.result
+            while len(results) > _REPORT_CACHE_SIZE:
+                results.pop(next(iter(results)))
+            # Shown even if the data changed while it was being computed:
+            # it was current when it was asked for, and it says what it is.
+            return job.result
+        job = None
+
+    if job is None or job.request != request:
+        if job is not None:
+            job.cancelled.set()
+        job = _ReportJob(request)
+        st.session_state.report_job = job
+        threading.Thread(target=job.run, args=(tracker.file_path,), daemon=True).start()
+
+    _report_progress()
+    return None
+
+
+@st.fragment(run_every=0.5)
+def _report_progress():
+    """
+    Progress and a cancel button for the report being computed. Redraws only
+    itself while the worker runs, and the whole screen once it has finished.
+    """
+    job = st.session_state.get('report_job')
+    if job is None or job.finished:
+        st.rerun()
+    st.progress(job.done / job.total if job.total else 0.0)
+    if st.button(_("Cancel"), use_container_width=True, key="report_cancel_button"):
+        job.cancelled.set()
+        st.session_state.report_job = None
+        st.session_state.context.pop('report_request', None)
+        navigate_to(st.session_state.context.get('return_to', 'reporting'))
+
+
 def view_report_specific_day():
     """
     Renders the form to generate a daily report for a specific date.
@@ -3167,10 +3516,7 @@ def view_report_specific_day():
         submitted = st.form_submit_button(_("Generate Report"), use_container_width=True)
         
         if submitted:
-            report = st.session_state.tracker.generate_daily_report(selected_date)
-            st.session_state.context['report'] = report
-            navigate_to('view_report')
-            st.rerun()
+            _request_report('generate_daily_report', selected_date)
 
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'reporting'))
@@ -3194,10 +3540,7 @@ def view_report_date_range():
             if start_date > end_date:
                 st.error(_("Error: The start date cannot be after the end date."))
             else:
-                report = st.session_state.tracker.generate_date_range_report(start_date, end_date)
-                st.session_state.context['report'] = report
-                navigate_to('view_report')
-                st.rerun()
+                _request_report('generate_date_range_report', start_date, end_date)
 
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'reporting'))
@@ -3253,10 +3596,7 @@ def view_report_detailed_task_select_task():
     )
     selected_task = tasks[selected_idx]['task_name']
     if st.button(_("Generate Report"), use_container_width=True):
-        report = st.session_state.tracker.generate_task_report(main_project, selected_task)
-        st.session_state.context['report'] = report
-        navigate_to('view_report')
-        st.rerun()
+        _request_report('generate_task_report', main_project, selected_task)
 
     if st.button(_("Back"), use_container_width=True):
         navigate_to('report_detailed_task')
@@ -3280,10 +3620,7 @@ def view_report_detailed_main():
         selected_main = st.selectbox(_("Select Project"), main_options)
         submitted = st.form_submit_button(_("Generate Report"), use_container_width=True)
         if submitted:
-            report = st.session_state.tracker.generate_main_project_report(selected_main)
-            st.session_state.context['report'] = report
-            navigate_to('view_report')
-            st.rerun()
+            _request_report('generate_main_project_report', selected_main)
 
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'reporting'))
@@ -3299,10 +3636,7 @@ def view_report_detailed_daily():
         submitted = st.form_submit_button(_("Generate Report"), use_container_width=True)
 
         if submitted:
-            report = st.session_state.tracker.generate_detailed_daily_report(selected_date)
-            st.session_state.context['report'] = report
-            navigate_to('view_report')
-            st.rerun()
+            _request_report('generate_detailed_daily_report', selected_date)
 
     if st.button(_("Back"), use_container_width=True):
         navigate_to(st.session_state.context.get('return_to', 'reporting'))
@@ -3312,7 +3646,11 @@ def view_report_display():
     Renders the generated report content.
     """
     render_header(_("Report Result"))
-    report = st.session_state.context.get('report', '')
+    request = st.session_state.context.get('report_request')
+    report = _report_for(request) if request else ''
+    if report is None:
+        # Still being computed; _report_for has drawn the progress instead.
+        return
     
     config = get_config()
     report_format = config.get('report_format', 'markdown')
@@ -3432,7 +3770,10 @@ _MENUS_TO_SKIP_AUTOREFRESH = {
 }
 
 mcp_in_use = config.get('mcp_server_enabled', False) or config.get('mcp_transport', 'http') == 'stdio'
-if mcp_in_use and st.session_state.menu not in _MENUS_TO_SKIP_AUTOREFRESH:
+# Synchronisation counts too, now that an idle tick costs next to nothing:
+# what the worker fetched used to wait for the user's next click.
+sync_in_use = SYNC_AVAILABLE and st.session_state.tracker.op_outbox is not None
+if (mcp_in_use or sync_in_use) and st.session_state.menu not in _MENUS_TO_SKIP_AUTOREFRESH:
     _auto_refresh_on_external_changes()
 
 if st.session_state.menu in menu_map:
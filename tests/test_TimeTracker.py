@@ -1,9 +1,12 @@
 import unittest
 import unittest.mock
+import io
 import json
 import os
+import shutil
 import subprocess
 import sys
+import tempfile
 from datetime import datetime, timedelta, date
 
 # Add parent directory to path to import modules from root
@@ -25,7 +28,15 @@ class TestTimeTracker(unittest.TestCase):
         if os.path.exists(TEST_FILE_PATH):
             os.remove(TEST_FILE_PATH)
         self.tracker = TimeTracker(file_path=TEST_FILE_PATH)
-        
+        # The dependency check remembers complete environments per user; the
+        # tests must neither read what this machine has there nor add to it.
+        cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, cache_dir, ignore_errors=True)
+        cache = unittest.mock.patch('tt.TimeTracker._dependency_cache_path',
+                                    return_value=os.path.join(cache_dir, 'dependency_check.json'))
+        cache.start()
+        self.addCleanup(cache.stop)
+
     def tearDown(self):
         """Runs after each test to delete the temporary file."""
         if os.path.exists(TEST_FILE_PATH):
@@ -337,6 +348,86 @@ class TestTimeTracker(unittest.TestCase):
             [p["main_project_name"] for p in self.tracker.data["projects"]], ["Keep Me"]
         )
 
+    def test_reload_if_changed_skips_the_parse_for_its_own_saves(self):
+        """
+        The GUI checks on every rerun. Its own saves - and the synchronisation
+        apply, which writes through the same instance - must not count as an
+        outside change, or every click would still pay for a full reload.
+        """
+        self.tracker.add_main_project("Mine")
+        with unittest.mock.patch.object(self.tracker, 'reload_data') as reload:
+            self.assertFalse(self.tracker.reload_if_changed())
+        reload.assert_not_called()
+
+        other = TimeTracker(file_path=TEST_FILE_PATH)
+        other.add_main_project("Theirs")
+
+        self.assertTrue(self.tracker.reload_if_changed())
+        self.assertEqual(
+            [p["main_project_name"] for p in self.tracker.data["projects"]], ["Mine", "Theirs"]
+        )
+        self.assertFalse(self.tracker.reload_if_changed())
+
+    def test_generation_moves_with_every_save_and_only_then(self):
+        """The GUI caches its lists under this key; a stale key shows stale tasks."""
+        self.tracker.add_main_project("Gen")
+        before = self.tracker.generation
+        self.tracker.list_tasks()
+        self.assertEqual(self.tracker.generation, before)
+
+        self.tracker.add_task("Gen", "One")
+        self.assertNotEqual(self.tracker.generation, before)
+        self.assertEqual(TimeTracker(file_path=TEST_FILE_PATH).generation, self.tracker.generation)
+
+    def test_batch_saves_once_for_many_changes(self):
+        """A caller importing many tasks should not rewrite the file per task."""
+        self.tracker.add_main_project("Batch")
+        saves = []
+        real_save = TimeTracker._save_data
+        with unittest.mock.patch.object(
+                TimeTracker, '_save_data',
+                lambda tracker: (saves.append(1), real_save(tracker))[1]):
+            with self.tracker.batch():
+                for i in range(5):
+                    self.tracker.add_task("Batch", "Task %d" % i)
+                self.tracker.close_task("Batch", "Task 0")
+
+        # Every call still reaches _save_data; only the last one writes.
+        self.assertEqual(len(saves), 7)
+        reread = TimeTracker(file_path=TEST_FILE_PATH)
+        self.assertEqual(len(reread.list_tasks("Batch")), 5)
+        self.assertEqual(reread._get_task("Batch", "Task 0")["status"], TimeTracker.STATUS_CLOSED)
+
+    def test_batch_writes_nothing_before_it_ends(self):
+        self.tracker.add_main_project("Batch")
+        with self.tracker.batch():
+            self.tracker.add_task("Batch", "Pending")
+            on_disk = TimeTracker(file_path=TEST_FILE_PATH)
+            self.assertEqual(on_disk.list_tasks("Batch"), [])
+        self.assertEqual(len(TimeTracker(file_path=TEST_FILE_PATH).list_tasks("Batch")), 1)
+
+    def test_batch_is_all_or_nothing(self):
+        """A batch that fails part way leaves neither the file nor the tracker changed."""
+        self.tracker.add_main_project("Batch")
+        with self.assertRaises(RuntimeError):
+            with self.tracker.batch():
+                self.tracker.add_task("Batch", "First")
+                raise RuntimeError("second step failed")
+
+        self.assertEqual(self.tracker.list_tasks("Batch"), [])
+        self.assertEqual(TimeTracker(file_path=TEST_FILE_PATH).list_tasks("Batch"), [])
+        # And the tracker is usable again, outside any batch.
+        self.assertTrue(self.tracker.add_task("Batch", "After"))
+        self.assertEqual(len(TimeTracker(file_path=TEST_FILE_PATH).list_tasks("Batch")), 1)
+
+    def test_nested_batches_join_the_outer_one(self):
+        self.tracker.add_main_project("Batch")
+        with self.tracker.batch():
+            with self.tracker.batch():
+                self.tracker.add_task("Batch", "Inner")
+            self.assertEqual(TimeTracker(file_path=TEST_FILE_PATH).list_tasks("Batch"), [])
+        self.assertEqual(len(TimeTracker(file_path=TEST_FILE_PATH).list_tasks("Batch")), 1)
+
     def test_format_duration(self):
         """Tests the _format_duration helper method."""
         # Test case 1: 8 hours -> 0,200 DLP
@@ -454,6 +545,40 @@ class TestTimeTracker(unittest.TestCase):
         # since there is nothing new to restart into.
         mock_exit.assert_not_called()
 
+    def test_check_and_install_dependencies_remembers_a_complete_environment(self):
+        """
+        Listing every installed distribution takes seconds in a large
+        environment and used to happen for every new GUI session. Once an
+        environment is found complete, the listing is skipped until the
+        requirements (or the interpreter, or site-packages) change - or
+        until the user asks for a fresh check.
+        """
+        requirements = {'text': "packageA\n"}
+        real_open = open
+
+        def fake_open(path, *args, **kwargs):
+            if path == 'requirements.txt':
+                return io.StringIO(requirements['text'])
+            return real_open(path, *args, **kwargs)
+
+        mock_dist = unittest.mock.MagicMock()
+        mock_dist.metadata = {'Name': 'packageA'}
+        with unittest.mock.patch('tt.TimeTracker.distributions', return_value=[mock_dist]) as listing, \
+             unittest.mock.patch('os.path.exists', return_value=True), \
+             unittest.mock.patch('builtins.open', side_effect=fake_open):
+            self.assertEqual(self.tracker._check_and_install_dependencies(), [])
+            self.assertEqual(self.tracker._check_and_install_dependencies(), [])
+            self.assertEqual(listing.call_count, 1)
+
+            self.tracker.initialize_dependencies(force=True)
+            self.assertEqual(listing.call_count, 2)
+
+            requirements['text'] = "packageA\npackageB\n"
+            with unittest.mock.patch('subprocess.check_call', side_effect=subprocess.CalledProcessError(1, "pip")):
+                self.assertEqual(self.tracker._check_and_install_dependencies(), ["packageB"])
+                self.assertEqual(self.tracker._check_and_install_dependencies(), ["packageB"])
+            self.assertEqual(listing.call_count, 4)
+
     # --- General Method Tests ---
 
     def test_get_version(self):
@@ -629,6 +754,31 @@ class TestTimeTracker(unittest.TestCase):
             [n["uid"] for n in tracker.data["_deleted"]], ["recent0000000000"]
         )
 
+    def test_a_read_only_load_never_writes_or_records(self):
+        """
+        The GUI's report worker loads the file beside the script thread that
+        owns it: migration and the tombstone sweep happen in memory only, and
+        no sync queue is set up.
+        """
+        old = (datetime.now() - timedelta(days=TimeTracker.TOMBSTONE_RETENTION_DAYS + 1)).isoformat()
+        with open(TEST_FILE_PATH, 'w') as f:
+            json.dump({"projects": [], "_deleted": [{"uid": "expired000000000", "kind": "task", "at": old}]}, f)
+        with open(TEST_FILE_PATH, 'rb') as f:
+            on_disk = f.read()
+
+        with unittest.mock.patch('tt.sync_outbox.default_outbox_if_enabled') as outbox:
+            tracker = TimeTracker(file_path=TEST_FILE_PATH, read_only=True)
+
+        self.assertEqual(tracker.data["_deleted"], [])
+        self.assertEqual(tracker.data["schema_version"], TimeTracker.SCHEMA_VERSION)
+        outbox.assert_not_called()
+        self.assertIsNone(tracker.op_outbox)
+        with self.assertRaises(RuntimeError):
+            tracker._save_data()
+        tracker.reload_data()
+        with open(TEST_FILE_PATH, 'rb') as f:
+            self.assertEqual(f.read(), on_disk)
+
     def test_rename_main_project_success(self):
         """Tests the successful renaming of a main project."""
         self.tracker.add_main_project("Old Project Name")
@@ -1153,7 +1303,7 @@ class TestTimeTracker(unittest.TestCase):
 
     @unittest.mock.patch('tt.TimeTracker.os.path.exists')
     @unittest.mock.patch('builtins.open', new_callable=unittest.mock.mock_open)
-    @unittest.mock.patch('tt.TimeTracker.imaplib.IMAP4_SSL')
+    @unittest.mock.patch('imaplib.IMAP4_SSL')
     def test_fetch_emails_to_tasks_sets_due_date_to_today(self, mock_imap_cls, mock_open, mock_exists):
         """
         Regression test: a task created from an imported email must have
@@ -1184,6 +1334,36 @@ class TestTimeTracker(unittest.TestCase):
         self.assertEqual(len(tasks), 1)
         self.assertEqual(tasks[0]['due_date'], date.today().isoformat())
 
+    @unittest.mock.patch('tt.TimeTracker.os.path.exists')
+    @unittest.mock.patch('builtins.open', new_callable=unittest.mock.mock_open)
+    @unittest.mock.patch('imaplib.IMAP4_SSL')
+    def test_fetch_emails_to_tasks_reports_progress_and_can_be_cancelled(self, mock_imap_cls, mock_open, mock_exists):
+        """
+        A long fetch tells its caller how far it got, and stops between two
+        emails once the caller gives up - keeping the tasks made so far and
+        leaving the rest in the inbox.
+        """
+        mock_exists.return_value = True
+        mock_open.return_value.__enter__.return_value.read.return_value = json.dumps({
+            "email": {"enabled": True, "imap_server": "imap.example.com",
+                      "user": "user@example.com", "password": "secret"}
+        })
+        mock_mail = mock_imap_cls.return_value
+        mock_mail.search.return_value = ("OK", [b"1 2 3"])
+        mock_mail.fetch.return_value = ("OK", [(None, b"Subject: Test Email\r\n\r\nBody.")])
+
+        reported = []
+        count, error = self.tracker.fetch_emails_to_tasks(
+            progress=lambda done, total: reported.append((done, total)),
+            cancelled=lambda: len(reported) == 2,
+        )
+
+        self.assertIsNone(error)
+        self.assertEqual(count, 2)
+        self.assertEqual(reported, [(0, 3), (1, 3)])
+        self.assertEqual(mock_mail.store.call_count, 2)
+        mock_mail.expunge.assert_called_once()
+
     def test_promote_task_to_project_name_conflict(self):
         """Tests that promoting fails if a main project with the same name already exists."""
         self.tracker.add_main_project("Source Main")
@@ -1851,6 +2031,31 @@ class TestTimeTracker(unittest.TestCase):
         self.assertIn(_("\n**Total Time in Period: {total_time}**").format(total_time=dur_3h), report)
         self.assertTrue(report.startswith(_("# Time Report: {start_date} to {end_date}\n").format(start_date=start_date.strftime('%Y-%m-%d'), end_date=end_date.strftime('%Y-%m-%d')).strip()))
 
+    def test_date_range_report_reports_progress_and_can_be_abandoned(self):
+        """
+        The GUI computes this report in the background, shows how far it got
+        and stops it by raising from the callback when the user cancels.
+        """
+        for name in ("P1", "P2", "P3"):
+            self._create_mock_project_with_task(name, "Sub")
+        calls = []
+        with unittest.mock.patch('tt.TimeTracker.pyperclip'):
+            self.tracker.generate_date_range_report(
+                datetime(2025, 1, 1).date(), datetime(2025, 1, 2).date(),
+                progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(calls, [(0, 3), (1, 3), (2, 3)])
+
+        class Stop(Exception):
+            pass
+
+        def stop_at_second(done, total):
+            if done == 1:
+                raise Stop()
+
+        with self.assertRaises(Stop):
+            self.tracker.summarize_date_range(
+                datetime(2025, 1, 1).date(), datetime(2025, 1, 2).date(), progress=stop_at_second)
+
     def test_generate_task_report(self):
         """Tests the detailed report generation for a single task."""
         main_proj = "Detailed Report Main"
@@ -2066,7 +2271,7 @@ class TestTimeTracker(unittest.TestCase):
         
         # Test HTML (if markdown module is present)
         import tt.TimeTracker
-        if tt.TimeTracker.markdown:
+        if tt.TimeTracker._import_markdown():
             mock_open.return_value.__enter__.return_value.read.return_value = json.dumps({"report_format": "html"})
             res = self.tracker._format_and_copy_report(md_text)
             # Expect basic HTML wrapping for a header
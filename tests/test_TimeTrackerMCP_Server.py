@@ -1,5 +1,12 @@
+import asyncio
+import json
+import re
+import threading
+import time
 import unittest
-from unittest.mock import patch
+import warnings
+from collections import OrderedDict
+from unittest.mock import AsyncMock, MagicMock, patch
 import sys
 import os
 
@@ -34,9 +41,11 @@ class TestTimeTrackerMCP_Server(unittest.TestCase):
 
     def setUp(self):
         self.MockTimeTrackerClass.reset_mock()
-        # get_tracker() calls TimeTracker() fresh for every tool call; since
-        # the class itself is mocked, every such call returns this same
-        # mock instance, so tests can set expectations on it directly.
+        # get_tracker() keeps the instance it built; dropping it here means
+        # each test starts from a TimeTracker() call. Since the class itself
+        # is mocked, that call returns this same mock instance, so tests can
+        # set expectations on it directly.
+        self.mcp_server._tracker = None
         self.mock_tracker = self.MockTimeTrackerClass.return_value
 
     # --- add_main_project ---
@@ -503,5 +512,739 @@ class TestTimeTrackerMCP_Server(unittest.TestCase):
         self.assertIs(sys.stdout, real_stdout)
 
 
+class RealDataFileTestCase(unittest.TestCase):
+    """
+    Runs the tools against a real TimeTracker on a throwaway data file,
+    alongside a second TimeTracker on the same file standing in for the GUI
+    (or SOAP server), which is how the two actually share data.json.
+    """
+
+    TEST_FILE = "test_mcp_real_data.json"
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import TimeTrackerMCP_Server
+        except (ImportError, SystemExit):
+            raise unittest.SkipTest("Could not import TimeTrackerMCP_Server (is 'mcp' installed?).")
+        cls.mcp_server = TimeTrackerMCP_Server
+
+    def setUp(self):
+        from tt.TimeTracker import TimeTracker
+        # The server chdir()s to the repo root on import, so the path is
+        # made absolute for both sides.
+        self.test_file = os.path.abspath(self.TEST_FILE)
+        self._remove_test_file()
+        self.addCleanup(self._remove_test_file)
+        self.outbox = MagicMock()
+        factory = lambda: TimeTracker(file_path=self.test_file, op_outbox=self.outbox)  # noqa: E731
+        for patcher in (patch.object(self.mcp_server, 'TimeTracker', side_effect=factory),
+                        patch.object(self.mcp_server, '_tracker', None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.server_class = self.mcp_server.TimeTracker
+        self.gui = TimeTracker(file_path=self.test_file, op_outbox=MagicMock())
+
+    def _remove_test_file(self):
+        if os.path.exists(self.test_file):
+            os.remove(self.test_file)
+
+    def _task_names(self, project):
+        return [t["task_name"] for t in self.mcp_server.list_tasks(project, "all")]
+
+
+class TestMCPTrackerRevalidation(RealDataFileTestCase):
+    """
+    get_tracker() keeps one TimeTracker for the whole server process and only
+    re-reads the data file when something else wrote it. These tests
+    interleave the tools with writes from the stand-in GUI.
+    """
+
+    def test_tool_calls_reuse_one_tracker(self):
+        self.mcp_server.add_main_project("Acme")
+        self.mcp_server.add_task("Acme", "Invoice")
+        self.mcp_server.list_tasks("Acme")
+        self.server_class.assert_called_once()
+
+    def test_own_writes_do_not_trigger_a_reload(self):
+        """Saving through the server's own tracker must not count as an outside change."""
+        self.mcp_server.add_main_project("Acme")
+        tracker = self.mcp_server.get_tracker()
+        with patch.object(tracker, 'reload_data', wraps=tracker.reload_data) as reload_data:
+            self.mcp_server.add_task("Acme", "Invoice")
+            self.mcp_server.start_work("Acme", "Invoice")
+            self.mcp_server.stop_work()
+            self.assertEqual(self._task_names("Acme"), ["Invoice"])
+        reload_data.assert_not_called()
+
+    def test_sees_tasks_added_through_the_gui(self):
+        self.mcp_server.add_main_project("Acme")
+        self.gui.reload_data()
+        self.gui.add_task("Acme", "Added in GUI")
+        self.assertEqual(self._task_names("Acme"), ["Added in GUI"])
+
+    def test_gui_sees_tasks_added_through_mcp(self):
+        self.gui.add_main_project("Acme")
+        self.mcp_server.add_task("Acme", "Added via MCP")
+        self.gui.reload_data()
+        self.assertEqual([t["task_name"] for t in self.gui.list_tasks("Acme", "all")], ["Added via MCP"])
+
+    def test_interleaved_writes_are_not_lost(self):
+        """
+        Neither side may overwrite the other's change with its own stale
+        copy - the lost update a long-lived instance would cause if it
+        skipped the check.
+        """
+        self.mcp_server.add_main_project("Acme")
+        for i in range(5):
+            self.gui.reload_data()
+            self.gui.add_task("Acme", f"GUI {i}")
+            self.mcp_server.add_task("Acme", f"MCP {i}")
+        self.gui.reload_data()
+        expected = [name for i in range(5) for name in (f"GUI {i}", f"MCP {i}")]
+        self.assertEqual([t["task_name"] for t in self.gui.list_tasks("Acme", "all")], expected)
+        self.assertEqual(self._task_names("Acme"), expected)
+
+    def test_same_size_change_within_the_same_instant_is_seen(self):
+        """
+        A rename to a name of the same length leaves the file size alone,
+        and on a coarse-grained file system the modification time can stay
+        the same too; the replaced file's new inode still gives it away.
+        """
+        self.mcp_server.add_main_project("Acme")
+        self.mcp_server.add_task("Acme", "Draft A")
+        self.gui.reload_data()
+        self.gui.rename_task("Acme", "Draft A", "Draft B")
+        self.assertEqual(self._task_names("Acme"), ["Draft B"])
+
+    def test_unchanged_file_is_not_reread(self):
+        self.mcp_server.add_main_project("Acme")
+        tracker = self.mcp_server.get_tracker()
+        with patch.object(tracker, '_load_data', wraps=tracker._load_data) as load_data:
+            for _ in range(3):
+                self.mcp_server.list_main_projects("all")
+        load_data.assert_not_called()
+
+    def test_a_tool_that_raises_leaves_nothing_behind_in_memory(self):
+        """
+        A change made in memory by a tool that then fails is not on disk, and
+        the file has not moved; kept, the next save would write it out.
+        """
+        self.mcp_server.add_main_project("Acme")
+
+        def half_done():
+            self.mcp_server.get_tracker().data["projects"][0]["main_project_name"] = "Half"
+            raise RuntimeError("failed part way through")
+
+        async def scenario():
+            with self.assertRaises(RuntimeError):
+                await self.mcp_server._run_off_loop(half_done)
+            await self.mcp_server._run_off_loop(self.mcp_server.add_main_project, ("Globex",))
+
+        asyncio.run(scenario())
+        self.gui.reload_data()
+        self.assertEqual([p["main_project_name"] for p in self.gui.list_main_projects("all")],
+                         ["Acme", "Globex"])
+
+    def test_config_change_builds_a_new_tracker(self):
+        """A changed config.json (e.g. sync switched on) needs a freshly built tracker."""
+        self.mcp_server.get_tracker()
+        with patch.object(self.mcp_server, 'file_stamp', return_value=("changed",)):
+            self.mcp_server.get_tracker()
+        self.assertEqual(self.server_class.call_count, 2)
+
+
+class TestMCPBulkTools(RealDataFileTestCase):
+    """
+    add_tasks, update_tasks, close_tasks and move_tasks apply a whole list
+    with one save and one write to the sync queue, and report per item.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.mcp_server.add_main_project("Acme")
+        self.mcp_server.add_main_project("Globex")
+        self.outbox.reset_mock()
+
+    def _saves(self):
+        """Counts the times the data file is actually written."""
+        import tt.TimeTracker
+        return patch.object(tt.TimeTracker.os, 'replace', wraps=os.replace)
+
+    def test_add_tasks_saves_and_queues_once(self):
+        with self._saves() as save:
+            result = self.mcp_server.add_tasks([
+                {"main_project_name": "Acme", "task_name": f"Task {i}", "priority": i}
+                for i in range(5)
+            ])
+        self.assertEqual(result, ["created"] * 5)
+        save.assert_called_once()
+        self.outbox.extend.assert_called_once()
+        self.outbox.append.assert_not_called()
+        self.assertEqual(len(self.outbox.extend.call_args.args[0]), 5)
+        self.gui.reload_data()
+        self.assertEqual([t["priority"] for t in self.gui.list_tasks("Acme", "all")], [0, 1, 2, 3, 4])
+
+    def test_add_tasks_reports_each_item(self):
+        self.mcp_server.add_task("Acme", "Existing")
+        result = self.mcp_server.add_tasks([
+            {"main_project_name": "Acme", "task_name": "Existing"},
+            {"main_project_name": "Nowhere", "task_name": "Lost"},
+            {"main_project_name": "Acme", "task_name": "New", "priority": 12},
+            {"main_project_name": "Acme"},
+            {"main_project_name": "Acme", "task_name": "Odd", "colour": "red"},
+            {"main_project_name": "Acme", "task_name": "Fine", "today": True},
+        ])
+        self.assertEqual(result[0], "exists")
+        self.assertIn("'Nowhere' not found", result[1])
+        self.assertIn("priority", result[2])
+        self.assertEqual(result[3], "error: missing task_name")
+        self.assertIn("colour", result[4])
+        self.assertEqual(result[5], "created")
+        self.assertEqual(self._task_names("Acme"), ["Existing", "Fine"])
+
+    def test_add_tasks_twice_in_one_list_creates_one(self):
+        item = {"main_project_name": "Acme", "task_name": "Twice"}
+        self.assertEqual(self.mcp_server.add_tasks([item, item]), ["created", "exists"])
+
+    def test_update_tasks(self):
+        self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": n} for n in ("A", "B")])
+        self.outbox.reset_mock()
+        with self._saves() as save:
+            result = self.mcp_server.update_tasks([
+                {"main_project_name": "Acme", "task_name": "A", "today": True, "priority": 5},
+                {"main_project_name": "Acme", "task_name": "B", "new_task_name": "B2", "due_date": "2026-11-02"},
+                {"main_project_name": "Acme", "task_name": "Missing", "today": True},
+            ])
+        self.assertEqual(result[:2], ["updated", "updated"])
+        self.assertIn("'Missing' not found", result[2])
+        save.assert_called_once()
+        self.outbox.extend.assert_called_once()
+        self.gui.reload_data()
+        tasks = {t["task_name"]: t for t in self.gui.list_tasks("Acme", "all")}
+        self.assertEqual((tasks["A"]["today"], tasks["A"]["priority"]), (True, 5))
+        self.assertEqual(tasks["B2"]["due_date"], "2026-11-02")
+
+    def test_close_tasks(self):
+        self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": n} for n in ("A", "B")])
+        result = self.mcp_server.close_tasks([
+            {"main_project_name": "Acme", "task_name": "A"},
+            {"main_project_name": "Acme", "task_name": "C"},
+        ])
+        self.assertEqual(result[0], "closed")
+        self.assertTrue(result[1].startswith("error:"))
+        self.assertEqual([t["task_name"] for t in self.mcp_server.list_tasks("Acme", "closed")], ["A"])
+
+    def test_move_tasks(self):
+        self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": n} for n in ("A", "B")])
+        result = self.mcp_server.move_tasks([
+            {"main_project_name": "Acme", "task_name": "A", "new_main_project_name": "Globex"},
+            {"main_project_name": "Acme", "task_name": "B", "new_main_project_name": "Initech"},
+        ])
+        self.assertEqual(result[0], "moved")
+        self.assertIn("Initech", result[1])
+        self.assertEqual(self._task_names("Globex"), ["A"])
+        self.assertEqual(self._task_names("Acme"), ["B"])
+
+    def test_tasks_are_looked_up_once_per_call_not_per_item(self):
+        tracker = self.mcp_server.get_tracker()
+        with patch.object(tracker, 'list_tasks', wraps=tracker.list_tasks) as list_tasks, \
+                patch.object(tracker, 'list_main_projects', wraps=tracker.list_main_projects) as list_projects:
+            self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": f"Task {i}"}
+                                       for i in range(20)])
+            self.mcp_server.update_tasks([{"main_project_name": "Acme", "task_name": f"Task {i}", "priority": 1}
+                                          for i in range(20)])
+        list_tasks.assert_not_called()
+        list_projects.assert_not_called()
+
+    def test_names_changed_earlier_in_the_list_are_found_later_in_it(self):
+        self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": "A"}])
+        result = self.mcp_server.update_tasks([
+            {"main_project_name": "Acme", "task_name": "A", "new_task_name": "A2"},
+            {"main_project_name": "Acme", "task_name": "A", "priority": 1},
+            {"main_project_name": "Acme", "task_name": "A2", "priority": 2},
+        ])
+        self.assertEqual([r[:7] for r in result], ["updated", "error: ", "updated"])
+
+    def test_an_item_that_raises_is_reported_and_the_rest_applied(self):
+        tracker = self.mcp_server.get_tracker()
+        real_close = tracker.close_task
+
+        def close_task(project, task):
+            if task == "B":
+                raise RuntimeError("disk on fire")
+            return real_close(project, task)
+
+        self.mcp_server.add_tasks([{"main_project_name": "Acme", "task_name": n} for n in ("A", "B", "C")])
+        with patch.object(tracker, 'close_task', side_effect=close_task):
+            result = self.mcp_server.close_tasks([
+                {"main_project_name": "Acme", "task_name": n} for n in ("A", "B", "C")])
+        self.assertEqual(result, ["closed", "error: disk on fire", "closed"])
+        self.gui.reload_data()
+        self.assertEqual([t["task_name"] for t in self.gui.list_tasks("Acme", "closed")], ["A", "C"])
+
+    def test_only_failures_writes_nothing(self):
+        with self._saves() as save:
+            result = self.mcp_server.close_tasks([{"main_project_name": "Acme", "task_name": "Nope"}])
+        self.assertTrue(result[0].startswith("error:"))
+        save.assert_not_called()
+        self.outbox.extend.assert_not_called()
+
+
+class TestMCPPaging(RealDataFileTestCase):
+    """
+    list_tasks, list_inactive_tasks and generate_date_range_report page
+    their result when asked to, so a client can fetch a large one in pieces.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.mcp_server.add_main_project("Acme")
+        self.mcp_server.add_tasks([
+            {"main_project_name": "Acme", "task_name": f"Task {i}", "due_date": "2020-01-01"}
+            for i in range(5)
+        ])
+
+    def _all_pages(self, tool, *args, **kwargs):
+        pages, cursor = [], None
+        while True:
+            page = tool(*args, cursor=cursor, **kwargs)
+            pages.append(page)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                return pages
+
+    def test_without_paging_arguments_the_plain_list_is_returned(self):
+        self.assertEqual(len(self.mcp_server.list_tasks("Acme")), 5)
+
+    def test_list_tasks_pages_through_everything_in_order(self):
+        self.mcp_server.close_task("Acme", "Task 4")
+        pages = self._all_pages(self.mcp_server.list_tasks, "Acme", "all", limit=2)
+        self.assertEqual([p["returned"] for p in pages], [2, 2, 1])
+        self.assertEqual([t["task_name"] for p in pages for t in p["tasks"]], [f"Task {i}" for i in range(5)])
+        self.assertEqual({p["total"] for p in pages}, {5})
+        self.assertEqual(pages[0]["counts"], {"open": 4, "closed": 1})
+
+    def test_max_chars_bounds_a_page_but_never_empties_it(self):
+        page = self.mcp_server.list_tasks("Acme", max_chars=10)
+        self.assertEqual(page["returned"], 1)
+        pages = self._all_pages(self.mcp_server.list_tasks, "Acme", max_chars=500)
+        self.assertEqual(sum(p["returned"] for p in pages), 5)
+        self.assertGreater(len(pages), 1)
+
+    def test_cursor_cannot_continue_a_different_query(self):
+        cursor = self.mcp_server.list_tasks("Acme", limit=2)["next_cursor"]
+        self.assertEqual(self.mcp_server.list_tasks("Acme", "all", cursor=cursor),
+                         "Error: This cursor belongs to a different query; start again without one.")
+
+    def test_list_tasks_rejects_a_bad_cursor(self):
+        self.assertEqual(self.mcp_server.list_tasks("Acme", cursor="not-a-cursor"), "Error: Invalid cursor.")
+        self.assertEqual(self.mcp_server.list_tasks("Acme", limit=0), "Error: limit must be at least 1.")
+
+    def test_list_inactive_tasks_rejects_a_bad_cursor(self):
+        self.assertEqual(self.mcp_server.list_inactive_tasks(1, cursor="not-a-cursor"), "Error: Invalid cursor.")
+        self.assertEqual(self.mcp_server.list_inactive_tasks(1, max_chars=0),
+                         "Error: max_chars must be at least 1.")
+
+    def test_change_between_pages_is_flagged(self):
+        first = self.mcp_server.list_tasks("Acme", limit=2)
+        self.assertFalse(first["data_changed"])
+        self.gui.reload_data()
+        self.gui.add_task("Acme", "Late arrival")
+        second = self.mcp_server.list_tasks("Acme", limit=2, cursor=first["next_cursor"])
+        self.assertTrue(second["data_changed"])
+        self.assertEqual(second["offset"], 2)
+
+    def test_list_inactive_tasks_pages(self):
+        pages = self._all_pages(self.mcp_server.list_inactive_tasks, 1, limit=3)
+        self.assertEqual([p["returned"] for p in pages], [3, 2])
+        self.assertEqual(pages[0]["total"], 5)
+
+    def _track_an_hour_in_three_projects(self):
+        from datetime import datetime
+        tracker = self.mcp_server.get_tracker()
+        for name in ("Globex", "Initech"):
+            tracker.add_main_project(name)
+            tracker.add_task(name, "Work")
+        for project in tracker.data["projects"]:
+            for task in project["tasks"][:1]:
+                task["time_entries"].append({"start_time": datetime(2026, 3, 2, 9).isoformat(),
+                                             "end_time": datetime(2026, 3, 2, 10).isoformat()})
+        tracker._save_data()
+
+    def test_date_range_report_pages_by_main_project(self):
+        self._track_an_hour_in_three_projects()
+        pages, cursor = [], None
+        while True:
+            page = self.mcp_server.generate_date_range_report("2026-03-01", "2026-03-31", limit=2, cursor=cursor)
+            pages.append(page)
+            match = re.search(r'cursor="([^"]+)"', page)
+            if not match:
+                break
+            cursor = match.group(1)
+        self.assertEqual(len(pages), 2)
+        for page in pages:
+            self.assertIn("across 3 main project(s)", page)
+        self.assertIn("## Acme", pages[0])
+        self.assertIn("## Globex", pages[0])
+        self.assertIn("## Initech", pages[1])
+        self.assertNotIn("## Acme", pages[1])
+
+    def test_date_range_report_rejects_a_bad_cursor(self):
+        self._track_an_hour_in_three_projects()
+        result = self.mcp_server.generate_date_range_report("2026-03-01", "2026-03-31", cursor="bogus")
+        self.assertEqual(result, "Error: Invalid cursor.")
+
+
+class TestMCPResources(RealDataFileTestCase):
+    """
+    timecontrol://current-work, timecontrol://today and the daily report
+    resources are rendered once per state of the data file, and subscribers
+    hear about a change only when the view they follow changed.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for name, value in (('_view_cache', OrderedDict()), ('_resource_subscribers', {}),
+                            ('_watched_version', None), ('_watcher_task', None),
+                            ('_WATCH_INTERVAL', 0.05)):
+            patcher = patch.object(self.mcp_server, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.gui.add_main_project("Acme")
+        self.gui.add_task("Acme", "Invoice", today=True)
+        self.gui.add_task("Acme", "Backlog")
+
+    def _gui_writes(self, method, *args):
+        self.gui.reload_data()
+        getattr(self.gui, method)(*args)
+
+    def _publish(self):
+        asyncio.run(self.mcp_server._publish_changed_views())
+
+    def test_today_lists_the_tasks_marked_for_today(self):
+        today = json.loads(asyncio.run(self.mcp_server.today_resource()))
+        self.assertEqual([t["task_name"] for t in today], ["Invoice"])
+
+    def test_current_work(self):
+        self.assertIsNone(json.loads(asyncio.run(self.mcp_server.current_work_resource())))
+        self._gui_writes("start_work", "Acme", "Invoice")
+        self.assertEqual(json.loads(asyncio.run(self.mcp_server.current_work_resource()))["task_name"], "Invoice")
+
+    def test_a_view_is_rendered_once_per_state_of_the_data_file(self):
+        with patch.object(self.mcp_server, '_build_view', wraps=self.mcp_server._build_view) as build:
+            asyncio.run(self.mcp_server.today_resource())
+            asyncio.run(self.mcp_server.today_resource())
+            self.assertEqual(build.call_count, 1)
+            self._gui_writes("add_task", "Acme", "Call back", None, True)
+            self.assertEqual(len(json.loads(asyncio.run(self.mcp_server.today_resource()))), 2)
+        self.assertEqual(build.call_count, 2)
+
+    def test_daily_report_leaves_the_clipboard_alone(self):
+        tracker = self.mcp_server.get_tracker()
+        with patch.object(tracker, '_copy_to_clipboard') as copy:
+            report = asyncio.run(self.mcp_server.daily_report_resource("2026-03-02"))
+        self.assertIsInstance(report, str)
+        copy.assert_not_called()
+        with self.assertRaises(ValueError):
+            asyncio.run(self.mcp_server.daily_report_resource("March 2nd"))
+
+    def test_subscriber_is_notified_only_when_its_view_changes(self):
+        session = MagicMock()
+        session.send_resource_updated = AsyncMock()
+        self.mcp_server._subscribe(session, self.mcp_server.RESOURCE_CURRENT_WORK)
+        self._publish()
+
+        # A new task changes the data file, but not what is being worked on.
+        self._gui_writes("add_task", "Acme", "Unrelated")
+        self._publish()
+        session.send_resource_updated.assert_not_called()
+
+        self._gui_writes("start_work", "Acme", "Invoice")
+        self._publish()
+        session.send_resource_updated.assert_awaited_once_with(self.mcp_server.RESOURCE_CURRENT_WORK)
+
+    def test_the_cache_keeps_only_the_views_read_most_recently(self):
+        followed = MagicMock()
+        self.mcp_server._subscribe(followed, self.mcp_server._DAILY_REPORT_PREFIX + "2026-01-01")
+        with patch.object(self.mcp_server, '_VIEW_CACHE_SIZE', 4):
+            for day in range(2, 12):
+                asyncio.run(self.mcp_server.daily_report_resource("2026-01-%02d" % day))
+        self.assertEqual(list(self.mcp_server._view_cache),
+                         [self.mcp_server._DAILY_REPORT_PREFIX + d
+                          for d in ("2026-01-01", "2026-01-09", "2026-01-10", "2026-01-11")])
+
+    def test_a_change_renders_only_the_views_being_followed(self):
+        for day in range(1, 6):
+            asyncio.run(self.mcp_server.daily_report_resource("2026-01-%02d" % day))
+        followed = MagicMock()
+        followed.send_resource_updated = AsyncMock()
+        report = self.mcp_server._DAILY_REPORT_PREFIX + "2026-01-03"
+        self.mcp_server._subscribe(followed, report)
+        self._publish()
+
+        self._gui_writes("add_task", "Acme", "Call back")
+        with patch.object(self.mcp_server, '_build_view', wraps=self.mcp_server._build_view) as build:
+            self._publish()
+        self.assertEqual(sorted(call.args[1] for call in build.call_args_list),
+                         sorted([self.mcp_server.RESOURCE_CURRENT_WORK,
+                                 self.mcp_server.RESOURCE_TODAY, report]))
+
+    def test_unsubscribed_and_vanished_sessions_hear_nothing(self):
+        gone, left = MagicMock(), MagicMock()
+        gone.send_resource_updated = AsyncMock(side_effect=ConnectionError)
+        left.send_resource_updated = AsyncMock()
+        for session in (gone, left):
+            self.mcp_server._subscribe(session, self.mcp_server.RESOURCE_TODAY)
+        self.mcp_server._unsubscribe(left, self.mcp_server.RESOURCE_TODAY)
+        self._publish()
+        self._gui_writes("add_task", "Acme", "Call back", None, True)
+        self._publish()
+        left.send_resource_updated.assert_not_called()
+        self.assertNotIn(gone, self.mcp_server._resource_subscribers[self.mcp_server.RESOURCE_TODAY])
+
+    def test_clients_receive_update_notifications(self):
+        """End to end through the SDK's in-process client: resources/subscribe, then subscriptions/listen."""
+        try:
+            from mcp import Client
+        except ImportError:
+            self.skipTest("This mcp version has no in-process Client.")
+        if self.mcp_server.MCP_MAJOR_VERSION != 2:
+            self.skipTest("Needs mcp 2's in-process Client.")
+        uri = self.mcp_server.RESOURCE_CURRENT_WORK
+        notifications = []
+
+        async def collect(message):
+            notifications.append(message)
+
+        async def legacy_subscription():
+            async with Client(self.mcp_server.mcp, mode='legacy', message_handler=collect) as client:
+                self.assertTrue(client.server_capabilities.resources.subscribe)
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")
+                    await client.subscribe_resource(uri)
+                self._gui_writes("start_work", "Acme", "Invoice")
+                for _ in range(100):
+                    if notifications:
+                        break
+                    await asyncio.sleep(0.02)
+
+        async def listen_stream():
+            async with Client(self.mcp_server.mcp) as client:
+                async with client.listen(resource_subscriptions=[uri]) as subscription:
+                    await asyncio.sleep(0.2)
+                    self._gui_writes("stop_work")
+                    return await asyncio.wait_for(subscription.__anext__(), 5)
+
+        asyncio.run(legacy_subscription())
+        self.assertEqual([n.params.uri for n in notifications], [uri])
+        self.assertEqual(asyncio.run(listen_stream()).uri, uri)
+
+
+class TestMCPToolsOffTheEventLoop(RealDataFileTestCase):
+    """
+    Tools run on the server's worker threads, one at a time where the
+    tracker is concerned, with a time limit - so a slow IMAP fetch or
+    report neither stalls the event loop nor shares the tracker.
+    """
+
+    def _client(self, **kwargs):
+        try:
+            from mcp import Client
+        except ImportError:
+            self.skipTest("This mcp version has no in-process Client.")
+        if self.mcp_server.MCP_MAJOR_VERSION != 2:
+            self.skipTest("Needs mcp 2's in-process Client.")
+        return Client(self.mcp_server.mcp, **kwargs)
+
+    def test_slow_tool_does_not_hold_up_other_requests(self):
+        release = threading.Event()
+        tracker = self.mcp_server.get_tracker()
+
+        def slow_fetch(**kwargs):
+            release.wait(5)
+            return 0, None
+
+        async def scenario():
+            async with self._client() as client:
+                fetch = asyncio.create_task(client.call_tool("fetch_emails_to_tasks", {}))
+                await asyncio.sleep(0.1)
+                await asyncio.wait_for(client.list_tools(), 2)
+                self.assertFalse(fetch.done())
+                release.set()
+                return await asyncio.wait_for(fetch, 5)
+
+        with patch.object(tracker, 'fetch_emails_to_tasks', side_effect=slow_fetch):
+            result = asyncio.run(scenario())
+        self.assertIn("No new emails", result.content[0].text)
+
+    def test_email_fetch_reports_progress(self):
+        tracker = self.mcp_server.get_tracker()
+        updates = []
+
+        def fetch(progress, cancelled, create_task):
+            for done in range(3):
+                progress(done, 3)
+            return 3, None
+
+        async def on_progress(progress, total, message):
+            updates.append((progress, total))
+
+        async def scenario():
+            async with self._client() as client:
+                result = await client.call_tool("fetch_emails_to_tasks", {}, progress_callback=on_progress)
+                await asyncio.sleep(0.1)
+                return result
+
+        with patch.object(tracker, 'fetch_emails_to_tasks', side_effect=fetch):
+            result = asyncio.run(scenario())
+        self.assertIn("3 new task(s)", result.content[0].text)
+        self.assertEqual(updates, [(0, 3), (1, 3), (2, 3)])
+
+    def test_email_fetch_does_not_hold_the_tracker_while_it_waits(self):
+        """
+        Nearly all of a fetch is waiting on the mail server. Held under the
+        tracker's lock, every other call would queue behind it and run into
+        its own time limit.
+        """
+        tracker = self.mcp_server.get_tracker()
+        mail_server = threading.Event()
+
+        def fetch(progress, cancelled, create_task):
+            mail_server.wait(5)
+            create_task("From the inbox", "Body.")
+            return 1, None
+
+        async def scenario():
+            fetching = asyncio.create_task(
+                self.mcp_server._run_off_loop(self.mcp_server.fetch_emails_to_tasks, locked=False))
+            await asyncio.sleep(0.1)
+            await asyncio.wait_for(
+                self.mcp_server._run_off_loop(self.mcp_server.add_main_project, ("Acme",)), 2)
+            mail_server.set()
+            return await fetching
+
+        with patch.object(tracker, 'fetch_emails_to_tasks', side_effect=fetch):
+            self.assertIn("1 new task(s)", asyncio.run(scenario()))
+        self.gui.reload_data()
+        self.assertEqual([t["task_name"] for t in self.gui.list_tasks(self.gui.HIDDEN_PROJECT, "all")],
+                         ["From the inbox"])
+
+    def test_an_email_is_not_filed_once_the_fetch_was_given_up_on(self):
+        tracker = self.mcp_server.get_tracker()
+        filed = []
+
+        def fetch(progress, cancelled, create_task):
+            self.mcp_server._current_job().cancelled.wait(5)
+            filed.append(create_task("Too late", "Body."))
+            return 0, None
+
+        async def scenario():
+            with self.assertRaises(TimeoutError):
+                await self.mcp_server._run_off_loop(self.mcp_server.fetch_emails_to_tasks,
+                                                    timeout=0.1, locked=False)
+
+        with patch.object(tracker, 'fetch_emails_to_tasks', side_effect=fetch):
+            asyncio.run(scenario())
+            while not filed:
+                time.sleep(0.01)
+        self.assertEqual(filed, [False])
+        self.assertIsNone(self.gui._get_project(self.gui.HIDDEN_PROJECT))
+
+    def test_a_call_that_ran_out_of_time_changes_nothing(self):
+        """
+        The client was told it failed, and will try again; a change saved
+        after that would be made twice.
+        """
+        finished = threading.Event()
+
+        def slow_add():
+            self.mcp_server._current_job().cancelled.wait(5)
+            self.mcp_server.add_main_project("Late")
+            finished.set()
+
+        async def scenario():
+            with self.assertRaises(TimeoutError):
+                await self.mcp_server._run_off_loop(slow_add, timeout=0.1)
+            while not finished.is_set():
+                await asyncio.sleep(0.01)
+            return await self.mcp_server._run_off_loop(self.mcp_server.list_main_projects, ("all",))
+
+        self.assertEqual(asyncio.run(scenario()), [])
+        self.gui.reload_data()
+        self.assertEqual(self.gui.list_main_projects("all"), [])
+
+    def test_a_call_given_up_on_before_its_turn_never_runs(self):
+        release, ran = threading.Event(), []
+
+        def blocking():
+            release.wait(5)
+
+        async def scenario():
+            first = asyncio.create_task(self.mcp_server._run_off_loop(blocking))
+            await asyncio.sleep(0.05)
+            with self.assertRaises(TimeoutError):
+                await self.mcp_server._run_off_loop(lambda: ran.append(True), timeout=0.1)
+            release.set()
+            await first
+            # The queued call has had its turn by the time this one gets the lock.
+            await self.mcp_server._run_off_loop(lambda: None)
+
+        asyncio.run(scenario())
+        self.assertEqual(ran, [])
+
+    def test_time_limit_gives_up_and_tells_the_tool(self):
+        told = threading.Event()
+
+        def slow_job():
+            if self.mcp_server._current_job().cancelled.wait(5):
+                told.set()
+
+        async def scenario():
+            with self.assertRaises(TimeoutError):
+                await self.mcp_server._run_off_loop(slow_job, timeout=0.1)
+
+        asyncio.run(scenario())
+        self.assertTrue(told.wait(5))
+
+    def test_cancelled_call_tells_the_tool(self):
+        started, told = threading.Event(), threading.Event()
+
+        def long_job():
+            started.set()
+            if self.mcp_server._current_job().cancelled.wait(5):
+                told.set()
+
+        async def scenario():
+            task = asyncio.create_task(self.mcp_server._run_off_loop(long_job))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(scenario())
+        self.assertTrue(told.wait(5))
+
+    def test_calls_do_not_use_the_tracker_at_the_same_time(self):
+        inside, overlaps = [], []
+
+        def job():
+            if inside:
+                overlaps.append(True)
+            inside.append(True)
+            time.sleep(0.02)
+            inside.pop()
+
+        async def scenario():
+            await asyncio.gather(*(self.mcp_server._run_off_loop(job) for _ in range(6)))
+
+        asyncio.run(scenario())
+        self.assertEqual(overlaps, [])
+
+    def test_direct_calls_still_run_synchronously(self):
+        self.assertEqual(self.mcp_server.add_main_project("Acme"), "Project 'Acme' created.")
+
+
 if __name__ == '__main__':
     unittest.main()
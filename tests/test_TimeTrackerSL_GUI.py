@@ -1,6 +1,7 @@
 import unittest
 import unittest.mock
 import os
+import socket
 import sys
 import types
 
@@ -262,6 +263,28 @@ class TestStreamlitGUI(unittest.TestCase):
 
         mock_popen.assert_called_once()
 
+    def test_wait_until_serving_returns_once_the_port_accepts_connections(self):
+        """
+        The window opens as soon as the server is up instead of after a fixed
+        delay that was too long on a warm start and too short on a cold one.
+        """
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        self.addCleanup(listener.close)
+        process = unittest.mock.MagicMock()
+        process.poll.return_value = None
+
+        self.assertTrue(TimeTrackerSL_GUI._wait_until_serving(listener.getsockname()[1], process, timeout=5))
+
+    def test_wait_until_serving_gives_up_when_the_server_exits(self):
+        """A server that died on startup must not keep the launcher waiting."""
+        process = unittest.mock.MagicMock()
+        process.poll.return_value = 1
+        with unittest.mock.patch('TimeTrackerSL_GUI.socket.create_connection') as connect:
+            self.assertFalse(TimeTrackerSL_GUI._wait_until_serving(8501, process, timeout=5))
+        connect.assert_not_called()
+
     def test_save_window_state_persists_position(self):
         """
         Regression test: closing the window must persist both size AND
@@ -22,14 +22,14 @@ class TestTimeTrackerSOAP_Server(unittest.TestCase):
         
         # Attempt to import the server module
         try:
-            import TimeTrackerSOAP_Server
-            cls.soap_server = TimeTrackerSOAP_Server
+            import TimeTrackerSOAP_Service
+            cls.soap_server = TimeTrackerSOAP_Service
         except ImportError:
             cls.tt_patcher.stop()
-            raise unittest.SkipTest("Could not import TimeTrackerSOAP_Server.")
+            raise unittest.SkipTest("Could not import TimeTrackerSOAP_Service.")
         except SystemExit:
             cls.tt_patcher.stop()
-            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Server")
+            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Service")
 
     @classmethod
     def tearDownClass(cls):
@@ -42,7 +42,7 @@ class TestTimeTrackerSOAP_Server(unittest.TestCase):
         # Real spyne dispatches @rpc methods as unbound functions on the
         # service *class*; it never instantiates TimeControlService and
         # never sets a 'service' attribute on ctx. Per-request state is
-        # carried via ctx.udc instead (see TimeTrackerSOAP_Server.py's
+        # carried via ctx.udc instead (see TimeTrackerSOAP_Service.py's
         # 'method_call' event listener), so we mock that directly here.
         self.mock_tracker = self.MockTimeTrackerClass.return_value
 
@@ -138,7 +138,7 @@ class TestTimeTrackerSOAP_Server(unittest.TestCase):
         priority is appended after task_id in the @rpc signature (not
         grouped with the other content fields before it), so existing
         positional callers that already pass task_id aren't shifted - see
-        TimeTrackerSOAP_Server.py's update_task comment for why.
+        TimeTrackerSOAP_Service.py's update_task comment for why.
         """
         self.mock_tracker.update_task.return_value = True
         result = self.soap_server.TimeControlService.update_task(
@@ -222,28 +222,28 @@ class TestTimeTrackerSOAP_ServerEndToEnd(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         try:
-            import TimeTrackerSOAP_Server
+            import TimeTrackerSOAP_Service
             from spyne import Application
             from spyne.protocol.soap import Soap11
             from spyne.server.wsgi import WsgiApplication
         except ImportError:
-            raise unittest.SkipTest("Could not import TimeTrackerSOAP_Server or spyne.")
+            raise unittest.SkipTest("Could not import TimeTrackerSOAP_Service or spyne.")
         except SystemExit:
-            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Server")
+            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Service")
 
-        cls.soap_server = TimeTrackerSOAP_Server
+        cls.soap_server = TimeTrackerSOAP_Service
         cls.wsgi_app = WsgiApplication(Application(
-            [TimeTrackerSOAP_Server.TimeControlService],
+            [TimeTrackerSOAP_Service.TimeControlService],
             tns='spyne.examples.timecontrol',
             in_protocol=Soap11(validator='lxml'),
             out_protocol=Soap11(),
         ))
 
     def setUp(self):
-        # Patch the name as bound inside TimeTrackerSOAP_Server (it was
+        # Patch the name as bound inside TimeTrackerSOAP_Service (it was
         # imported there via `from tt.TimeTracker import TimeTracker`), so
         # the real TimeTracker (with its file I/O) never runs.
-        patcher = patch('TimeTrackerSOAP_Server.TimeTracker')
+        patcher = patch('TimeTrackerSOAP_Service.TimeTracker')
         self.MockTimeTrackerClass = patcher.start()
         self.addCleanup(patcher.stop)
         self.mock_tracker = self.MockTimeTrackerClass.return_value
@@ -302,5 +302,253 @@ class TestTimeTrackerSOAP_ServerEndToEnd(unittest.TestCase):
         self.mock_tracker.add_main_project.assert_called_once_with("Acme")
 
 
+class TestTimeTrackerSOAP_ServerBatch(unittest.TestCase):
+    """
+    add_tasks and execute_batch against a real TimeTracker on a throwaway
+    file, through spyne's real dispatch - what matters here is what ends up
+    on disk, and how often it got written.
+    """
+
+    DATA = 'test_soap_batch_data.json'
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import TimeTrackerSOAP_Service
+            from spyne import Application
+            from spyne.protocol.soap import Soap11
+            from spyne.server.wsgi import WsgiApplication
+        except ImportError:
+            raise unittest.SkipTest("Could not import TimeTrackerSOAP_Service or spyne.")
+        except SystemExit:
+            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Service")
+
+        cls.soap_server = TimeTrackerSOAP_Service
+        cls.wsgi_app = WsgiApplication(Application(
+            [TimeTrackerSOAP_Service.TimeControlService],
+            tns='spyne.examples.timecontrol',
+            in_protocol=Soap11(validator='lxml'),
+            out_protocol=Soap11(),
+        ))
+
+    def setUp(self):
+        from tt.TimeTracker import TimeTracker
+        if os.path.exists(self.DATA):
+            os.remove(self.DATA)
+        self.RealTimeTracker = TimeTracker
+        patcher = patch('TimeTrackerSOAP_Service.TimeTracker',
+                        lambda: TimeTracker(file_path=self.DATA, op_outbox=None))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        TimeTracker(file_path=self.DATA).add_main_project("Import")
+
+    def tearDown(self):
+        if os.path.exists(self.DATA):
+            os.remove(self.DATA)
+
+    def _reread(self):
+        return self.RealTimeTracker(file_path=self.DATA)
+
+    _post_soap = TestTimeTrackerSOAP_ServerEndToEnd._post_soap
+
+    def test_add_tasks_imports_all_with_one_save(self):
+        saves = []
+        real_save = self.RealTimeTracker._save_data
+        with patch.object(self.RealTimeTracker, '_save_data',
+                          lambda tracker: (saves.append(tracker._batch_ops is None), real_save(tracker))[1]):
+            status, body = self._post_soap(
+                '<tns:add_tasks>'
+                '<tns:main_project_name>Import</tns:main_project_name>'
+                '<tns:tasks xmlns:m="spyne.examples.timecontrol">'
+                '<m:NewTaskModel><m:task_name>One</m:task_name></m:NewTaskModel>'
+                '<m:NewTaskModel><m:task_name>Two</m:task_name>'
+                '<m:due_date>2030-01-02</m:due_date><m:priority>5</m:priority></m:NewTaskModel>'
+                '</tns:tasks>'
+                '</tns:add_tasks>'
+            )
+
+        self.assertTrue(status.startswith('200'), "status=%r body=%r" % (status, body))
+        self.assertIn(b'>2<', body)
+        self.assertEqual(saves.count(True), 1, "the file was written more than once")
+        tasks = {t["task_name"]: t for t in self._reread().list_tasks("Import")}
+        self.assertEqual(set(tasks), {"One", "Two"})
+        self.assertEqual(tasks["Two"]["priority"], 5)
+        self.assertEqual(tasks["Two"]["due_date"], "2030-01-02")
+        self.assertEqual(tasks["One"]["frequency"], "daily")
+
+    def test_add_tasks_to_a_missing_project_adds_nothing(self):
+        status, body = self._post_soap(
+            '<tns:add_tasks>'
+            '<tns:main_project_name>Nowhere</tns:main_project_name>'
+            '<tns:tasks xmlns:m="spyne.examples.timecontrol"><m:NewTaskModel><m:task_name>One</m:task_name></m:NewTaskModel></tns:tasks>'
+            '</tns:add_tasks>'
+        )
+        self.assertTrue(status.startswith('200'), "status=%r body=%r" % (status, body))
+        self.assertIn(b'>0<', body)
+
+    def test_execute_batch_runs_every_operation(self):
+        status, body = self._post_soap(
+            '<tns:execute_batch><tns:operations xmlns:m="spyne.examples.timecontrol">'
+            '<m:BatchOperationModel><m:op>add_task</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>A</m:task_name>'
+            '</m:BatchOperationModel>'
+            '<m:BatchOperationModel><m:op>update_task</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>A</m:task_name>'
+            '<m:priority>7</m:priority>'
+            '</m:BatchOperationModel>'
+            '<m:BatchOperationModel><m:op>start_work</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>A</m:task_name>'
+            '</m:BatchOperationModel>'
+            '</tns:operations></tns:execute_batch>'
+        )
+
+        self.assertTrue(status.startswith('200'), "status=%r body=%r" % (status, body))
+        self.assertEqual(body.count(b'<tns:success>true</tns:success>'), 3, body)
+        tracker = self._reread()
+        self.assertEqual(tracker._get_task("Import", "A")["priority"], 7)
+        self.assertEqual(tracker.get_current_work()["task_name"], "A")
+
+    def test_execute_batch_keeps_nothing_when_one_operation_fails(self):
+        status, body = self._post_soap(
+            '<tns:execute_batch><tns:operations xmlns:m="spyne.examples.timecontrol">'
+            '<m:BatchOperationModel><m:op>add_task</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>A</m:task_name>'
+            '</m:BatchOperationModel>'
+            '<m:BatchOperationModel><m:op>close_task</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>Missing</m:task_name>'
+            '</m:BatchOperationModel>'
+            '<m:BatchOperationModel><m:op>add_task</m:op>'
+            '<m:main_project_name>Import</m:main_project_name><m:task_name>B</m:task_name>'
+            '</m:BatchOperationModel>'
+            '</tns:operations></tns:execute_batch>'
+        )
+
+        self.assertTrue(status.startswith('200'), "status=%r body=%r" % (status, body))
+        # The failing step is the last one reported; the one after never ran.
+        self.assertEqual(body.count(b'<tns:OperationResultModel>'), 2, body)
+        self.assertIn(b'<tns:success>false</tns:success>', body)
+        self.assertEqual(self._reread().list_tasks("Import"), [])
+
+    def test_execute_batch_rejects_an_unknown_operation(self):
+        tracker = self.RealTimeTracker(file_path=self.DATA)
+        ctx = MagicMock()
+        ctx.udc = tracker
+        op = self.soap_server.BatchOperationModel(op='drop_everything')
+
+        results = self.soap_server.TimeControlService.execute_batch(ctx, [op])
+
+        self.assertEqual(len(results), 1)
+        self.assertFalse(results[0].success)
+        self.assertIn('drop_everything', results[0].message)
+
+
+class TestTimeTrackerSOAP_ServerStartup(unittest.TestCase):
+    """
+    The server answers WSDL requests from a cache on disk and builds spyne's
+    application only when something actually needs it.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        try:
+            import TimeTrackerSOAP_Server
+            import TimeTrackerSOAP_Service
+        except (ImportError, SystemExit):
+            raise unittest.SkipTest("Spyne not installed or import error in TimeTrackerSOAP_Server")
+        cls.soap_server = TimeTrackerSOAP_Server
+
+    def setUp(self):
+        import tempfile
+        import shutil
+        self.cache = tempfile.mkdtemp(prefix="timecontrol_wsdl_")
+        self.addCleanup(shutil.rmtree, self.cache, True)
+        env = patch.dict(os.environ, {'XDG_CACHE_HOME': self.cache, 'LOCALAPPDATA': self.cache})
+        env.start()
+        self.addCleanup(env.stop)
+        # The version is read off the real class, whatever an earlier test
+        # had in place when it first imported the server module.
+        from tt.TimeTracker import TimeTracker
+        tracker = patch('TimeTrackerSOAP_Server.TimeTracker', TimeTracker)
+        tracker.start()
+        self.addCleanup(tracker.stop)
+
+    def _get(self, app, port='8600', query='wsdl', host=None):
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': '/',
+            'QUERY_STRING': query,
+            'wsgi.input': io.BytesIO(),
+            'wsgi.url_scheme': 'http',
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': port,
+            'HTTP_HOST': host or 'localhost:%s' % port,
+        }
+        captured = {}
+
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = status
+
+        body = b''.join(app(environ, start_response))
+        return captured['status'], body
+
+    def test_the_first_wsdl_is_generated_and_cached(self):
+        status, body = self._get(self.soap_server.LazySoapApplication())
+        self.assertTrue(status.startswith('200'))
+        self.assertIn(b'execute_batch', body)
+        self.assertIn(b'localhost:8600', body)
+        self.assertEqual(os.listdir(os.path.join(self.cache, 'TimeControl')),
+                         [os.path.basename(self.soap_server._wsdl_cache_path())])
+
+    def test_a_cached_wsdl_is_served_without_building_the_application(self):
+        body = self._get(self.soap_server.LazySoapApplication())[1]
+
+        app = self.soap_server.LazySoapApplication()
+        with patch.object(app, 'wsgi_application', side_effect=AssertionError("built")):
+            status, again = self._get(app)
+
+        self.assertTrue(status.startswith('200'))
+        self.assertEqual(again, body)
+
+    def test_a_cached_wsdl_names_the_address_it_was_fetched_from(self):
+        self._get(self.soap_server.LazySoapApplication(), port='8600')
+        status, body = self._get(self.soap_server.LazySoapApplication(), port='8601')
+        self.assertIn(b'localhost:8601', body)
+        self.assertNotIn(b'localhost:8600', body)
+        self.assertNotIn(self.soap_server._WSDL_ADDRESS.encode(), body)
+
+    def test_any_host_header_is_served_from_one_cache_file(self):
+        app = self.soap_server.LazySoapApplication()
+        for host in ('localhost:8600', '127.0.0.1:8600', 'a"><evil/>'):
+            status, body = self._get(app, host=host)
+            self.assertTrue(status.startswith('200'))
+        self.assertIn(b'a&quot;&gt;&lt;evil/&gt;', body)
+        self.assertNotIn(b'<evil/>', body)
+        self.assertEqual(len(os.listdir(os.path.join(self.cache, 'TimeControl'))), 1)
+
+    def test_the_cache_is_per_version(self):
+        first = self.soap_server._wsdl_cache_path()
+        with patch.object(self.soap_server.TimeTracker, 'VERSION', '0.0-test'):
+            second = self.soap_server._wsdl_cache_path()
+        self.assertNotEqual(first, second)
+
+    def test_wsdls_cached_for_other_versions_are_removed(self):
+        cache_dir = os.path.join(self.cache, 'TimeControl')
+        os.makedirs(cache_dir)
+        for name in ('soap_wsdl_0123456789abcdef.xml', 'unrelated.txt'):
+            with open(os.path.join(cache_dir, name), 'w') as f:
+                f.write('old')
+
+        self._get(self.soap_server.LazySoapApplication())
+
+        self.assertEqual(sorted(os.listdir(cache_dir)),
+                         sorted([os.path.basename(self.soap_server._wsdl_cache_path()), 'unrelated.txt']))
+
+    def test_an_unwritable_cache_only_costs_speed(self):
+        with patch.object(self.soap_server, '_wsdl_cache_dir', return_value=os.devnull):
+            status, body = self._get(self.soap_server.LazySoapApplication())
+        self.assertTrue(status.startswith('200'))
+        self.assertIn(b'definitions', body)
+
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
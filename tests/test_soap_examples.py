@@ -58,9 +58,13 @@ class TestSoapExamplesSmoke(unittest.TestCase):
 
         # Run from the sandbox directory so the server reads/writes its
         # config.json and data.json there instead of the real project files.
+        # Its WSDL cache goes into the sandbox as well, so a stale one from
+        # an earlier run can never stand in for the real thing.
+        env = dict(os.environ, XDG_CACHE_HOME=cls.sandbox_dir, LOCALAPPDATA=cls.sandbox_dir)
         cls.server_process = subprocess.Popen(
             [sys.executable, SOAP_SERVER_SCRIPT],
             cwd=cls.sandbox_dir,
+            env=env,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
             text=True,
@@ -158,6 +162,11 @@ class TestSoapExamplesSmoke(unittest.TestCase):
         # today's report.
         self.assertIn(TASK_NAME, output)
 
+    def test_06_batch(self):
+        output = self._run_example("06_batch.py")
+        self.assertIn("Imported 2 task(s)", output)
+        self.assertEqual(output.count("success=True"), 3, output)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,12 +1,14 @@
 import copy
 import os
+import random
 import sys
 import unittest
 import unittest.mock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from tt.sync_apply import Report, adopt_snapshot, apply_ops, reconcile
+from tt.sync_apply import (Report, Touched, UidIndex, adopt_snapshot, apply_ops, reconcile,
+                           replay_local)
 
 
 def document(*projects):
@@ -1102,6 +1104,272 @@ class TestOneAccountOfSeveralPasses(unittest.TestCase):
         self.assertEqual(first.auto_closed, [(E1, "2026-08-10 10:00:00")])
 
 
+
+class TestAKeptIndex(unittest.TestCase):
+    """
+    The uid index outlives one apply, so a routine round costs no walk of
+    the whole document - and must then stay exactly what a fresh walk finds.
+    """
+
+    def assertSameAsFresh(self, index, doc):
+        fresh = UidIndex(doc)
+        for name in ("projects", "tasks", "task_parent", "entries", "entry_parent"):
+            kept, built = getattr(index, name), getattr(fresh, name)
+            self.assertEqual(set(kept), set(built), name)
+            for uid in built:
+                self.assertIs(kept[uid], built[uid], "%s[%s]" % (name, uid))
+
+    def test_reconcile_walks_the_document_no_more_when_given_one(self):
+        doc = document(project(P1, tasks=[task(T1, entries=[entry(E1)])]))
+        index = UidIndex(doc)
+
+        with unittest.mock.patch.object(UidIndex, '__init__',
+                                        side_effect=AssertionError("rebuilt")):
+            reconcile(doc, [{"s": 1, "op": "task.set", "uid": T1, "f": {"priority": 3}}],
+                      [{"lc": 1, "op": "task.set", "uid": T1, "f": {"note": "x"}}],
+                      index=index)
+
+        self.assertEqual(find_task(doc, T1)["priority"], 3)
+
+    def test_it_follows_what_applying_changes(self):
+        doc = document(project(P1, tasks=[task(T1, entries=[entry(E1)])]), project(P2))
+        index = UidIndex(doc)
+
+        apply_ops(doc, [
+            {"s": 1, "op": "task.create", "uid": T2, "project": P2, "f": {}},
+            {"s": 2, "op": "entry.move", "uid": E1, "task": T2},
+            {"s": 3, "op": "task.move", "uid": T2, "project": P1},
+            {"s": 4, "op": "entry.add", "uid": E2, "task": T1, "start": "2026-08-10 11:00:00"},
+            {"s": 5, "op": "project.delete", "uid": P2},
+        ], index=index)
+
+        self.assertSameAsFresh(index, doc)
+
+    def test_a_change_made_outside_it_is_noted(self):
+        doc = document(project(P1, tasks=[task(T1, entries=[entry(E1)])]))
+        index = UidIndex(doc)
+
+        doc["projects"].append(project(P2, tasks=[task(T2)]))
+        index.note("project.create", uid=P2)
+        # Re-homed, with the old task keeping the same list - as promoting
+        # a task does.
+        find_task(doc, T2)["time_entries"] = find_task(doc, T1)["time_entries"]
+        index.note("entry.move", uid=E1, task=T2)
+        doc["projects"][0]["tasks"] = []
+        index.note("task.delete", uid=T1)
+
+        self.assertTrue(index.covers(doc))
+        self.assertSameAsFresh(index, doc)
+
+    def test_what_cannot_be_followed_is_not_trusted(self):
+        doc = document(project(P1))
+        index = UidIndex(doc)
+
+        index.note("task.create", uid=T1, project=P2)
+        self.assertFalse(index.covers(doc))
+
+        index = UidIndex(doc)
+        doc["projects"] = []
+        self.assertFalse(index.covers(doc), "a swapped project list went unnoticed")
+
+
+class TestRemovingWithoutRebuildingLists(unittest.TestCase):
+    """
+    Moves and deletions mark a position and close the list up once, at the
+    end of the call. What has to hold is that the lists come out exactly as
+    removing one at a time would have left them.
+    """
+
+    def test_what_is_left_keeps_its_order(self):
+        entries = [entry("%016x" % n) for n in range(10)]
+        doc = document(project(P1, tasks=[task(T1, entries=entries), task(T2, tid=2)]))
+
+        apply_ops(doc, [
+            {"s": 1, "op": "entry.delete", "uid": "%016x" % 2},
+            {"s": 2, "op": "entry.move", "uid": "%016x" % 5, "task": T2},
+            {"s": 3, "op": "entry.delete", "uid": "%016x" % 9},
+        ])
+
+        self.assertEqual([e["uid"] for e in find_task(doc, T1)["time_entries"]],
+                         ["%016x" % n for n in (0, 1, 3, 4, 6, 7, 8)])
+        self.assertEqual([e["uid"] for e in find_task(doc, T2)["time_entries"]],
+                         ["%016x" % 5])
+
+    def test_moved_away_and_back_in_one_go_is_there_once(self):
+        doc = document(project(P1, tasks=[task(T1, entries=[entry(E1), entry(E2)]),
+                                          task(T2, tid=2)]))
+
+        apply_ops(doc, [
+            {"s": 1, "op": "entry.move", "uid": E1, "task": T2},
+            {"s": 2, "op": "entry.move", "uid": E1, "task": T1},
+        ])
+
+        self.assertEqual([e["uid"] for e in find_task(doc, T1)["time_entries"]], [E2, E1])
+        self.assertEqual(find_task(doc, T2)["time_entries"], [])
+
+    def test_a_task_moved_out_does_not_go_with_its_old_project(self):
+        doc = document(project(P1, tasks=[task(T1), task(T2, tid=2)]), project(P2, "Q"))
+
+        apply_ops(doc, [
+            {"s": 1, "op": "task.move", "uid": T1, "project": P2},
+            {"s": 2, "op": "project.delete", "uid": P1},
+        ])
+
+        self.assertIsNotNone(find_task(doc, T1))
+        self.assertEqual(sorted(t["uid"] for t in doc["_deleted"]), sorted([P1, T2]))
+
+    def test_a_list_shifted_outside_the_index_is_found_again(self):
+        doc = document(project(P1, tasks=[task(T1), task(T2, tid=2), task(T3, tid=3)]))
+        index = UidIndex(doc)
+
+        # The tracker pops from these lists itself.
+        doc["projects"][0]["tasks"].pop(0)
+        apply_ops(doc, [{"s": 1, "op": "task.delete", "uid": T3}], index=index)
+
+        self.assertEqual([t["uid"] for t in doc["projects"][0]["tasks"]], [T2])
+
+    def test_swept_tombstones_are_read_again(self):
+        doc = document(project(P1))
+        doc["_deleted"] = [{"uid": T1, "kind": "task", "at": "2026-01-01"}]
+        index = UidIndex(doc)
+        self.assertIn(T1, index.tombstones())
+
+        doc["_deleted"] = []
+        apply_ops(doc, [{"s": 1, "op": "task.create", "uid": T1, "project": P1, "f": {}}],
+                  index=index)
+
+        self.assertIsNotNone(find_task(doc, T1), "an expired tombstone still held")
+
+
+class TestReplayingOnlyWhatOverlaps(unittest.TestCase):
+    """
+    reconcile() replays the queued local work only where the incoming
+    operations came near it. The document has to come out as replaying all
+    of it would have left it - which is what these compare against.
+    """
+
+    PROJECTS = ["p%015d" % n for n in range(3)]
+    TASKS = ["t%015d" % n for n in range(4)]
+    ENTRIES = ["e%015d" % n for n in range(8)]
+    TIMES = ["2026-08-10 0%d:00:00" % h for h in range(1, 10)]
+
+    def _start(self):
+        tasks = {p: [] for p in self.PROJECTS}
+        for n, uid in enumerate(self.TASKS[:4]):
+            entries = [entry(e, self.TIMES[0], self.TIMES[1])
+                       for e in self.ENTRIES[2 * n:2 * n + 2]]
+            tasks[self.PROJECTS[n % 3]].append(task(uid, "T%d" % n, entries, tid=n + 1))
+        doc = document(*[project(p, "P%d" % n, tasks[p])
+                         for n, p in enumerate(self.PROJECTS)])
+        doc["next_id"] = 10
+        return doc
+
+    def _some_op(self, rng):
+        kind = rng.choice(["task.set", "task.set", "project.set", "entry.set",
+                           "entry.close", "task.move", "entry.move", "entry.add",
+                           "task.create", "task.delete", "project.delete", "entry.delete"])
+        op = {"op": kind}
+        # Something created gets a uid never seen before, as it would here.
+        if kind in ("task.create", "entry.add"):
+            pool = self.tasks if kind == "task.create" else self.entries
+            pool.append("n%015d" % (len(self.tasks) + len(self.entries)))
+        if kind.startswith("project."):
+            op["uid"] = rng.choice(self.PROJECTS)
+            if kind == "project.set":
+                op["f"] = {rng.choice(["name", "status"]): rng.choice("ab")}
+        elif kind.startswith("task."):
+            op["uid"] = self.tasks[-1] if kind == "task.create" else rng.choice(self.tasks)
+            if kind == "task.set":
+                op["f"] = rng.choice([{"priority": rng.randint(0, 3)},
+                                      {"note": rng.choice("abc")}])
+            if kind in ("task.move", "task.create"):
+                op["project"] = rng.choice(self.PROJECTS)
+        else:
+            op["uid"] = self.entries[-1] if kind == "entry.add" else rng.choice(self.entries)
+            if kind in ("entry.add", "entry.move"):
+                op["task"] = rng.choice(self.tasks)
+                op["start"] = rng.choice(self.TIMES)
+            elif kind == "entry.set":
+                op["f"] = {rng.choice(["start_time", "end_time"]): rng.choice(self.TIMES)}
+            elif kind == "entry.close":
+                op["end"] = rng.choice(self.TIMES)
+        if kind.endswith(".delete"):
+            op["ts"] = "2026-08-10 12:00:00"
+        return op
+
+    def _both_ways(self, seed):
+        rng = random.Random(seed)
+        self.tasks, self.entries = list(self.TASKS), list(self.ENTRIES)
+        # The queue is already in the document: that is what queued means.
+        # And only what actually happened here was queued.
+        start, local = self._start(), []
+        for lc in range(1, rng.randint(2, 12)):
+            op = dict(self._some_op(rng), lc=lc)
+            if apply_ops(start, [dict(op, s=lc)]).applied:
+                local.append(op)
+        incoming = [dict(self._some_op(rng), s=n) for n in range(1, rng.randint(2, 6))]
+
+        # Replaying everything is only a reference where replaying is
+        # harmless, which is what it rests on. A queue that moves an entry
+        # into a task and later deletes that task is not: replayed, the move
+        # lands in a task that has gone and takes the entry with it.
+        again = copy.deepcopy(start)
+        replay_local(again, local)
+        if _comparable(again) != _comparable(start):
+            return None
+
+        everything = copy.deepcopy(start)
+        first = apply_ops(everything, incoming)
+        first.absorb(replay_local(everything, local, floor=first.highest_seq))
+
+        scoped = copy.deepcopy(start)
+        report = reconcile(scoped, incoming, local)
+        return everything, first, scoped, report
+
+    def test_the_same_document_as_replaying_everything(self):
+        compared = 0
+        for seed in range(400):
+            outcome = self._both_ways(seed)
+            if outcome is None:
+                continue
+            compared += 1
+            with self.subTest(seed=seed):
+                everything, first, scoped, report = outcome
+                self.assertEqual(_comparable(scoped), _comparable(everything))
+                self.assertEqual(scoped["next_id"], everything["next_id"])
+                # Replaying everything counts again the time this machine
+                # discarded itself, by deleting the task; never less.
+                self.assertLessEqual(report.discarded_time, first.discarded_time)
+        self.assertGreater(compared, 300)
+
+    def test_work_nowhere_near_the_incoming_is_not_replayed(self):
+        doc = document(project(P1, tasks=[task(T1), task(T2, tid=2)]))
+        local = [{"lc": n, "op": "task.set", "uid": T2, "f": {"note": str(n)}}
+                 for n in range(1, 20001)]
+        find_task(doc, T2)["note"] = "20000"
+
+        with unittest.mock.patch("tt.sync_apply.apply_ops", wraps=apply_ops) as applied:
+            reconcile(doc, [{"s": 1, "op": "task.set", "uid": T1, "f": {"priority": 3}}], local)
+
+        self.assertEqual(applied.call_count, 1, "the queue was replayed anyway")
+        self.assertEqual(find_task(doc, T2)["note"], "20000")
+
+    def test_only_the_object_that_overlaps_is_replayed_and_all_of_it(self):
+        touched = Touched()
+        touched.add([{"s": 1, "op": "task.set", "uid": T1, "f": {"priority": 1}}])
+        local = [
+            {"lc": 1, "op": "task.create", "uid": T1, "project": P1, "f": {}},
+            {"lc": 2, "op": "task.set", "uid": T1, "f": {"note": "x"}},
+            {"lc": 3, "op": "task.set", "uid": T1, "f": {"priority": 5}},
+            {"lc": 4, "op": "task.set", "uid": T2, "f": {"priority": 5}},
+            {"lc": 5, "op": "project.create", "uid": P1, "f": {"name": "P"}},
+        ]
+        doc = document(project(P1, tasks=[task(T1), task(T2, tid=2)]))
+
+        picked = touched.overlapping(local, UidIndex(doc))
+
+        self.assertEqual([op["lc"] for op in picked], [1, 2, 3, 5])
+
 def _comparable(doc):
     """
     The parts of a document two machines have to agree on.
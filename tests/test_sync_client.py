@@ -1,10 +1,15 @@
+import gzip
+import http.server
 import json
 import os
 import shutil
 import sys
 import tempfile
+import threading
 import unittest
+import zlib
 from unittest.mock import patch
+from urllib.parse import parse_qs, urlsplit
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -92,7 +97,7 @@ class TestSyncClientCredentials(unittest.TestCase):
         repeated sign-in harmless.
         """
         identity = sync_client.device_identity()
-        with patch('tt.sync_client.requests.post', return_value=_Response({'ok': True, 'token': 't'})):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response({'ok': True, 'token': 't'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
         sync_client.logout()
 
@@ -101,7 +106,7 @@ class TestSyncClientCredentials(unittest.TestCase):
 
     def test_successful_login_stores_the_token(self):
         reply = {'ok': True, 'token': 'tc1.aa.bb', 'expires_at': 1794000000, 'username': 'frank'}
-        with patch('tt.sync_client.requests.post', return_value=_Response(reply)) as post:
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response(reply)) as post:
             result = sync_client.login('https://x.de/tc', 'frank', 'passwort')
 
         self.assertTrue(result['ok'])
@@ -115,14 +120,14 @@ class TestSyncClientCredentials(unittest.TestCase):
         self.assertEqual(sent['device_uid'], sync_client.device_identity()['device_uid'])
 
     def test_failed_login_stores_nothing(self):
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': False, 'error': 'invalid_credentials'})):
             result = sync_client.login('https://x.de/tc', 'frank', 'falsch')
         self.assertFalse(result['ok'])
         self.assertIsNone(sync_client.load_credentials())
 
     def test_plain_http_is_refused_before_the_password_is_sent(self):
-        with patch('tt.sync_client.requests.post') as post:
+        with patch('tt.sync_client.requests.Session.post') as post:
             result = sync_client.login('http://x.de/tc', 'frank', 'passwort')
         self.assertEqual(result['error'], 'https_required')
         post.assert_not_called()
@@ -132,7 +137,7 @@ class TestSyncClientCredentials(unittest.TestCase):
                      "keeps the file private there is the ACL on the user's "
                      "own profile directory, which this cannot assert on")
     def test_credential_file_is_owner_only_on_posix(self):
-        with patch('tt.sync_client.requests.post', return_value=_Response({'ok': True, 'token': 't'})):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response({'ok': True, 'token': 't'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
         path = sync_client._credentials_path()
         self.assertEqual(os.stat(path).st_mode & 0o077, 0,
@@ -150,13 +155,13 @@ class TestSyncClientCredentials(unittest.TestCase):
             (real_requests.exceptions.ConnectionError, 'unreachable'),
         ]
         for exc, expected in cases:
-            with patch('tt.sync_client.requests.post', side_effect=exc()):
+            with patch('tt.sync_client.requests.Session.post', side_effect=exc()):
                 result = sync_client.login('https://x.de/tc', 'frank', 'pw')
             self.assertEqual(result['error'], expected)
 
     def test_non_json_answer_is_reported_as_such(self):
         """Another application answering on that path, or an HTML error page."""
-        with patch('tt.sync_client.requests.post', return_value=_Response(None, status=500)):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response(None, status=500)):
             result = sync_client.login('https://x.de/tc', 'frank', 'pw')
         self.assertEqual(result['error'], 'bad_response')
 
@@ -164,26 +169,26 @@ class TestSyncClientCredentials(unittest.TestCase):
         self.assertEqual(sync_client.status()['state'], 'not_configured')
 
     def test_status_reports_a_rejected_token(self):
-        with patch('tt.sync_client.requests.post', return_value=_Response({'ok': True, 'token': 't'})):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response({'ok': True, 'token': 't'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': False, 'error': 'invalid_token'})):
             self.assertEqual(sync_client.status()['state'], 'rejected')
 
     def test_status_separates_unreachable_from_rejected(self):
-        with patch('tt.sync_client.requests.post', return_value=_Response({'ok': True, 'token': 't'})):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response({'ok': True, 'token': 't'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
         import requests as real_requests
-        with patch('tt.sync_client.requests.get', side_effect=real_requests.exceptions.Timeout()):
+        with patch('tt.sync_client.requests.Session.get', side_effect=real_requests.exceptions.Timeout()):
             state = sync_client.status()
         self.assertEqual(state['state'], 'unreachable')
         self.assertEqual(state['error'], 'timeout')
 
     def test_signing_out_forgets_the_token_even_if_the_server_is_down(self):
-        with patch('tt.sync_client.requests.post', return_value=_Response({'ok': True, 'token': 't'})):
+        with patch('tt.sync_client.requests.Session.post', return_value=_Response({'ok': True, 'token': 't'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
         import requests as real_requests
-        with patch('tt.sync_client.requests.get', side_effect=real_requests.exceptions.ConnectionError()):
+        with patch('tt.sync_client.requests.Session.get', side_effect=real_requests.exceptions.ConnectionError()):
             sync_client.logout()
         self.assertIsNone(sync_client.load_credentials())
 
@@ -195,7 +200,7 @@ class TestSyncClientCredentials(unittest.TestCase):
         Two different mistakes with two different remedies, so they must not
         collapse into one message - and neither should reach the network.
         """
-        with patch('tt.sync_client.requests.post') as post:
+        with patch('tt.sync_client.requests.Session.post') as post:
             self.assertEqual(sync_client.login('', 'frank', 'pw')['error'], 'no_server')
             self.assertEqual(sync_client.login('https://x.de/tc', '', 'pw')['error'],
                              'missing_credentials')
@@ -209,7 +214,7 @@ class TestSyncClientCredentials(unittest.TestCase):
         body with ok: true in it. Storing that would leave a credential file
         with no token in it, and the failure would surface much later.
         """
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'message': 'hello'})):
             result = sync_client.login('https://x.de/tc', 'frank', 'pw')
         self.assertFalse(result['ok'])
@@ -217,10 +222,10 @@ class TestSyncClientCredentials(unittest.TestCase):
         self.assertIsNone(sync_client.load_credentials())
 
     def test_status_reports_a_working_token(self):
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'token': 't', 'expires_at': 1794000000})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'device_uid': 'abc', 'expires_at': 1800000000})):
             state = sync_client.status()
 
@@ -246,7 +251,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
         self.tmp = tempfile.mkdtemp()
         self._real = sync_client.config_dir
         sync_client.config_dir = lambda: self.tmp
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'token': 'tok'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
 
@@ -256,8 +261,8 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
 
     def test_none_of_them_work_without_a_credential(self):
         sync_client.clear_credentials()
-        with patch('tt.sync_client.requests.get') as get, \
-             patch('tt.sync_client.requests.post') as post:
+        with patch('tt.sync_client.requests.Session.get') as get, \
+             patch('tt.sync_client.requests.Session.post') as post:
             for call in (lambda: sync_client.head(),
                          lambda: sync_client.push(0, []),
                          lambda: sync_client.pull(0)):
@@ -266,7 +271,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
         post.assert_not_called()
 
     def test_head_is_a_get_carrying_the_token(self):
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'head': 7})) as get:
             self.assertEqual(sync_client.head()['head'], 7)
 
@@ -276,7 +281,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
 
     def test_push_sends_the_batch_in_the_body(self):
         ops = [{'op': 'task.set', 'lc': 1, 'uid': 'a' * 16, 'f': {'priority': 3}}]
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'head': 1, 'assigned': [[1, 1]]})) as post:
             sync_client.push(12, ops)
 
@@ -292,7 +297,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
         would be ignored, since would stay at nought, and every cycle would
         fetch the whole log from the beginning.
         """
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'head': 9, 'ops': []})) as get:
             sync_client.pull(40, limit=25)
 
@@ -300,7 +305,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
                          {'a': 'pull', 'since': 40, 'limit': 25})
 
     def test_pull_asks_for_no_more_than_the_server_will_give(self):
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'head': 0, 'ops': []})) as get:
             sync_client.pull(0)
         self.assertEqual(get.call_args.kwargs['params']['limit'],
@@ -308,19 +313,19 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
 
     def test_the_numbers_are_sent_as_numbers(self):
         """A string reaching the server would be compared as one."""
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'head': 0, 'ops': []})) as get:
             sync_client.pull('40')
         self.assertEqual(get.call_args.kwargs['params']['since'], 40)
 
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'head': 0})) as post:
             sync_client.push('3', [])
         self.assertEqual(json.loads(post.call_args.kwargs['data'])['base_seq'], 3)
 
     def test_a_transport_failure_reaches_the_caller_as_a_code(self):
         import requests as real_requests
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    side_effect=real_requests.exceptions.SSLError()):
             self.assertEqual(sync_client.push(0, [])['error'], 'tls_failed')
 
@@ -329,7 +334,7 @@ class TestTheRequestsTheLogEndpointsBuild(unittest.TestCase):
         The engine keys its backoff on this code, so it has to survive the
         trip rather than being folded into a generic failure.
         """
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': False, 'error': 'invalid_token'}, status=401)):
             self.assertEqual(sync_client.pull(0)['error'], 'invalid_token')
 
@@ -386,6 +391,197 @@ class TestABatchThatWillActuallyArrive(unittest.TestCase):
         """The envelope, and whatever the transfer adds on top."""
         self.assertLess(sync_client.MAX_BYTES_PER_CALL, 1048576)
 
+    def test_compressed_the_budget_is_spent_on_what_travels(self):
+        """
+        Notes are mostly repetition, and it is the compressed body the server
+        limits - so counting the raw bytes would send a fraction of what fits.
+        """
+        ops = [self._op(n, padding=4000) for n in range(1, 501)]
+        packed = sync_client.fit_batch(ops, encoding='gzip')
+        self.assertGreater(len(packed), len(sync_client.fit_batch(ops)))
+
+        body = json.dumps({'base_seq': 0, 'ops': packed}, ensure_ascii=False).encode('utf-8')
+        self.assertLessEqual(len(sync_client._compress(body, 'gzip')),
+                             sync_client.MAX_BYTES_PER_CALL)
+        self.assertLessEqual(len(body), sync_client.MAX_INFLATED_BYTES_PER_CALL * 1.1)
+
+    def test_compressed_a_batch_that_hardly_shrinks_still_fits(self):
+        """The running figure must never be below what the body weighs."""
+        ops = [self._op(n) for n in range(1, 501)]
+        for op in ops:
+            op['f']['note'] = os.urandom(1500).hex()
+        batch = sync_client.fit_batch(ops, encoding='gzip')
+
+        self.assertLess(len(batch), 500)
+        body = json.dumps({'base_seq': 0, 'ops': batch}, ensure_ascii=False).encode('utf-8')
+        self.assertLessEqual(len(sync_client._compress(body, 'gzip')),
+                             sync_client.MAX_BYTES_PER_CALL)
+
+
+class _StandInServer(http.server.ThreadingHTTPServer):
+    """
+    Just enough of index.php to see what actually goes over the wire: head
+    names the encodings it reads, request bodies are unpacked the way
+    tc_raw_body() unpacks them, and replies are compressed for a client that
+    asks, as ob_gzhandler does.
+    """
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _StandInHandler)
+        self.encodings = ['gzip', 'deflate']
+        self.received = []     # (action, Content-Encoding, wire bytes, decoded)
+        self.heads = 0
+        self.replied_compressed = []
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+
+class _StandInHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, payload):
+        body = json.dumps(payload).encode('utf-8')
+        packed = 'gzip' in self.headers.get('Accept-Encoding', '')
+        self.server.replied_compressed.append(packed)
+        if packed:
+            body = gzip.compress(body)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if packed:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        action = parse_qs(urlsplit(self.path).query)['a'][0]
+        if action == 'head':
+            self.server.heads += 1
+            self._reply({'ok': True, 'head': 0, 'encodings': self.server.encodings})
+        else:
+            self._reply({'ok': True, 'head': 300, 'more': False,
+                         'ops': [{'s': n, 'op': 'task.set', 'uid': '%016x' % n,
+                                  'f': {'priority': 1}} for n in range(1, 301)]})
+
+    def do_POST(self):
+        action = parse_qs(urlsplit(self.path).query)['a'][0]
+        raw = self.rfile.read(int(self.headers['Content-Length']))
+        encoding = self.headers.get('Content-Encoding')
+        if encoding and encoding not in self.server.encodings:
+            # What an older server makes of a body it cannot unpack.
+            return self._reply({'ok': False, 'error': 'bad_json'})
+        decoded = {'gzip': gzip.decompress, 'deflate': zlib.decompress,
+                   None: lambda b: b}[encoding](raw)
+        self.server.received.append((action, encoding, len(raw), json.loads(decoded)))
+        self._reply({'ok': True, 'head': 1, 'assigned': [], 'dups': [], 'ops': [],
+                     'more': False, 'snapshot_seq': 1})
+
+
+class TestCompressedBodies(unittest.TestCase):
+    """
+    Operations with long notes, and whole documents, shrink to a fraction -
+    and the push and snapshot limits are limits on what travels. But only a
+    server that has said it reads gzip may be sent it: an older one takes the
+    bytes for broken JSON, and every push would fail.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._real = sync_client.config_dir
+        sync_client.config_dir = lambda: self.tmp
+        self.server = _StandInServer()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        sync_client._encodings.clear()
+        sync_client._reset_session()
+        sync_client._write_private(sync_client._credentials_path(), {
+            'version': 1, 'username': 'frank', 'token': 'tok',
+            'base_url': 'http://127.0.0.1:%d/index.php' % self.server.server_port,
+        })
+
+    def tearDown(self):
+        sync_client._encodings.clear()
+        sync_client._reset_session()
+        sync_client.config_dir = self._real
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _ops(self, count, note='Prüfstand kalibriert, Messreihe wiederholt. '):
+        return [{'op': 'task.set', 'lc': n, 'uid': '%016x' % n, 'f': {'note': note * 20}}
+                for n in range(1, count + 1)]
+
+    def test_a_large_push_travels_compressed_and_arrives_intact(self):
+        ops = self._ops(200)
+        self.assertTrue(sync_client.push(5, ops)['ok'])
+
+        action, encoding, wire, decoded = self.server.received[-1]
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(decoded, {'base_seq': 5, 'ops': ops})
+        plain = len(json.dumps(decoded, ensure_ascii=False).encode('utf-8'))
+        self.assertLess(wire, plain / 10)
+
+    def test_the_server_is_asked_once_not_on_every_call(self):
+        for _ in range(3):
+            sync_client.push(0, self._ops(50))
+        self.assertEqual(self.server.heads, 1)
+        self.assertEqual(sync_client.negotiated_encoding(), 'gzip')
+
+    def test_a_small_body_goes_out_as_it_is(self):
+        sync_client.push(0, self._ops(1, note='kurz'))
+        self.assertIsNone(self.server.received[-1][1])
+        self.assertEqual(self.server.heads, 0, "asked about compression for nothing")
+
+    def test_a_server_that_does_not_offer_it_is_sent_plain_bodies(self):
+        self.server.encodings = []
+        ops = self._ops(200)
+        self.assertTrue(sync_client.push(0, ops)['ok'])
+        self.assertIsNone(self.server.received[-1][1])
+        self.assertEqual(self.server.received[-1][3]['ops'], ops)
+
+    def test_deflate_is_used_where_gzip_is_not_offered(self):
+        self.server.encodings = ['deflate']
+        ops = self._ops(200)
+        sync_client.push(0, ops)
+        self.assertEqual(self.server.received[-1][1], 'deflate')
+        self.assertEqual(self.server.received[-1][3]['ops'], ops)
+
+    def test_a_server_that_stops_reading_it_is_sent_plain_again(self):
+        """Replaced by an older version since it was asked."""
+        sync_client.push(0, self._ops(200))
+        self.server.encodings = []
+
+        self.assertEqual(sync_client.push(0, self._ops(200))['error'], 'bad_json')
+        self.assertTrue(sync_client.push(0, self._ops(200))['ok'])
+        self.assertIsNone(self.server.received[-1][1])
+
+    def test_replies_come_back_compressed_and_are_unpacked(self):
+        result = sync_client.pull(0)
+        self.assertEqual(len(result['ops']), 300)
+        self.assertEqual(self.server.replied_compressed, [True])
+
+    def test_a_document_too_large_to_send_plain_goes_compressed(self):
+        document = {'projects': [{'uid': 'a' * 16,
+                                  'note': 'x' * (sync_client.MAX_SNAPSHOT_BYTES + 1)}]}
+        self.assertTrue(sync_client.put_snapshot(1, document)['ok'])
+
+        action, encoding, wire, decoded = self.server.received[-1]
+        self.assertEqual((action, encoding), ('snapshot', 'gzip'))
+        self.assertEqual(decoded, document)
+        self.assertLessEqual(wire, sync_client.MAX_SNAPSHOT_BYTES)
+
+    def test_but_not_one_past_what_the_server_will_unpack(self):
+        document = {'projects': [{'uid': 'a' * 16,
+                                  'note': 'x' * sync_client.MAX_SNAPSHOT_INFLATED_BYTES}]}
+        result = sync_client.put_snapshot(1, document)
+        self.assertEqual(result['error'], 'snapshot_too_large')
+        self.assertEqual(self.server.received, [])
+
+    def test_signing_in_again_asks_again(self):
+        sync_client.push(0, self._ops(200))
+        sync_client.clear_credentials()
+        self.assertEqual(sync_client._encodings, {})
+
 
 class TestTheCallCannotHangForEver(unittest.TestCase):
     """
@@ -412,7 +608,7 @@ class TestTheCallCannotHangForEver(unittest.TestCase):
         original = sync_client.DEADLINE
         sync_client.DEADLINE = 0.3
         try:
-            with patch('tt.sync_client.requests.post',
+            with patch('tt.sync_client.requests.Session.post',
                        side_effect=lambda *a, **k: threading.Event().wait()):
                 result = sync_client.login('https://x.de/tc', 'frank', 'pw')
         finally:
@@ -428,6 +624,85 @@ class TestTheCallCannotHangForEver(unittest.TestCase):
         self.assertGreater(sync_client.DEADLINE, 2 * sync_client.TIMEOUT)
 
 
+class TestConnectionsAreKeptOpen(unittest.TestCase):
+    """
+    A catch-up cycle pulls page after page from the same server. Opening a
+    connection for each one paid a TLS handshake per page; the pool is what
+    stops that, and resetting it is what stops a broken connection - or one
+    to the wrong server - being reused.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self._real = sync_client.config_dir
+        sync_client.config_dir = lambda: self.tmp
+        sync_client._reset_session()
+        with patch('tt.sync_client.requests.Session.post',
+                   return_value=_Response({'ok': True, 'token': 'tok'})):
+            sync_client.login('https://x.de/tc', 'frank', 'pw')
+
+    def tearDown(self):
+        sync_client._reset_session()
+        sync_client.config_dir = self._real
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_consecutive_calls_share_one_session(self):
+        with patch('tt.sync_client.requests.Session.get',
+                   return_value=_Response({'ok': True, 'head': 1})):
+            sync_client.head()
+            first = sync_client._session
+            sync_client.pull(0)
+        self.assertIsNotNone(first)
+        self.assertIs(sync_client._session, first)
+
+    def test_the_pool_is_bounded(self):
+        session = sync_client._session_for('https://x.de/tc')
+        adapter = session.get_adapter('https://x.de/tc/index.php')
+        self.assertEqual(adapter._pool_maxsize, sync_client.POOL_SIZE)
+
+    def test_a_transport_failure_starts_the_next_call_afresh(self):
+        import requests as real_requests
+        with patch('tt.sync_client.requests.Session.get',
+                   return_value=_Response({'ok': True, 'head': 1})):
+            sync_client.head()
+        before = sync_client._session
+        with patch('tt.sync_client.requests.Session.get',
+                   side_effect=real_requests.exceptions.ConnectionError()):
+            self.assertEqual(sync_client.head()['error'], 'unreachable')
+        self.assertIsNone(sync_client._session)
+        with patch('tt.sync_client.requests.Session.get',
+                   return_value=_Response({'ok': True, 'head': 1})):
+            sync_client.head()
+        self.assertIsNot(sync_client._session, before)
+
+    def test_a_failure_does_not_close_the_pool_under_calls_in_flight(self):
+        import requests as real_requests
+        with patch('tt.sync_client.requests.Session.close', autospec=True) as close:
+            in_flight = sync_client._session_for('https://x.de/tc')
+            with patch('tt.sync_client.requests.Session.get',
+                       side_effect=real_requests.exceptions.ConnectionError()):
+                self.assertEqual(sync_client.head()['error'], 'unreachable')
+            self.assertIsNone(sync_client._session)
+            close.assert_not_called()
+
+            sync_client._release_session(in_flight)
+            close.assert_called_once_with(in_flight)
+
+    def test_another_server_never_gets_this_one_s_connections(self):
+        first = sync_client._session_for('https://x.de/tc')
+        self.assertIs(sync_client._session_for('https://X.de/tc/'), first)
+        self.assertIsNot(sync_client._session_for('https://y.de/tc'), first)
+
+    def test_signing_in_or_out_drops_the_session(self):
+        for change in (lambda: sync_client.clear_credentials(),
+                       lambda: sync_client.login('https://x.de/tc', 'frank', 'pw')):
+            sync_client._session_for('https://x.de/tc')
+            with patch('tt.sync_client.requests.Session.post',
+                       return_value=_Response({'ok': True, 'token': 'tok'})):
+                change()
+            self.assertIsNone(sync_client._session)
+
+
 class TestWhichAddressIsActuallyInUse(unittest.TestCase):
     """
     The setting and the credential are two addresses, and only one of them is
@@ -446,7 +721,7 @@ class TestWhichAddressIsActuallyInUse(unittest.TestCase):
         shutil.rmtree(self.tmp, ignore_errors=True)
 
     def sign_in(self, address):
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'token': 'tok'})):
             sync_client.login(address, 'frank', 'pw')
 
@@ -521,16 +796,19 @@ class TestTheSnapshotEndpoint(unittest.TestCase):
         self.tmp = tempfile.mkdtemp()
         self._real = sync_client.config_dir
         sync_client.config_dir = lambda: self.tmp
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'token': 'tok'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
+        # A server that reads nothing compressed, so the body is the document.
+        sync_client._remember_encoding('https://x.de/tc', {})
 
     def tearDown(self):
+        sync_client._encodings.clear()
         sync_client.config_dir = self._real
         shutil.rmtree(self.tmp, ignore_errors=True)
 
     def test_fetching_one_is_a_get_naming_the_action(self):
-        with patch('tt.sync_client.requests.get',
+        with patch('tt.sync_client.requests.Session.get',
                    return_value=_Response({'ok': True, 'seq': 12, 'document': {}})) as get:
             result = sync_client.get_snapshot()
 
@@ -545,7 +823,7 @@ class TestTheSnapshotEndpoint(unittest.TestCase):
         bytes exactly as they arrived.
         """
         document = {'schema_version': 2, 'projects': [{'uid': 'a' * 16}]}
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'snapshot_seq': 12})) as post:
             sync_client.put_snapshot(12, document)
 
@@ -559,7 +837,7 @@ class TestTheSnapshotEndpoint(unittest.TestCase):
         rest of the installation's life.
         """
         huge = {'projects': [{'uid': 'a' * 16, 'note': 'x' * sync_client.MAX_SNAPSHOT_BYTES}]}
-        with patch('tt.sync_client.requests.post') as post:
+        with patch('tt.sync_client.requests.Session.post') as post:
             result = sync_client.put_snapshot(1, huge)
 
         self.assertFalse(result['ok'])
@@ -578,11 +856,14 @@ class TestWhatIsMeasuredIsWhatIsSent(unittest.TestCase):
         self.tmp = tempfile.mkdtemp()
         self._real = sync_client.config_dir
         sync_client.config_dir = lambda: self.tmp
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True, 'token': 'tok'})):
             sync_client.login('https://x.de/tc', 'frank', 'pw')
+        # Measured uncompressed; TestCompressedBodies has the other case.
+        sync_client._remember_encoding('https://x.de/tc', {})
 
     def tearDown(self):
+        sync_client._encodings.clear()
         sync_client.config_dir = self._real
         shutil.rmtree(self.tmp, ignore_errors=True)
 
@@ -598,7 +879,7 @@ class TestWhatIsMeasuredIsWhatIsSent(unittest.TestCase):
                for n in range(1, 400)]
         batch = sync_client.fit_batch(ops)
 
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True})) as post:
             sync_client.push(0, batch)
 
@@ -621,7 +902,7 @@ class TestWhatIsMeasuredIsWhatIsSent(unittest.TestCase):
         names are not - that is a UnicodeEncodeError on a perfectly ordinary
         entry rather than anything to do with size.
         """
-        with patch('tt.sync_client.requests.post',
+        with patch('tt.sync_client.requests.Session.post',
                    return_value=_Response({'ok': True})) as post:
             sync_client.push(0, [{'op': 'task.set', 'lc': 1, 'uid': 'a' * 16,
                                   'f': {'task_name': 'Prüfstände'}}])
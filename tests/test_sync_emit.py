@@ -1,6 +1,7 @@
 import os
 import sys
 import unittest
+import unittest.mock
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
@@ -22,6 +23,11 @@ class RecordingOutbox:
         self.ops.append(dict(op=op, **fields))
         return len(self.ops)
 
+    def extend(self, operations):
+        self.extended = getattr(self, 'extended', 0) + 1
+        self.ops.extend(dict(op) for op in operations)
+        return list(range(len(self.ops) - len(operations) + 1, len(self.ops) + 1))
+
     # -- helpers the tests read with ------------------------------------
 
     def names(self):
@@ -283,6 +289,57 @@ class TestOperationsAreReported(unittest.TestCase):
         self.assertEqual(outbox.ops, [])
 
 
+class TestBatchesAreReportedOnce(unittest.TestCase):
+
+    def setUp(self):
+        if os.path.exists(TEST_FILE_PATH):
+            os.remove(TEST_FILE_PATH)
+        self.outbox = RecordingOutbox()
+        self.tracker = TimeTracker(file_path=TEST_FILE_PATH, op_outbox=self.outbox)
+        self.tracker.add_main_project("P")
+        self.outbox.reset()
+
+    def tearDown(self):
+        if os.path.exists(TEST_FILE_PATH):
+            os.remove(TEST_FILE_PATH)
+
+    def test_a_batch_is_queued_in_one_write_in_the_order_it_was_made(self):
+        with self.tracker.batch():
+            self.tracker.add_task("P", "A")
+            self.tracker.add_task("P", "B")
+            self.tracker.close_task("P", "A")
+
+        self.assertEqual(self.outbox.extended, 1)
+        self.assertEqual(self.outbox.names(), ['task.create', 'task.create', 'task.set'])
+        self.assertEqual(self.outbox.ops[2]['uid'], self.tracker._get_task("P", "A")['uid'])
+
+    def test_a_failed_batch_queues_nothing(self):
+        """The document is rolled back, so nothing may tell the server otherwise."""
+        with self.assertRaises(ValueError):
+            with self.tracker.batch():
+                self.tracker.add_task("P", "A")
+                raise ValueError()
+        self.assertEqual(self.outbox.ops, [])
+
+    def test_a_batch_is_queued_before_it_is_saved(self):
+        """Same order as a single change: queued first, then committed."""
+        order = []
+        real_extend = self.outbox.extend
+        self.outbox.extend = lambda ops: (order.append('queued'), real_extend(ops))[1]
+        real_save = TimeTracker._save_data
+
+        def save(tracker):
+            if tracker._batch_ops is None:
+                order.append('saved')
+            real_save(tracker)
+
+        with unittest.mock.patch.object(TimeTracker, '_save_data', save):
+            with self.tracker.batch():
+                self.tracker.add_task("P", "A")
+
+        self.assertEqual(order, ['queued', 'saved'])
+
+
 class TestSyncOffByDefault(unittest.TestCase):
 
     def setUp(self):
@@ -3,13 +3,14 @@ import os
 import shutil
 import sys
 import tempfile
+import threading
 import time
 import unittest
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
 from tt import sync_client, sync_engine
-from tt.sync_outbox import Outbox
+from tt.sync_outbox import Outbox, coalesce
 from tt.TimeTracker import TimeTracker
 
 
@@ -168,6 +169,23 @@ class TestOneCycle(EngineTestCase):
         self.assertEqual(len(self.server.log), 1)
         self.assertEqual(self.outbox.pending(), [], "an acknowledged change stayed queued")
 
+    def test_repeated_edits_go_out_as_one(self):
+        """
+        Each edit of a task queues a 'task.set'. Sent separately they would
+        cost a row each in the server's log for good; the last one, carrying
+        all of their fields, says the same.
+        """
+        self.queue('task.set', uid=T1, f={'priority': 1, 'note': 'a'})
+        self.queue('task.set', uid=T1, f={'priority': 2})
+        self.queue('task.set', uid=T1, f={'today': True})
+        sync_engine.run_cycle(self.outbox)
+
+        self.assertEqual(len(self.server.log), 1)
+        self.assertEqual(self.server.log[0]['lc'], 3)
+        self.assertEqual(self.server.log[0]['f'], {'priority': 2, 'note': 'a', 'today': True})
+        self.assertEqual(self.outbox.pending(), [],
+                         "the edits folded into the one sent stayed queued")
+
     def test_what_arrives_is_filed_rather_than_applied(self):
         """
         The cycle runs off the interface's thread, so it must not touch the
@@ -250,6 +268,32 @@ class TestRepeatedPush(EngineTestCase):
         sync_engine.run_cycle(self.outbox)
         self.assertEqual(self.outbox.pending(), [])
 
+    def test_an_edit_that_landed_is_not_folded_into_the_next(self):
+        """
+        The first edit reached the log, its answer did not, and the other
+        machine then changed the same field. Folded into the next edit here,
+        the first would go out again under a new number - and put the old
+        value back over the other machine's change.
+        """
+        self.queue('task.set', uid=T1, f={'priority': 5})
+
+        def lost_answer(since, ops):
+            self.server.push(since, ops)
+            return {'ok': False, 'error': 'unreachable'}
+        sync_client.push = lost_answer
+        sync_engine.run_cycle(self.outbox)
+        sync_client.push = self.server.push
+
+        self.server.add_foreign('task.set', uid=T1, f={'priority': 9})
+        self.queue('task.set', uid=T1, f={'note': 'x'})
+        sync_engine.run_cycle(self.outbox)
+
+        writes = [o['f']['priority'] for o in self.server.log if 'priority' in o.get('f', {})]
+        self.assertEqual(writes, [5, 9], "the landed edit was sent again as new")
+        self.assertEqual(self.server.log[-1]['f'], {'note': 'x'})
+        self.assertEqual(self.outbox.pending(), [])
+        self.assertEqual(self.outbox.offered(), set())
+
 
 class TestPartialAnswers(EngineTestCase):
     """
@@ -289,8 +333,9 @@ class TestPartialAnswers(EngineTestCase):
         original = sync_client.MAX_OPS_PER_CALL
         sync_client.MAX_OPS_PER_CALL = 3
         try:
+            # Seven different tasks: edits of one would be coalesced into one.
             for i in range(7):
-                self.queue('task.set', uid=T1, f={'priority': i})
+                self.queue('task.set', uid='t%015d' % i, f={'priority': i})
 
             first = sync_engine.run_cycle(self.outbox)
             self.assertTrue(first['more'], "the cycle did not say there was more to send")
@@ -339,7 +384,7 @@ class TestABatchTheServerCanActuallyRead(EngineTestCase):
 
     def test_a_cycle_never_sends_more_than_the_server_will_read(self):
         for n in range(60):
-            self.queue('task.set', uid=T1, f={'note': 'x' * 20000})
+            self.queue('task.set', uid='t%015d' % n, f={'note': 'x' * 20000})
 
         sent = {}
         real = self.server.push
@@ -358,7 +403,7 @@ class TestABatchTheServerCanActuallyRead(EngineTestCase):
 
     def test_a_large_backlog_still_drains_completely(self):
         for n in range(40):
-            self.queue('task.set', uid=T1, f={'note': 'x' * 30000})
+            self.queue('task.set', uid='t%015d' % n, f={'note': 'x' * 30000})
         for _ in range(20):
             if not self.outbox.pending():
                 break
@@ -368,7 +413,7 @@ class TestABatchTheServerCanActuallyRead(EngineTestCase):
 
     def test_the_order_survives_being_split(self):
         for n in range(30):
-            self.queue('task.set', uid=T1, f={'note': 'x' * 30000, 'priority': n})
+            self.queue('task.set', uid='t%015d' % n, f={'note': 'x' * 30000, 'priority': n})
         for _ in range(20):
             if not self.outbox.pending():
                 break
@@ -421,6 +466,81 @@ class TestFailures(EngineTestCase):
         self.assertEqual(state['failures'], 0)
         self.assertEqual(state['next_attempt'], 0)
 
+    def test_the_next_pages_are_asked_for_before_this_one_is_filed(self):
+        """
+        Forty round trips one after another is what a machine back from a
+        holiday used to wait out.
+        """
+        self.server.page = 3
+        for i in range(30):
+            self.server.add_foreign('task.set', uid=T1, f={'priority': i})
+        self.queue('task.set', uid=T1, f={'priority': 99})
+        self.server.push(0, [dict(o) for o in self.outbox.pending()])
+
+        flight = {'now': 0, 'most': 0}
+        lock = threading.Lock()
+        real_pull = self.server.pull
+
+        def slow(since, limit=500):
+            with lock:
+                flight['now'] += 1
+                flight['most'] = max(flight['most'], flight['now'])
+            time.sleep(0.02)
+            try:
+                return real_pull(since, limit)
+            finally:
+                with lock:
+                    flight['now'] -= 1
+
+        sync_client.pull = slow
+        self.assertTrue(sync_engine.run_cycle(self.outbox)['ok'])
+
+        self.assertGreater(flight['most'], 1, "the pages were still fetched one by one")
+        self.assertLessEqual(flight['most'], sync_engine.PULL_READ_AHEAD + 1)
+        collected = [o for r in sync_engine.read_inbox() for o in r['ops']]
+        self.assertEqual([o['s'] for o in collected], list(range(1, 32)))
+
+    def test_each_page_is_filed_as_it_arrives(self):
+        """Rather than the whole backlog held in memory until the end."""
+        self.server.page = 4
+        for i in range(10):
+            self.server.add_foreign('task.set', uid=T1, f={'priority': i})
+        self.queue('task.set', uid=T1, f={'priority': 99})
+        self.server.push(0, [dict(o) for o in self.outbox.pending()])
+
+        sync_engine.run_cycle(self.outbox)
+
+        records = sync_engine.read_inbox()
+        self.assertEqual([len(r['ops']) for r in records], [4, 4, 3])
+        self.assertEqual([r['base_seq'] for r in records], [4, 8, 11],
+                         "a record claims more of the log than it carries")
+
+    def test_a_page_shorter_than_the_last_does_not_leave_a_gap(self):
+        """
+        The pages ahead are asked for on the guess that the next is as long
+        as this one. When it is not, what was asked for from the wrong place
+        must be dropped, not stitched on.
+        """
+        for i in range(20):
+            self.server.add_foreign('task.set', uid=T1, f={'priority': i})
+        self.server.page = 5
+        real_pull = self.server.pull
+
+        def uneven(since, limit=500):
+            reply = real_pull(since, limit)
+            if since == 5:
+                # A short page, with more still to come.
+                reply['ops'] = reply['ops'][:2]
+            return reply
+
+        sync_client.pull = uneven
+        self.queue('task.set', uid=T1, f={'priority': 99})
+        self.server.push(0, [dict(o) for o in self.outbox.pending()])
+        sync_engine.run_cycle(self.outbox)
+
+        collected = [o['s'] for r in sync_engine.read_inbox() for o in r['ops']]
+        self.assertEqual(collected, list(range(1, 22)))
+
     def test_a_failure_partway_through_keeps_what_did_arrive(self):
         self.server.page = 2
         for i in range(6):
@@ -573,6 +693,116 @@ class TestApplying(EngineTestCase):
 
         self.assertEqual(self.tracker._get_task('P', 'T')['priority'], 8)
 
+    def test_the_kept_index_follows_everything_done_here(self):
+        """
+        Built once and then followed, so it has to end up exactly where a
+        fresh walk of the document would - through the restructurings that
+        re-home time entries, too.
+        """
+        from tt.sync_apply import UidIndex
+        index = self.tracker.uid_index()
+        self.tracker.add_main_project('A')
+        self.tracker.add_main_project('B')
+        self.tracker.add_task('A', 'One')
+        self.tracker.add_task('A', 'Two')
+        self.tracker.start_work('A', 'One')
+        self.tracker.stop_work()
+        self.tracker.move_task('A', 'Two', 'B')
+        self.tracker.promote_task_to_project('A', 'One')
+        self.tracker.demote_main_project('B', 'One')
+        self.tracker.delete_main_project('A')
+
+        self.assertIs(self.tracker.uid_index(), index, "it was rebuilt after all")
+        fresh = UidIndex(self.tracker.data)
+        for name in ('projects', 'tasks', 'task_parent', 'entries', 'entry_parent'):
+            kept, built = getattr(index, name), getattr(fresh, name)
+            self.assertEqual(set(kept), set(built), name)
+            for uid in built:
+                self.assertIs(kept[uid], built[uid], name)
+
+
+class TestApplyingInInstalments(EngineTestCase):
+    """
+    A long catch-up is applied a few chunks per redraw, so the interface is
+    never frozen for the whole of it.
+    """
+
+    DATA = 'test_engine_data.json'
+
+    def setUp(self):
+        super().setUp()
+        if os.path.exists(self.DATA):
+            os.remove(self.DATA)
+        self.tracker = TimeTracker(file_path=self.DATA, op_outbox=self.outbox)
+        self._saved = (sync_engine.APPLY_CHUNK_OPS, sync_engine.APPLY_BUDGET_SECONDS)
+        # One record per chunk, and no time for a second one.
+        sync_engine.APPLY_CHUNK_OPS = 1
+        sync_engine.APPLY_BUDGET_SECONDS = 0
+
+    def tearDown(self):
+        sync_engine.APPLY_CHUNK_OPS, sync_engine.APPLY_BUDGET_SECONDS = self._saved
+        if os.path.exists(self.DATA):
+            os.remove(self.DATA)
+        super().tearDown()
+
+    def _file(self, seq, op, uid, **fields):
+        sync_engine._append_inbox({'base_seq': seq, 'ops': [
+            dict({'s': seq, 'op': op, 'uid': uid}, **fields)]})
+
+    def test_each_call_keeps_what_it_applied_and_leaves_the_rest(self):
+        for seq in (1, 2, 3):
+            self._file(seq, 'project.create', '%016x' % seq, f={'name': 'P%d' % seq})
+
+        summary = sync_engine.apply_pending(self.tracker)
+
+        self.assertTrue(summary['more'])
+        self.assertEqual(summary['base_seq'], 1)
+        self.assertEqual(sync_engine.read_state()['base_seq'], 1)
+        self.assertEqual([r['base_seq'] for r in sync_engine.read_inbox()], [2, 3])
+        self.assertTrue(sync_engine.inbox_waiting(), "the next redraw is never asked for")
+        reopened = TimeTracker(file_path=self.DATA)
+        self.assertIsNotNone(reopened._get_project('P1'),
+                             "the first chunk was applied but never saved")
+        self.assertIsNone(reopened._get_project('P2'))
+
+        while summary and summary['more']:
+            summary = sync_engine.apply_pending(self.tracker)
+
+        self.assertEqual(sync_engine.read_state()['base_seq'], 3)
+        self.assertFalse(sync_engine.inbox_waiting())
+        for name in ('P1', 'P2', 'P3'):
+            self.assertIsNotNone(self.tracker._get_project(name))
+
+    def test_an_unsent_change_stays_on_top_between_chunks(self):
+        """
+        The document saved after each chunk is the one the user sees, so the
+        local edit has to be back on top of every chunk, not only the last.
+        """
+        self.tracker.add_main_project('P')
+        self.tracker.add_task('P', 'T')
+        task_uid = self.tracker._get_task('P', 'T')['uid']
+        sync_engine.run_cycle(self.outbox)
+        sync_engine.apply_pending(self.tracker)
+        base = sync_engine.read_state()['base_seq']
+
+        self.tracker.update_task('P', 'T', priority=8)
+        self._file(base + 1, 'task.set', task_uid, f={'priority': 2})
+        self._file(base + 2, 'task.set', task_uid, f={'priority': 3})
+
+        self.assertTrue(sync_engine.apply_pending(self.tracker)['more'])
+        self.assertEqual(self.tracker._get_task('P', 'T')['priority'], 8)
+        self.assertFalse(sync_engine.apply_pending(self.tracker)['more'])
+        self.assertEqual(self.tracker._get_task('P', 'T')['priority'], 8)
+        self.assertEqual(len([o for o in self.outbox.pending() if o['op'] == 'task.set']), 1,
+                         "the edit was dropped before the server placed it")
+
+    def test_a_torn_line_alone_does_not_keep_the_interface_redrawing(self):
+        with open(sync_engine.inbox_path(), 'a', encoding='utf-8') as f:
+            f.write('{"base_seq": 4, "ops": [')
+
+        self.assertIsNone(sync_engine.apply_pending(self.tracker))
+        self.assertFalse(sync_engine.inbox_waiting())
+
 
 class TestOfferingTheExistingDocument(EngineTestCase):
 
@@ -756,6 +986,22 @@ class TestConsumingTheInbox(EngineTestCase):
         self.assertEqual(len(left), 1, "the late record was thrown away unapplied")
         self.assertEqual(left[0]['base_seq'], 9)
 
+    def test_the_interface_can_tell_something_is_waiting_without_reading_it(self):
+        """
+        The interface asks every few seconds whether a redraw is worth it. The
+        answer has to follow the inbox exactly: a redraw for nothing is what
+        the question is there to avoid, and a missed one leaves fetched
+        changes off screen until the next click.
+        """
+        self.assertFalse(sync_engine.inbox_waiting())
+
+        self.server.add_foreign('project.create', uid=P1, f={'name': 'First'})
+        sync_engine.run_cycle(self.outbox)
+        self.assertTrue(sync_engine.inbox_waiting())
+
+        sync_engine.apply_pending(self.tracker)
+        self.assertFalse(sync_engine.inbox_waiting())
+
     def test_a_document_that_cannot_be_saved_keeps_what_arrived(self):
         """
         A full disk or a share gone read-only. Consuming the inbox anyway
@@ -878,6 +1124,48 @@ class TestTheQueueAndTheLogDisagreeing(EngineTestCase):
                          "our older change was replayed over a newer one - "
                          "this machine and the other now disagree for good")
 
+    def test_an_edit_folded_into_a_placed_one_is_not_replayed_either(self):
+        """
+        The same lost reply, after two edits that went out as one. The first
+        never reached the log under its own number - the second carried it -
+        so only the second shows up as placed; replaying the first on top
+        would undo the other machine's later change just the same.
+        """
+        self.tracker.add_main_project('P')
+        self.tracker.add_task('P', 'T')
+        task_uid = self.tracker._get_task('P', 'T')['uid']
+        sync_engine.run_cycle(self.outbox)
+        sync_engine.apply_pending(self.tracker)
+        self.outbox.drop([e['lc'] for e in self.outbox.pending()])
+
+        self.tracker.update_task('P', 'T', priority=3)
+        self.tracker.update_task('P', 'T', priority=4)
+        self.assertEqual(len(self.outbox.pending()), 2)
+        self.server.push(0, coalesce(self.outbox.pending())[0])
+        self.server.add_foreign('task.set', uid=task_uid, f={'priority': 7})
+        for n in range(4):
+            self.server.add_foreign('project.create', uid='%016x' % (n + 40),
+                                    f={'name': 'Other %d' % n})
+
+        self.server.page = 2
+        real_pull = self.server.pull
+        calls = {'n': 0}
+
+        def flaky(since, limit=500):
+            calls['n'] += 1
+            if calls['n'] > 1:
+                return {'ok': False, 'error': 'unreachable'}
+            return real_pull(since, limit)
+        sync_client.pull = flaky
+
+        sync_engine.run_cycle(self.outbox)
+        self.assertEqual(len(self.outbox.pending()), 2,
+                         "the setup did not reproduce an undrained queue")
+        sync_engine.apply_pending(self.tracker)
+
+        self.assertEqual(self.tracker._get_task('P', 'T')['priority'], 7)
+        self.assertEqual(self.outbox.pending(), [])
+
     def test_an_operation_the_log_has_placed_leaves_the_queue(self):
         self.tracker.add_main_project('P')
         sync_engine.run_cycle(self.outbox)
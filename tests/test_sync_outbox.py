@@ -1,16 +1,19 @@
 import json
 import os
+import random
 import shutil
 import subprocess
 import sys
 import tempfile
 import textwrap
 import unittest
+import unittest.mock
 
 REPO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(REPO)
 
-from tt.sync_outbox import Outbox, OutboxFull
+from tt.sync_apply import apply_ops
+from tt.sync_outbox import Outbox, OutboxFull, coalesce
 from tt.filelock import locked, LockTimeout
 
 
@@ -114,6 +117,19 @@ class TestOutbox(unittest.TestCase):
         self.box.drop([1, 3])
         self.assertEqual([e['lc'] for e in self.box.pending()], [2, 4])
 
+    def test_what_was_offered_is_remembered_until_acknowledged(self):
+        for n in range(3):
+            self.box.append('task.set', uid='t' * 16, f={'priority': n})
+        self.box.offer([1, 2])
+        self.box.offer([2, 3])
+        self.assertEqual(Outbox(path=self.box.path, lock_path=self.box.lock_path,
+                                highwater_path=self.box.highwater_path).offered(),
+                         {1, 2, 3})
+        self.box.drop([1, 2])
+        self.assertEqual(self.box.offered(), {3})
+        self.box.clear()
+        self.assertEqual(self.box.offered(), set())
+
     def test_clearing_empties_the_queue(self):
         self.box.append('task.set', uid='a' * 16)
         self.box.clear()
@@ -214,6 +230,397 @@ class TestOutbox(unittest.TestCase):
         self.assertEqual(self.box.append('task.set', uid='a' * 16), 4)
 
 
+class TestTheQueueSummary(unittest.TestCase):
+    """
+    During an outage the queue grows to thousands of lines, and every click
+    appends one more. Reading all of them back to find the count and the
+    highest number made each of those clicks slower than the last.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.box = Outbox(path=os.path.join(self.tmp, 'q.jsonl'),
+                          lock_path=os.path.join(self.tmp, 'q.lock'),
+                          highwater_path=os.path.join(self.tmp, 'q.hw'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_appending_does_not_read_the_queue(self):
+        self.box.extend([{'op': 'task.set', 'uid': 'a' * 16}] * 50)
+        with unittest.mock.patch.object(Outbox, 'pending', side_effect=AssertionError("queue was read")):
+            self.assertEqual(self.box.append('task.set', uid='a' * 16), 51)
+            self.assertEqual(self.box.extend([{'op': 'task.set'}] * 2), [52, 53])
+            self.assertEqual(self.box.count(), 53)
+
+    def test_the_summary_follows_acknowledgement_and_clearing(self):
+        for _ in range(4):
+            self.box.append('task.set', uid='a' * 16)
+        self.box.drop([1, 4])
+        with unittest.mock.patch.object(Outbox, 'pending', side_effect=AssertionError("queue was read")):
+            self.assertEqual(self.box.count(), 2)
+        self.box.clear()
+        with unittest.mock.patch.object(Outbox, 'pending', side_effect=AssertionError("queue was read")):
+            self.assertEqual(self.box.count(), 0)
+            self.assertEqual(self.box.append('task.set', uid='a' * 16), 5)
+
+    def test_a_queue_changed_behind_its_back_is_read_again(self):
+        """
+        A line written by anything but this class - or a crash between
+        writing the queue and its summary - leaves a summary that no longer
+        describes the file. It must be noticed, not trusted.
+        """
+        self.box.append('task.set', uid='a' * 16)
+        with open(self.box.path, 'a', encoding='utf-8') as f:
+            f.write('{"op": "task.set", "lc": 7}\n')
+        self.assertEqual(self.box.count(), 2)
+        self.assertEqual(self.box.append('task.set', uid='a' * 16), 8)
+
+    def test_a_missing_or_damaged_summary_is_rebuilt(self):
+        """Including the summary a queue written before it existed never had."""
+        for _ in range(3):
+            self.box.append('task.set', uid='a' * 16)
+        os.remove(self.box.summary_path)
+        self.assertEqual(self.box.count(), 3)
+        with open(self.box.summary_path, 'w', encoding='utf-8') as f:
+            f.write('{"count": ')
+        self.assertEqual(self.box.append('task.set', uid='a' * 16), 4)
+        with unittest.mock.patch.object(Outbox, 'pending', side_effect=AssertionError("queue was read")):
+            self.assertEqual(self.box.count(), 4)
+
+
+class _Crash(Exception):
+    """Stands in for the machine being switched off at that point."""
+
+
+class _SegmentedOutboxTestCase(unittest.TestCase):
+    """Segments of three, so that a handful of operations span several."""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.box = self._open()
+        patcher = unittest.mock.patch('tt.sync_outbox.SEGMENT_SIZE', 3)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def _open(self):
+        return Outbox(path=os.path.join(self.tmp, 'q.jsonl'),
+                      lock_path=os.path.join(self.tmp, 'q.lock'),
+                      highwater_path=os.path.join(self.tmp, 'q.hw'))
+
+    def _segment_files(self):
+        return sorted(name for name in os.listdir(self.tmp) if name.startswith('q.jsonl'))
+
+    def _lcs(self, box=None):
+        return [e['lc'] for e in (box or self.box).pending()]
+
+    def _contents(self):
+        out = {}
+        for name in self._segment_files():
+            with open(os.path.join(self.tmp, name), 'rb') as f:
+                out[name] = f.read()
+        return out
+
+
+class TestSegments(_SegmentedOutboxTestCase):
+    """
+    Acknowledging used to rewrite the whole queue after every push. Now the
+    queue is kept in segments, and acknowledgement is a note in a record
+    plus, once a segment has nothing left in it, deleting that one file.
+    """
+
+    def test_a_full_segment_is_sealed_and_the_next_one_begun(self):
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+        self.assertEqual(self._segment_files(),
+                         ['q.jsonl', 'q.jsonl.0000000003', 'q.jsonl.0000000006'])
+        self.assertEqual(self._lcs(), [1, 2, 3, 4, 5, 6, 7])
+
+    def test_a_bulk_batch_is_spread_over_segments_too(self):
+        """Otherwise seeding a document would make one segment of thousands."""
+        self.box.append('task.set', uid='a' * 16)
+        self.box.extend([{'op': 'task.set'}] * 7)
+        self.assertEqual(self._segment_files(),
+                         ['q.jsonl', 'q.jsonl.0000000003', 'q.jsonl.0000000006'])
+        self.assertEqual(self._lcs(), list(range(1, 9)))
+
+    def test_acknowledging_leaves_the_segments_untouched(self):
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+        before = self._contents()
+        self.box.drop([4, 2])
+        self.assertEqual(before, self._contents())
+        self.assertEqual(self._lcs(), [1, 3, 5, 6, 7])
+        self.assertEqual(self.box.count(), 5)
+
+    def test_a_segment_goes_once_everything_in_it_is_acknowledged(self):
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+        self.box.drop([1, 2, 3])
+        self.assertEqual(self._segment_files(), ['q.jsonl', 'q.jsonl.0000000006'])
+        self.assertEqual(self.box._read_acked(), set(),
+                         "the record still remembers numbers whose segment is gone")
+
+    def test_acknowledgement_in_any_order_and_more_than_once(self):
+        """
+        A batch can be partly accepted and partly reported as already known,
+        and a reply that was lost means the same numbers are confirmed again
+        on the next push.
+        """
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+        self.box.drop([6, 5])
+        self.box.drop([2])
+        self.box.drop([5, 5, 6])
+        self.assertEqual(self.box.count(), 4)
+        self.box.drop([4, 1])
+        self.assertEqual(self._segment_files(), ['q.jsonl', 'q.jsonl.0000000003'])
+        self.box.drop([3, 7])
+        self.assertEqual(self._lcs(), [])
+        self.assertEqual(self.box.count(), 0)
+        self.assertEqual(self._segment_files(), [])
+        self.assertEqual(self.box.append('task.set', uid='a' * 16), 8)
+
+    def test_the_whole_queue_reads_the_same_from_a_fresh_process(self):
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+        self.box.drop([2, 6])
+        os.remove(self.box.summary_path)
+        reopened = self._open()
+        self.assertEqual(self._lcs(reopened), [1, 3, 4, 5, 7])
+        self.assertEqual(reopened.count(), 5)
+        self.assertEqual(reopened.append('task.set', uid='a' * 16), 8)
+
+
+class TestSegmentsSurviveACrash(_SegmentedOutboxTestCase):
+    """
+    Every change to the queue is several writes, and the machine can go off
+    between any two of them. Whatever is left behind must never lose an
+    operation the server has not confirmed, and never hand out a number
+    twice. Sending a confirmed one again is acceptable - the server knows it
+    and says so.
+    """
+
+    def _fill(self):
+        for _ in range(7):
+            self.box.append('task.set', uid='a' * 16)
+
+    def test_between_recording_and_deleting_a_segment(self):
+        self._fill()
+        with unittest.mock.patch('tt.sync_outbox.os.remove', side_effect=_Crash):
+            with self.assertRaises(_Crash):
+                self.box.drop([1, 2, 3])
+        reopened = self._open()
+        self.assertEqual(self._lcs(reopened), [4, 5, 6, 7])
+        self.assertEqual(reopened.count(), 4)
+        reopened.drop([4])
+        self.assertNotIn('q.jsonl.0000000003', self._segment_files(),
+                         "the next acknowledgement did not finish the job")
+        self.assertEqual(reopened.append('task.set', uid='a' * 16), 8)
+
+    def test_between_deleting_a_segment_and_tidying_the_record(self):
+        self._fill()
+        with unittest.mock.patch.object(Outbox, '_rewrite_acked', side_effect=_Crash):
+            with self.assertRaises(_Crash):
+                self.box.drop([1, 2, 3, 5])
+        reopened = self._open()
+        self.assertEqual(self._lcs(reopened), [4, 6, 7])
+        self.assertEqual(reopened.count(), 3)
+        self.assertEqual(reopened.append('task.set', uid='a' * 16), 8)
+
+    def test_a_record_line_cut_short(self):
+        """
+        Read as far as it got, '[5, 6' would be '5' - or, completed by the
+        next write, some other number altogether - and an operation the
+        server never saw would be thrown away.
+        """
+        self._fill()
+        with open(self.box.acked_path, 'w', encoding='utf-8') as f:
+            f.write('[5, 6')
+        self.box.drop([1])
+        reopened = self._open()
+        self.assertEqual(self._lcs(reopened), [2, 3, 4, 5, 6, 7])
+        self.assertEqual(reopened.count(), 6)
+
+    def test_between_writing_an_operation_and_its_summary(self):
+        self._fill()
+        with unittest.mock.patch.object(Outbox, '_write_summary', side_effect=_Crash):
+            with self.assertRaises(_Crash):
+                self.box.append('task.set', uid='a' * 16)
+        reopened = self._open()
+        self.assertEqual(reopened.count(), 8)
+        self.assertEqual(reopened.append('task.set', uid='a' * 16), 9)
+        self.assertEqual(self._lcs(reopened), list(range(1, 10)))
+
+    def test_between_sealing_a_segment_and_writing_to_the_next(self):
+        for _ in range(6):
+            self.box.append('task.set', uid='a' * 16)
+        os.replace(self.box.path, self.box.path + '.0000000006')
+        reopened = self._open()
+        self.assertEqual(reopened.count(), 6)
+        self.assertEqual(reopened.append('task.set', uid='a' * 16), 7)
+        self.assertEqual(self._lcs(reopened), list(range(1, 8)))
+
+
+class TestCoalescing(unittest.TestCase):
+    """
+    coalesce() changes what is sent, so the only thing that makes it safe is
+    that the result is the same document. That is checked the way the other
+    machine would find out: by applying both through apply_ops.
+    """
+
+    PROJECTS = ['p%015d' % n for n in range(2)]
+
+    def _document(self, with_tasks):
+        """Two projects, and optionally a task already known to the other side."""
+        projects = [{'uid': uid, 'main_project_name': uid, 'status': 'open',
+                     'last_started': None, 'tasks': []} for uid in self.PROJECTS]
+        if with_tasks:
+            projects[0]['tasks'].append({
+                'uid': 't%015d' % 0, 'id': 1, 'task_name': 'known', 'status': 'open',
+                'time_entries': [], 'priority': 0, 'last_started': None})
+        return {'projects': projects, 'next_id': 2}
+
+    def _random_ops(self, rng, length):
+        tasks = ['t%015d' % 0]
+        entries = []
+        ops = []
+        serial = [1]
+
+        def fresh(prefix):
+            serial[0] += 1
+            return '%s%015d' % (prefix, serial[0])
+
+        for _ in range(length):
+            roll = rng.random()
+            if roll < 0.15:
+                uid = fresh('t')
+                tasks.append(uid)
+                ops.append({'op': 'task.create', 'uid': uid, 'project': rng.choice(self.PROJECTS),
+                            'f': {'task_name': uid}})
+            elif roll < 0.45:
+                ops.append({'op': 'task.set', 'uid': rng.choice(tasks),
+                            'f': {rng.choice(['priority', 'note', 'last_started']): rng.randint(0, 9)}})
+            elif roll < 0.6:
+                ops.append({'op': 'project.set', 'uid': rng.choice(self.PROJECTS),
+                            'f': {rng.choice(['name', 'last_started']): rng.randint(0, 9)}})
+            elif roll < 0.67:
+                ops.append({'op': 'task.move', 'uid': rng.choice(tasks),
+                            'project': rng.choice(self.PROJECTS)})
+            elif roll < 0.77:
+                ops.append({'op': 'task.delete', 'uid': rng.choice(tasks),
+                            'ts': '2026-01-01T00:00:00'})
+            elif roll < 0.87:
+                uid = fresh('e')
+                entries.append(uid)
+                ops.append({'op': 'entry.add', 'uid': uid, 'task': rng.choice(tasks),
+                            'start': '2026-01-01T0%d:00:00' % rng.randint(0, 4)})
+            elif roll < 0.93 and entries:
+                ops.append({'op': 'entry.close', 'uid': rng.choice(entries),
+                            'end': '2026-01-01T0%d:00:00' % rng.randint(5, 9)})
+            elif entries:
+                ops.append({'op': 'entry.move', 'uid': rng.choice(entries),
+                            'task': rng.choice(tasks)})
+        for lc, op in enumerate(ops, 1):
+            op['lc'] = lc
+        return ops
+
+    @staticmethod
+    def _applied(document, ops):
+        document = json.loads(json.dumps(document))
+        numbered = [dict(op, s=position) for position, op in enumerate(ops, 1)]
+        apply_ops(document, numbered)
+        # The integer ids are handed out locally as tasks arrive and never
+        # travel (see sync_apply._next_local_id); a create that is folded
+        # away simply does not use one up.
+        document.pop('next_id', None)
+        for project in document.get('projects', []):
+            for task in project.get('tasks', []):
+                task.pop('id', None)
+        return document
+
+    def test_the_same_document_either_way(self):
+        rng = random.Random(20261019)
+        folded_any = 0
+        for trial in range(300):
+            ops = self._random_ops(rng, rng.randint(1, 40))
+            # Some of the queue sent before, whose answer never came back.
+            sent_before = {op['lc'] for op in ops if rng.random() < 0.3}
+            for offered in ((), sent_before):
+                sent, folded = coalesce(ops, offered)
+                folded_any += len(ops) - len(sent)
+                for with_tasks in (False, True):
+                    start = self._document(with_tasks)
+                    self.assertEqual(self._applied(start, sent), self._applied(start, ops),
+                                     "trial %d: %r" % (trial, ops))
+                # Everything is accounted for exactly once, and nothing sent
+                # before is folded away.
+                self.assertEqual(sorted([op['lc'] for op in sent]
+                                        + [lc for lcs in folded.values() for lc in lcs]),
+                                 [op['lc'] for op in ops])
+                self.assertLessEqual(set(offered), {op['lc'] for op in sent})
+        self.assertGreater(folded_any, 0, "nothing was ever coalesced")
+
+    def test_repeated_sets_become_one_under_the_highest_number(self):
+        task = 't' * 16
+        ops = [{'op': 'task.set', 'uid': task, 'lc': 1, 'f': {'priority': 1, 'note': 'a'}},
+               {'op': 'entry.add', 'uid': 'e' * 16, 'task': task, 'lc': 2, 'start': 'x'},
+               {'op': 'task.set', 'uid': task, 'lc': 3, 'f': {'priority': 2}}]
+        sent, folded = coalesce(ops)
+        self.assertEqual(sent[-1], {'op': 'task.set', 'uid': task, 'lc': 3,
+                                    'f': {'priority': 2, 'note': 'a'}})
+        self.assertEqual(folded, {3: [1]})
+
+    def test_sets_either_side_of_something_else_on_that_object_stay_apart(self):
+        task = 't' * 16
+        ops = [{'op': 'task.set', 'uid': task, 'lc': 1, 'f': {'priority': 1}},
+               {'op': 'task.move', 'uid': task, 'lc': 2, 'project': 'p' * 16},
+               {'op': 'task.set', 'uid': task, 'lc': 3, 'f': {'priority': 2}}]
+        self.assertEqual(coalesce(ops), (ops, {}))
+
+    def test_a_task_created_and_deleted_again_leaves_only_the_deletion(self):
+        task = 't' * 16
+        ops = [{'op': 'task.create', 'uid': task, 'project': 'p' * 16, 'lc': 1, 'f': {}},
+               {'op': 'task.set', 'uid': task, 'lc': 2, 'f': {'priority': 2}},
+               {'op': 'task.delete', 'uid': task, 'lc': 3, 'ts': 'x'}]
+        sent, folded = coalesce(ops)
+        self.assertEqual(sent, [ops[-1]])
+        self.assertEqual(folded, {3: [1, 2]})
+
+    def test_a_set_sent_before_is_not_folded_into_a_later_one(self):
+        """
+        It may already be in the server's log. Folded, its fields would go
+        out again under a new number, over whatever arrived in between.
+        """
+        task = 't' * 16
+        ops = [{'op': 'task.set', 'uid': task, 'lc': 1, 'f': {'priority': 1}},
+               {'op': 'task.set', 'uid': task, 'lc': 2, 'f': {'note': 'a'}},
+               {'op': 'task.set', 'uid': task, 'lc': 3, 'f': {'note': 'b'}}]
+        sent, folded = coalesce(ops, offered={1})
+        self.assertEqual(sent, [ops[0], dict(ops[2], f={'note': 'b'})])
+        self.assertEqual(folded, {3: [2]})
+
+    def test_nor_dropped_between_a_create_and_a_delete(self):
+        task = 't' * 16
+        ops = [{'op': 'task.create', 'uid': task, 'project': 'p' * 16, 'lc': 1, 'f': {}},
+               {'op': 'task.set', 'uid': task, 'lc': 2, 'f': {'priority': 2}},
+               {'op': 'task.delete', 'uid': task, 'lc': 3, 'ts': 'x'}]
+        sent, folded = coalesce(ops, offered={1})
+        self.assertEqual(sent, [ops[0], ops[2]])
+        self.assertEqual(folded, {3: [2]})
+
+    def test_but_not_one_that_had_time_booked_on_it(self):
+        """The entry would arrive naming a task the other side never had."""
+        task = 't' * 16
+        ops = [{'op': 'task.create', 'uid': task, 'project': 'p' * 16, 'lc': 1, 'f': {}},
+               {'op': 'entry.add', 'uid': 'e' * 16, 'task': task, 'lc': 2, 'start': 'x'},
+               {'op': 'task.delete', 'uid': task, 'lc': 3, 'ts': 'x'}]
+        self.assertEqual(coalesce(ops), (ops, {}))
+
+
 class TestTheQueueMakesItsOwnDirectory(unittest.TestCase):
     """
     On a machine that has never synced there is no configuration directory
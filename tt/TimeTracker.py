@@ -1,31 +1,17 @@
+import hashlib
 import json
 import os
 import tempfile
-import imaplib
 import re
 import uuid
-import email
-from email.header import decode_header
 from i18n import _
 from decimal import Decimal, ROUND_HALF_UP
 from datetime import datetime, timedelta, date
 import calendar
+from contextlib import contextmanager
 
 import sys
 import subprocess
-try:
-    # Python 3.8+ for importlib.metadata
-    from importlib.metadata import distributions, PackageNotFoundError
-except ImportError:
-    from importlib_metadata import distributions, PackageNotFoundError
-try:
-    import pyperclip
-except ImportError:
-    pyperclip = None  # Set to None if the library is not installed
-try:
-    import markdown
-except ImportError:
-    markdown = None
 try:
     # For version comparison in the update mechanism
     from packaging.version import parse as parse_version
@@ -33,6 +19,55 @@ except ImportError:
     parse_version = None
 
 
+# What only a few features need - the clipboard, HTML reports, the email
+# import, the dependency check - is imported on first use rather than here.
+# Every process that touches the data file imports this module, the GUI on
+# each start among them, and together these made up a good part of its
+# import time (imaplib alone pulls in ssl, importlib.metadata the email
+# package). Each name is bound by its _import_* function below when it is
+# first needed, with a plain import statement: PyInstaller finds what to
+# bundle by scanning for those, and would leave out a module named only in
+# a string. Tests patch these names as they always did.
+_NOT_IMPORTED = object()
+imaplib = markdown = pyperclip = distributions = _NOT_IMPORTED
+
+
+def _import_imaplib():
+    global imaplib
+    if imaplib is _NOT_IMPORTED:
+        import imaplib
+    return imaplib
+
+
+def _import_markdown():
+    """:return: The markdown module, or None if it is not installed."""
+    global markdown
+    if markdown is _NOT_IMPORTED:
+        try:
+            import markdown
+        except ImportError:
+            markdown = None
+    return markdown
+
+
+def _import_pyperclip():
+    """:return: The pyperclip module, or None if it is not installed."""
+    global pyperclip
+    if pyperclip is _NOT_IMPORTED:
+        try:
+            import pyperclip
+        except ImportError:
+            pyperclip = None
+    return pyperclip
+
+
+def _import_distributions():
+    global distributions
+    if distributions is _NOT_IMPORTED:
+        from importlib.metadata import distributions
+    return distributions
+
+
 def _new_uid():
     """
     Returns a fresh identifier for a project, task or time entry.
@@ -71,6 +106,86 @@ def _task_fields(task):
     return {k: task.get(k) for k in TASK_SYNC_FIELDS if k in task}
 
 
+def file_stamp(path):
+    """
+    Returns a cheap token that changes whenever the file at `path` is written.
+
+    Modification time alone is not enough: some file systems keep it to the
+    second, and two saves within one second would look like one. Every save
+    in this application replaces the file rather than rewriting it (see
+    TimeTracker._save_data), so the inode number changes with each one as
+    well, and size is thrown in for free.
+
+    :param path: The file to look at.
+    :return: A hashable token, or None if the file does not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+# How many environments the dependency check remembers as complete. More
+# than one, so that two installations sharing a user profile (a source
+# checkout next to a virtualenv, say) do not keep evicting each other.
+DEPENDENCY_CACHE_SIZE = 8
+
+
+def _dependency_cache_path():
+    # Per user, not next to requirements.txt: an installed copy usually
+    # cannot write to its own directory. See sync_client.config_dir.
+    from tt import sync_client
+    return os.path.join(sync_client.config_dir(), 'dependency_check.json')
+
+
+def _dependency_check_key(requirements):
+    """
+    Describes the environment a dependency check ran against.
+
+    Installing or removing a package adds or removes an entry in a
+    site-packages directory, which moves that directory's modification
+    time; so as long as none of them has moved, and the requirements and
+    the interpreter are the same, the answer cannot have changed either.
+
+    :param requirements: The requirement lines from requirements.txt.
+    :return: A JSON-serialisable value; equal keys mean equal answers.
+    """
+    site_dirs = sorted({
+        entry for entry in sys.path
+        if os.path.basename(os.path.normpath(entry)) in ('site-packages', 'dist-packages')
+    })
+    return [
+        hashlib.sha256("\n".join(requirements).encode('utf-8')).hexdigest(),
+        sys.executable,
+        [[entry, (file_stamp(entry) or (None,))[0]] for entry in site_dirs],
+    ]
+
+
+def _read_dependency_cache():
+    try:
+        with open(_dependency_cache_path(), 'r', encoding='utf-8') as f:
+            complete = json.load(f).get('complete', [])
+    except (OSError, ValueError, AttributeError):
+        return []
+    return complete if isinstance(complete, list) else []
+
+
+def _remember_complete_dependencies(key):
+    """Records `key` as an environment with nothing missing. Best effort."""
+    complete = [k for k in _read_dependency_cache() if k != key]
+    complete = ([key] + complete)[:DEPENDENCY_CACHE_SIZE]
+    path = _dependency_cache_path()
+    tmp = path + '.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'complete': complete}, f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
 class TimeTracker:
     """
     Manages time tracking for various main and sub-projects.
@@ -102,7 +217,7 @@ class TimeTracker:
     # case, where subprocess's timeout=<N> kills the pip child outright.
     PIP_INSTALL_TIMEOUT = 120
 
-    def __init__(self, file_path=None, op_outbox=None):
+    def __init__(self, file_path=None, op_outbox=None, read_only=False):
         """
         Initializes the TimeTracker, checks for dependencies, and loads data from the JSON file.
 
@@ -116,6 +231,11 @@ class TimeTracker:
                           - including every one that predates the feature -
                           means no queue and no recording at all. Passing one
                           explicitly is what the tests do.
+        :param read_only: Load the document for reading alone, as the GUI does
+                          for a report it computes off its own thread. It is
+                          brought up to the current schema in memory but never
+                          written back, and nothing is recorded for sync.
+        :type read_only: bool
         """
         config = {}
         if os.path.exists('config.json'):
@@ -130,7 +250,16 @@ class TimeTracker:
 
         self.file_path = file_path
         self.op_outbox = op_outbox
-        if self.op_outbox is None:
+        self.read_only = read_only
+        # Set while a batch() block is open; see there.
+        self._batch_ops = None
+        self._batch_save_due = False
+        # file_stamp() of the data file as this instance last read or wrote
+        # it; see reload_if_changed.
+        self._disk_stamp = None
+        # uid lookups for applying what other machines sent; see uid_index.
+        self._uid_index = None
+        if self.op_outbox is None and not read_only:
             try:
                 from tt.sync_outbox import default_outbox_if_enabled
                 self.op_outbox = default_outbox_if_enabled(config)
@@ -138,7 +267,7 @@ class TimeTracker:
                 self.op_outbox = None
 
         self.data = self._load_data()
-        if self._migrate_data_structure():
+        if self._migrate_data_structure() and not read_only:
             # Migration is not a user action - it changes the shape of the
             # document, not its content - so it is deliberately not recorded
             # as operations. The other machine performs the same migration on
@@ -161,38 +290,133 @@ class TimeTracker:
 
         :param op: One of the operation names the server accepts.
         """
+        # Every change to the document's structure passes through here, so
+        # this is where the uid index follows it - in a batch too, since the
+        # document has already changed by the time the operation is noted.
+        if self._uid_index is not None:
+            self._uid_index.note(op, **fields)
         if self.op_outbox is None:
             return
+        if self._batch_ops is not None:
+            self._batch_ops.append(dict(fields, op=op))
+            return
         try:
             self.op_outbox.append(op, **fields)
         except Exception:
             pass
 
-    def initialize_dependencies(self):
+    def uid_index(self):
+        """
+        The uid lookups that applying operations from other machines works
+        from, kept beside the document instead of being rebuilt on every
+        apply.
+
+        Building one walks every project, task and time entry. Applying a
+        routine round of a handful of operations used to do that twice over,
+        for each pass of reconcile(). Kept here, it is built once and then
+        followed: changes made on this machine through _emit(), changes
+        arriving through the applier itself. A document re-read from disk is
+        a different object, and gets a fresh index on first use.
+
+        :return: A tt.sync_apply.UidIndex of self.data.
+        """
+        from tt.sync_apply import UidIndex
+        if self._uid_index is None or not self._uid_index.covers(self.data):
+            self._uid_index = UidIndex(self.data)
+        return self._uid_index
+
+    @contextmanager
+    def batch(self):
+        """
+        Groups several changes into one save and one write to the sync queue.
+
+        Every mutating method saves the whole document, and queues its
+        operations under the queue's lock, on its own. That is right for a
+        single click and wasteful for a caller making many changes at once -
+        a client importing forty tasks would rewrite data.json forty times.
+        Inside this block _save_data() only notes that a save is due and
+        _emit() collects the operations; both happen once, on leaving it.
+
+        All or nothing: if the block raises, nothing is queued or saved, and
+        the document is re-read from disk - which still holds the state from
+        before the block, since nothing in it was written. Nested blocks
+        join the outermost one.
+
+        The operations are queued before the document is saved, in the same
+        order a single change uses. A machine switched off between the two
+        then holds changes it has queued but not stored - harmless, the
+        server echoes them back - rather than stored changes it can never
+        pass on.
+        """
+        if self._batch_ops is not None:
+            yield self
+            return
+
+        self._batch_ops = []
+        self._batch_save_due = False
+        try:
+            yield self
+        except BaseException:
+            self._batch_ops = None
+            self._batch_save_due = False
+            self.reload_data()
+            raise
+
+        operations, self._batch_ops = self._batch_ops, None
+        save_due, self._batch_save_due = self._batch_save_due, False
+        if operations and self.op_outbox is not None:
+            # Swallowed for the same reason as in _emit above.
+            try:
+                self.op_outbox.extend(operations)
+            except Exception:
+                pass
+        if save_due:
+            self._save_data()
+
+    def initialize_dependencies(self, force=False):
         """
         Public method to check and install dependencies.
         This should be called after the language setup is complete.
+
+        :param force: Check even if this environment was found complete
+            before (see _check_and_install_dependencies).
+        :return: The required packages that are still missing.
+        :rtype: list
         """
-        self._check_and_install_dependencies()
+        return self._check_and_install_dependencies(force=force)
 
-    def _check_and_install_dependencies(self):
+    def _check_and_install_dependencies(self, force=False):
         """
         Checks if all packages from requirements.txt are installed.
         If not, it attempts to install them and then exits the program.
+
+        Listing every installed distribution takes seconds in a large
+        environment, and this runs for every new GUI session. An environment
+        found complete is therefore remembered (see _dependency_check_key)
+        and not listed again until something in it changes, or until `force`
+        asks for it.
+
+        :param force: Ignore what was remembered and check anyway.
+        :return: The required packages that are still missing.
+        :rtype: list
         """
         requirements_path = 'requirements.txt'
         if not os.path.exists(requirements_path):
-            return # requirements.txt not found, skip check
+            return [] # requirements.txt not found, skip check
 
         try:
             with open(requirements_path, 'r') as f:
                 requirements = [line.strip() for line in f if line.strip() and not line.startswith('#')]
         except IOError as e:
             print(_("Warning: Could not read {file}. Error: {error}").format(file=requirements_path, error=e))
-            return
+            return []
 
         try:
-            installed_packages_dist = distributions()
+            cache_key = _dependency_check_key(requirements)
+            if not force and cache_key in _read_dependency_cache():
+                return []
+
+            installed_packages_dist = _import_distributions()()
             installed_packages = {dist.metadata['Name'].lower() for dist in installed_packages_dist if dist.metadata and dist.metadata['Name']}
             
             missing_packages = []
@@ -226,8 +450,13 @@ class TimeTracker:
                     sys.exit(0)
                 else:
                     print(_("\nWarning: Some dependencies could not be installed: {packages}").format(packages=", ".join(failed_packages)))
+                return failed_packages
+
+            _remember_complete_dependencies(cache_key)
+            return []
         except Exception as e:
             print(_("An unexpected error occurred during dependency check: {error}").format(error=e))
+            return []
 
     def _load_data(self):
         """
@@ -237,11 +466,18 @@ class TimeTracker:
         :return: A dictionary containing the loaded project data.
         :rtype: dict
         """
+        # Stamped before reading, not after. Should another process replace
+        # the file in between, the stamp is then older than what was read,
+        # which costs one unnecessary reload - the other way round would
+        # miss that process's change altogether.
+        stamp = file_stamp(self.file_path)
         if os.path.exists(self.file_path):
             with open(self.file_path, 'r', encoding='utf-8') as f:
-                return json.load(f)
+                data = json.load(f)
         else:
-            return {"projects": []}
+            data = {"projects": []}
+        self._disk_stamp = stamp
+        return data
 
     def reload_data(self):
         """
@@ -262,9 +498,47 @@ class TimeTracker:
         failure as "keep what we have".
         """
         self.data = self._load_data()
-        if self._migrate_data_structure():
+        if self._migrate_data_structure() and not self.read_only:
             self._save_data()
 
+    def reload_if_changed(self):
+        """
+        Re-reads the data file, but only if something else wrote it since
+        this instance last read or saved it.
+
+        For a long-lived instance - the MCP server keeps one for its whole
+        run - that has to see what the GUI and the other servers write
+        without paying a full parse and migration on every call. The check
+        is one stat() call; see file_stamp.
+
+        :return: True if the file was re-read.
+        :rtype: bool
+        """
+        if not self.changed_on_disk():
+            return False
+        self.reload_data()
+        return True
+
+    @property
+    def generation(self):
+        """
+        Identifies the document this instance holds: the file stamp taken at
+        its last load or save (see file_stamp). Two instances with the same
+        generation hold the same document, so anything derived from it can be
+        cached under this key and shared between them.
+        """
+        return self._disk_stamp
+
+    def changed_on_disk(self):
+        """
+        Tells whether something else wrote the data file since this instance
+        last read or saved it, without reading it.
+
+        :return: True if the file on disk is not the one this instance holds.
+        :rtype: bool
+        """
+        return file_stamp(self.file_path) != self._disk_stamp
+
     def _migrate_data_structure(self):
         """
         Ensures that the data structure is up to date.
@@ -426,13 +700,29 @@ class TimeTracker:
         exact moment would see a truncated, invalid JSON file and crash.
         os.replace() has no such window: readers always see either the
         complete old file or the complete new one.
+
+        Inside a batch() block this only notes that a save is due.
+
+        :raises RuntimeError: If this instance was loaded read-only.
         """
+        if self.read_only:
+            raise RuntimeError("This TimeTracker was loaded read-only.")
+        if self._batch_ops is not None:
+            self._batch_save_due = True
+            return
         directory = os.path.dirname(os.path.abspath(self.file_path)) or '.'
         fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp_data_', suffix='.json')
         try:
             with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(self.data, f, indent=2)
+                f.flush()
+                # Taken from the file before it is moved into place, which
+                # keeps its inode and modification time. Stat'ing the path
+                # afterwards could pick up a write another process made in
+                # between, and this instance would never notice it.
+                st = os.fstat(f.fileno())
             os.replace(tmp_path, self.file_path)
+            self._disk_stamp = (st.st_mtime_ns, st.st_size, st.st_ino)
         except BaseException:
             if os.path.exists(tmp_path):
                 os.remove(tmp_path)
@@ -446,6 +736,7 @@ class TimeTracker:
         :param text: The text to be copied.
         :type text: str
         """
+        pyperclip = _import_pyperclip()
         if pyperclip:
             try:
                 pyperclip.copy(text)
@@ -497,7 +788,7 @@ class TimeTracker:
         rtf += "}"
         return rtf
 
-    def _format_and_copy_report(self, markdown_text):
+    def _format_and_copy_report(self, markdown_text, copy_to_clipboard=True):
         """Formats the report based on config and copies it to clipboard."""
         config_format = "markdown"
         if os.path.exists('config.json'):
@@ -506,11 +797,13 @@ class TimeTracker:
                     config_format = json.load(f).get('report_format', 'markdown')
             except: pass
         final_text = markdown_text
-        if config_format == 'html' and markdown:
+        markdown = _import_markdown() if config_format == 'html' else None
+        if markdown:
             final_text = markdown.markdown(markdown_text)
         elif config_format == 'rtf':
             final_text = self._markdown_to_rtf(markdown_text)
-        self._copy_to_clipboard(final_text)
+        if copy_to_clipboard:
+            self._copy_to_clipboard(final_text)
         return final_text
 
     def get_version(self):
@@ -690,7 +983,9 @@ class TimeTracker:
         # Duplicate project names are creatable, and the filter below drops
         # every match - so collect them all rather than assuming there is one.
         removed = [p for p in self.data["projects"] if p["main_project_name"] == main_project_name]
-        self.data["projects"] = [
+        # In place, so the uid index (see uid_index) can follow the deletion
+        # rather than finding a different list and starting over.
+        self.data["projects"][:] = [
             project for project in self.data["projects"] if project["main_project_name"] != main_project_name
         ]
         if len(self.data["projects"]) < initial_count:
@@ -1549,9 +1844,34 @@ class TimeTracker:
             
         return False
 
-    def fetch_emails_to_tasks(self):
+    def add_email_task(self, subject, body):
+        """
+        Files one imported email as a task in the 'hide' project, due today,
+        creating that project first if need be.
+        """
+        if not self._get_project(self.HIDDEN_PROJECT):
+            self.add_main_project(self.HIDDEN_PROJECT)
+        self.add_task(self.HIDDEN_PROJECT, subject, due_date=date.today().isoformat(), note=body)
+
+    def fetch_emails_to_tasks(self, progress=None, cancelled=None, create_task=None):
         """
         Fetches emails from the configured IMAP account and creates tasks in the 'hide' project.
+
+        :param progress: Optional. Called as progress(done, total) before each
+                         email, for a caller that shows how far along it is.
+        :param cancelled: Optional. Checked before each email; once it returns
+                          True, the remaining emails are left in the inbox for
+                          the next fetch. Those already turned into tasks are
+                          kept.
+        :param create_task: Optional. Called as create_task(subject, body) in
+                          place of add_email_task, and returns whether it
+                          created the task; when it did not, the fetch stops
+                          there as if cancelled. For a caller that shares this
+                          instance between threads: it can take its lock for
+                          that one step rather than for the whole fetch, most
+                          of which is waiting on the mail server.
+        :return: A tuple (count, error) - the number of tasks created, and an
+                 error message or None.
         """
         config_data = {}
         if os.path.exists('config.json'):
@@ -1572,6 +1892,10 @@ class TimeTracker:
         if not all([server, user, password]):
             return 0, _("Email settings are incomplete.")
 
+        imaplib = _import_imaplib()
+        import email
+        from email.header import decode_header
+
         try:
             if use_ssl:
                 mail = imaplib.IMAP4_SSL(server, port)
@@ -1587,11 +1911,12 @@ class TimeTracker:
                 
             mail_ids = messages[0].split()
             count = 0
-            
-            if not self._get_project(self.HIDDEN_PROJECT):
-                self.add_main_project(self.HIDDEN_PROJECT)
 
-            for m_id in mail_ids:
+            for done, m_id in enumerate(mail_ids):
+                if cancelled is not None and cancelled():
+                    break
+                if progress is not None:
+                    progress(done, len(mail_ids))
                 status, data = mail.fetch(m_id, "(RFC822)")
                 if status != "OK": continue
                 
@@ -1616,7 +1941,10 @@ class TimeTracker:
                 else:
                     body = msg.get_payload(decode=True).decode(msg.get_content_charset() or 'utf-8', errors='replace')
                 
-                self.add_task(self.HIDDEN_PROJECT, subject, due_date=date.today().isoformat(), note=body)
+                if create_task is None:
+                    self.add_email_task(subject, body)
+                elif not create_task(subject, body):
+                    break
                 count += 1
                 mail.store(m_id, '+FLAGS', '\\Deleted')
             
@@ -1860,7 +2188,7 @@ class TimeTracker:
         
         return completed_projects
 
-    def generate_daily_report(self, report_date=None):
+    def generate_daily_report(self, report_date=None, copy_to_clipboard=True):
         """
         Generates a daily report in Markdown format, listing only projects 
         with time entries for the specified day.
@@ -1870,6 +2198,10 @@ class TimeTracker:
         :param report_date: Optional. The date (as a datetime.date object) for which the report should be generated. 
                             If None, today's date is used.
         :type report_date: datetime.date or None
+        :param copy_to_clipboard: Whether to copy the report to the clipboard,
+                                  as a report the user asked for is. False for
+                                  one generated in the background.
+        :type copy_to_clipboard: bool
         :return: The formatted daily report as a Markdown string.
         :rtype: str
         """
@@ -1924,7 +2256,7 @@ class TimeTracker:
         else:
             report.append(_("No time tracked for {date}.").format(date=today.strftime('%Y-%m-%d')))
         
-        return self._format_and_copy_report("\n".join(report))
+        return self._format_and_copy_report("\n".join(report), copy_to_clipboard)
 
     def generate_task_report(self, main_project_name, task_name):
         """
@@ -2127,23 +2459,34 @@ class TimeTracker:
 
         return self._format_and_copy_report("\n".join(report))
 
-    def generate_date_range_report(self, start_date, end_date):
+    def summarize_date_range(self, start_date, end_date, progress=None):
         """
-        Generates a report for a specific date range in Markdown format.
+        Adds up the time tracked in a date range, per main project and task.
 
-        :param start_date: The start date of the report period (datetime.date object).
+        This is what generate_date_range_report is made of, as data: callers
+        that present it differently - one page of projects at a time, for
+        instance - start here instead of taking the report text apart.
+        Projects and tasks without tracked time in the range are left out.
+
+        :param start_date: The first day of the range (datetime.date object).
         :type start_date: datetime.date
-        :param end_date: The end date of the report period (datetime.date object).
+        :param end_date: The last day of the range, inclusive (datetime.date object).
         :type end_date: datetime.date
-        :return: The formatted report as a Markdown string.
-        :rtype: str
+        :param progress: Optional. Called as progress(done, total) before each
+                         main project. A caller computing the report in the
+                         background can raise from it to abandon the work.
+        :return: A list with one dictionary per main project, in data file
+                 order, with 'main_project_name', 'total' (a timedelta) and
+                 'tasks' - a list of dictionaries with 'task_name' and 'total'.
+        :rtype: list[dict]
         """
-        report = []
-        total_period_time = timedelta()
-
-        for project in self.data["projects"]:
+        summary = []
+        projects = self.data["projects"]
+        for done, project in enumerate(projects):
+            if progress is not None:
+                progress(done, len(projects))
             main_project_total_time = timedelta()
-            task_details = []
+            task_totals = []
 
             for task in project["tasks"]:
                 task_total_time = timedelta()
@@ -2161,16 +2504,53 @@ class TimeTracker:
                         continue
 
                 if task_total_time.total_seconds() > 0:
-                    formatted_time = self._format_duration(task_total_time)
-                    task_details.append(f"- {task['task_name']}: {formatted_time}") # _format_duration is already translated
+                    task_totals.append({"task_name": task['task_name'], "total": task_total_time})
                     main_project_total_time += task_total_time
 
             if main_project_total_time.total_seconds() > 0:
-                total_period_time += main_project_total_time
-                formatted_time = self._format_duration(main_project_total_time)
-                report.append(f"## {project['main_project_name']} ({formatted_time})\n") # _format_duration is already translated
-                report.extend(task_details)
-                report.append("\n")
+                summary.append({
+                    "main_project_name": project['main_project_name'],
+                    "total": main_project_total_time,
+                    "tasks": task_totals,
+                })
+        return summary
+
+    def format_date_range_section(self, project_summary):
+        """
+        Formats one entry of summarize_date_range as it appears in
+        generate_date_range_report: a heading with the project's total and
+        one line per task.
+
+        :param project_summary: One entry of summarize_date_range's result.
+        :type project_summary: dict
+        :return: The lines of the section.
+        :rtype: list[str]
+        """
+        formatted_time = self._format_duration(project_summary["total"])
+        lines = [f"## {project_summary['main_project_name']} ({formatted_time})\n"] # _format_duration is already translated
+        for task in project_summary["tasks"]:
+            lines.append(f"- {task['task_name']}: {self._format_duration(task['total'])}")
+        lines.append("\n")
+        return lines
+
+    def generate_date_range_report(self, start_date, end_date, progress=None):
+        """
+        Generates a report for a specific date range in Markdown format.
+
+        :param start_date: The start date of the report period (datetime.date object).
+        :type start_date: datetime.date
+        :param end_date: The end date of the report period (datetime.date object).
+        :type end_date: datetime.date
+        :param progress: Optional. Passed on to summarize_date_range.
+        :return: The formatted report as a Markdown string.
+        :rtype: str
+        """
+        report = []
+        summary = self.summarize_date_range(start_date, end_date, progress=progress)
+        total_period_time = sum((p["total"] for p in summary), timedelta())
+
+        for project_summary in summary:
+            report.extend(self.format_date_range_section(project_summary))
         
         if total_period_time.total_seconds() > 0:
             total_hours_str = self._format_duration(total_period_time)
@@ -85,39 +85,200 @@ class Report:
                    len(self.auto_closed), self.highest_seq))
 
 
-class _Index:
-    """uid -> object lookups, kept current as operations are applied."""
+class UidIndex:
+    """
+    uid -> object lookups, kept current as operations are applied.
+
+    Building one walks the whole document, so it is meant to outlive a single
+    apply_ops call: the tracker keeps one beside its document (see
+    TimeTracker.uid_index) and passes it in, and every change made here goes
+    through it. Changes the tracker makes itself are followed through note(),
+    from the same operations it queues for the server. Anything note() cannot
+    follow marks the index stale, and the owner builds a fresh one.
+
+    It also keeps where each object sits in the list holding it, so moving or
+    deleting one does not rebuild that list: the position is only marked, and
+    every marked list is closed up once, when the apply_ops call ends. A
+    snapshot or a seed replay moving thousands of entries would otherwise
+    copy a list per operation. The tracker shifts positions of its own -
+    popping a task out of one project, say - and a position that no longer
+    holds its object is found again the next time it is needed.
+    """
 
     def __init__(self, document):
         self.document = document
+        self.stale = False
+        self._project_list = document.get("projects")
         self.projects = {}
         self.tasks = {}
         self.task_parent = {}
         self.entries = {}
         self.entry_parent = {}
-        for project in document.get("projects", []):
-            if project.get("uid"):
-                self.projects[project["uid"]] = project
-            for task in project.get("tasks", []):
-                if task.get("uid"):
-                    self.tasks[task["uid"]] = task
-                    self.task_parent[task["uid"]] = project
-                for entry in task.get("time_entries", []):
-                    if entry.get("uid"):
-                        self.entries[entry["uid"]] = entry
-                        self.entry_parent[entry["uid"]] = task
+        # uid -> position in the list holding it; and the positions waiting
+        # to be closed up, as id(list) -> (list, positions).
+        self.slot = {}
+        self._gone = {}
+        # The uids '_deleted' names, and how far down that list has been read.
+        self._dead = set()
+        self._dead_list = None
+        self._dead_read = 0
+        for position, project in enumerate(document.get("projects", [])):
+            self._take_project(project, position)
+
+    def covers(self, document):
+        """
+        Whether this index can still be trusted for `document`. A project
+        list swapped for another one - a restore, a deletion made outside
+        the applier - is caught here as well.
+        """
+        return (not self.stale and self.document is document
+                and document.get("projects") is self._project_list)
+
+    def _take_project(self, project, position):
+        if project.get("uid"):
+            self.projects[project["uid"]] = project
+            self.slot[project["uid"]] = position
+        for at, task in enumerate(project.get("tasks", [])):
+            self._take_task(task, project, at)
+
+    def _take_task(self, task, project, position):
+        if task.get("uid"):
+            self.tasks[task["uid"]] = task
+            self.task_parent[task["uid"]] = project
+            self.slot[task["uid"]] = position
+        for at, entry in enumerate(task.get("time_entries", [])):
+            self._take_entry(entry, task, at)
+
+    def _take_entry(self, entry, task, position):
+        if entry.get("uid"):
+            self.entries[entry["uid"]] = entry
+            self.entry_parent[entry["uid"]] = task
+            self.slot[entry["uid"]] = position
+
+    def note(self, op, uid=None, **fields):
+        """
+        Follows a change the tracker has already made to the document, given
+        as the operation it queued for it. Never touches the document and
+        never raises: whatever cannot be followed marks the index stale.
+
+        Only the structure matters here. A *.set or entry.close changes an
+        object the index already points at, so those need nothing.
+        """
+        try:
+            if op == "project.create":
+                self._take_project(*_last_with(self.document.get("projects", []), uid))
+            elif op == "task.create":
+                project = self.projects[fields["project"]]
+                task, position = _last_with(project.get("tasks", []), uid)
+                self._take_task(task, project, position)
+            elif op == "entry.add":
+                task = self.tasks[fields["task"]]
+                entry, position = _last_with(task.get("time_entries", []), uid)
+                self._take_entry(entry, task, position)
+            elif op == "task.move":
+                if uid not in self.tasks:
+                    raise KeyError(uid)
+                self.task_parent[uid] = self.projects[fields["project"]]
+            elif op == "entry.move":
+                if uid not in self.entries:
+                    raise KeyError(uid)
+                self.entry_parent[uid] = self.tasks[fields["task"]]
+            elif op == "project.delete":
+                project = self.projects.pop(uid, None)
+                if project is not None:
+                    self._drop_project_bookkeeping(project)
+            elif op == "task.delete":
+                task = self.tasks.get(uid)
+                if task is not None:
+                    self.drop_task_bookkeeping(task)
+        except (KeyError, LookupError, TypeError):
+            self.stale = True
+
+    # -- positions ----------------------------------------------------------
+
+    def _position(self, items, obj):
+        """Where `obj` sits in `items`, or None if it is not there."""
+        position = self.slot.get(obj.get("uid"))
+        if position is not None and position < len(items) and items[position] is obj:
+            return position
+        # Moved by something that did not go through here: count again.
+        gone = self._gone.get(id(items), (None, ()))[1]
+        for at, item in enumerate(items):
+            if at not in gone and item.get("uid"):
+                self.slot[item["uid"]] = at
+        position = self.slot.get(obj.get("uid"))
+        if position is not None and position < len(items) and items[position] is obj:
+            return position
+        return None
+
+    def _append(self, items, obj):
+        self.slot[obj["uid"]] = len(items)
+        items.append(obj)
+
+    def _remove(self, items, obj):
+        position = self._position(items, obj)
+        if position is not None:
+            self._gone.setdefault(id(items), (items, set()))[1].add(position)
+
+    def _live(self, items):
+        gone = self._gone.get(id(items))
+        if not gone:
+            return items
+        return [item for at, item in enumerate(items) if at not in gone[1]]
+
+    def compact(self):
+        """
+        Closes up every list a removal has left a marked position in, each in
+        one pass and in place. apply_ops calls this once, at its end.
+        """
+        for items, gone in self._gone.values():
+            items[:] = [item for at, item in enumerate(items) if at not in gone]
+            for at, item in enumerate(items):
+                if item.get("uid"):
+                    self.slot[item["uid"]] = at
+        self._gone = {}
+
+    # -- tombstones ---------------------------------------------------------
+
+    def tombstones(self):
+        """
+        The uids '_deleted' names, as a set. Kept between calls and read
+        again only as far as the list has grown; a list swapped for another
+        one - the tracker sweeping expired notes - is read from the start.
+        """
+        stones = self.document.get("_deleted", [])
+        if stones is not self._dead_list or len(stones) < self._dead_read:
+            self._dead, self._dead_list, self._dead_read = set(), stones, 0
+        for stone in stones[self._dead_read:]:
+            if stone.get("uid"):
+                self._dead.add(stone["uid"])
+        self._dead_read = len(stones)
+        return self._dead
+
+    def bury(self, uid, kind, when):
+        """Records a tombstone in '_deleted', unless one is already there."""
+        self.document.setdefault("_deleted", [])
+        dead = self.tombstones()
+        if uid in dead:
+            return
+        self._dead_list.append({"uid": uid, "kind": kind, "at": when})
+        self._dead_read += 1
+        dead.add(uid)
+
+    # -- changes ------------------------------------------------------------
 
     def add_project(self, project):
-        self.document.setdefault("projects", []).append(project)
+        self._project_list = self.document.setdefault("projects", [])
+        self._append(self._project_list, project)
         self.projects[project["uid"]] = project
 
     def add_task(self, task, project):
-        project.setdefault("tasks", []).append(task)
+        self._append(project.setdefault("tasks", []), task)
         self.tasks[task["uid"]] = task
         self.task_parent[task["uid"]] = project
 
     def add_entry(self, entry, task):
-        task.setdefault("time_entries", []).append(entry)
+        self._append(task.setdefault("time_entries", []), entry)
         self.entries[entry["uid"]] = entry
         self.entry_parent[entry["uid"]] = task
 
@@ -126,8 +287,8 @@ class _Index:
         old = self.task_parent[uid]
         if old is project:
             return
-        old["tasks"] = [t for t in old.get("tasks", []) if t.get("uid") != uid]
-        project.setdefault("tasks", []).append(task)
+        self._remove(old.get("tasks", []), task)
+        self._append(project.setdefault("tasks", []), task)
         self.task_parent[uid] = project
 
     def move_entry(self, uid, task):
@@ -135,28 +296,37 @@ class _Index:
         old = self.entry_parent[uid]
         if old is task:
             return
-        old["time_entries"] = [e for e in old.get("time_entries", []) if e.get("uid") != uid]
-        task.setdefault("time_entries", []).append(entry)
+        self._remove(old.get("time_entries", []), entry)
+        self._append(task.setdefault("time_entries", []), entry)
         self.entry_parent[uid] = task
 
     def drop_project(self, uid):
         project = self.projects.pop(uid, None)
         if project is None:
             return []
-        self.document["projects"] = [p for p in self.document.get("projects", [])
-                                     if p.get("uid") != uid]
+        self._remove(self.document.get("projects", []), project)
+        return self._drop_project_bookkeeping(project)
+
+    def _drop_project_bookkeeping(self, project):
         gone = []
-        for task in project.get("tasks", []):
-            gone.extend(self.drop_task_bookkeeping(task))
+        for task in self._live(project.get("tasks", [])):
+            # Not a task moved out of it earlier, whose old place is only
+            # marked so far.
+            if not task.get("uid") or self.task_parent.get(task["uid"]) is project:
+                gone.extend(self.drop_task_bookkeeping(task))
         return gone
 
     def drop_task_bookkeeping(self, task):
         uid = task.get("uid")
         self.tasks.pop(uid, None)
         self.task_parent.pop(uid, None)
-        for entry in task.get("time_entries", []):
-            self.entries.pop(entry.get("uid"), None)
-            self.entry_parent.pop(entry.get("uid"), None)
+        for entry in self._live(task.get("time_entries", [])):
+            # Only entries still filed under this task. Promoting or demoting
+            # locally re-homes the entries but leaves the old task holding
+            # the same list, and those entries live on.
+            if self.entry_parent.get(entry.get("uid")) is task:
+                self.entries.pop(entry.get("uid"), None)
+                self.entry_parent.pop(entry.get("uid"), None)
         return [uid] if uid else []
 
     def drop_task(self, uid):
@@ -165,7 +335,7 @@ class _Index:
             return []
         parent = self.task_parent.get(uid)
         if parent is not None:
-            parent["tasks"] = [t for t in parent.get("tasks", []) if t.get("uid") != uid]
+            self._remove(parent.get("tasks", []), task)
         return self.drop_task_bookkeeping(task)
 
     def drop_entry(self, uid):
@@ -174,8 +344,18 @@ class _Index:
             return
         parent = self.entry_parent.pop(uid, None)
         if parent is not None:
-            parent["time_entries"] = [e for e in parent.get("time_entries", [])
-                                      if e.get("uid") != uid]
+            self._remove(parent.get("time_entries", []), entry)
+
+
+def _last_with(items, uid):
+    """
+    The object carrying `uid` and its position, searched from the end, where
+    new ones go.
+    """
+    for position in range(len(items) - 1, -1, -1):
+        if items[position].get("uid") == uid:
+            return items[position], position
+    raise LookupError(uid)
 
 
 def _next_local_id(document):
@@ -191,18 +371,7 @@ def _next_local_id(document):
     return nid
 
 
-def _tombstones(document):
-    return {t.get("uid") for t in document.get("_deleted", []) if t.get("uid")}
-
-
-def _add_tombstone(document, uid, kind, when):
-    for existing in document.setdefault("_deleted", []):
-        if existing.get("uid") == uid:
-            return
-    document["_deleted"].append({"uid": uid, "kind": kind, "at": when})
-
-
-def apply_ops(document, ops, on_conflict=None, now=None):
+def apply_ops(document, ops, on_conflict=None, now=None, index=None):
     """
     Applies operations from the server to a document, in place.
 
@@ -219,178 +388,186 @@ def apply_ops(document, ops, on_conflict=None, now=None):
                         'discarded_time' when a time entry went with a deleted
                         task, 'auto_closed' when a session left running here
                         was ended because work began elsewhere.
+    :param index: A UidIndex of this document to work from and keep current,
+                  instead of building one for this call alone. One that no
+                  longer covers the document is ignored.
     :return: A Report.
     """
     report = Report()
-    index = _Index(document)
-    dead = _tombstones(document)
+    if index is None or not index.covers(document):
+        index = UidIndex(document)
+    dead = index.tombstones()
+
+    try:
+        for op in sorted(ops, key=lambda o: int(o.get("s", 0))):
+            seq = int(op.get("s", 0))
+            report.highest_seq = max(report.highest_seq, seq)
+            kind = op.get("op")
+            uid = op.get("uid")
+            when = op.get("ts") or op.get("start") or op.get("end") or now or ""
+
+            # An operation naming something already deleted is dropped. The
+            # one exception is below: it is about time entries, and losing
+            # tracked time silently is the one outcome worth complicating
+            # this for.
+            if uid in dead and kind not in ("entry.add", "entry.move"):
+                report.ignored += 1
+                continue
 
-    for op in sorted(ops, key=lambda o: int(o.get("s", 0))):
-        seq = int(op.get("s", 0))
-        report.highest_seq = max(report.highest_seq, seq)
-        kind = op.get("op")
-        uid = op.get("uid")
-        when = op.get("ts") or op.get("start") or op.get("end") or now or ""
+            handled = True
 
-        # An operation naming something already deleted is dropped. The one
-        # exception is below: it is about time entries, and losing tracked
-        # time silently is the one outcome worth complicating this for.
-        if uid in dead and kind not in ("entry.add", "entry.move"):
-            report.ignored += 1
-            continue
+            if kind == "project.create":
+                if uid not in index.projects:
+                    fields = op.get("f") or {}
+                    index.add_project({
+                        "uid": uid,
+                        "main_project_name": fields.get("name", ""),
+                        "tasks": [],
+                        "status": fields.get("status", "open"),
+                        "last_started": fields.get("last_started"),
+                    })
+
+            elif kind == "project.set":
+                project = index.projects.get(uid)
+                if project is None:
+                    handled = False
+                else:
+                    for key, value in (op.get("f") or {}).items():
+                        if key not in PROJECT_FIELDS:
+                            continue
+                        project["main_project_name" if key == "name" else key] = value
+
+            elif kind == "project.delete":
+                for task_uid in index.drop_project(uid):
+                    index.bury(task_uid, "task", when)
+                index.bury(uid, "project", when)
+
+            elif kind == "task.create":
+                if uid not in index.tasks:
+                    project = index.projects.get(op.get("project"))
+                    if project is None:
+                        handled = False
+                    else:
+                        fields = {k: v for k, v in (op.get("f") or {}).items()
+                                  if k in TASK_FIELDS}
+                        task = {
+                            "uid": uid,
+                            "id": _next_local_id(document),
+                            "task_name": "",
+                            "time_entries": [],
+                            "status": "open",
+                            "due_date": None,
+                            "today": False,
+                            "note": "",
+                            "recurring": False,
+                            "frequency": "daily",
+                            "userdefined_days": 1,
+                            "priority": 0,
+                            "last_started": None,
+                        }
+                        task.update(fields)
+                        index.add_task(task, project)
+
+            elif kind == "task.set":
+                task = index.tasks.get(uid)
+                if task is None:
+                    handled = False
+                else:
+                    for key, value in (op.get("f") or {}).items():
+                        if key in TASK_FIELDS:
+                            task[key] = value
 
-        handled = True
-
-        if kind == "project.create":
-            if uid not in index.projects:
-                fields = op.get("f") or {}
-                index.add_project({
-                    "uid": uid,
-                    "main_project_name": fields.get("name", ""),
-                    "tasks": [],
-                    "status": fields.get("status", "open"),
-                    "last_started": fields.get("last_started"),
-                })
-
-        elif kind == "project.set":
-            project = index.projects.get(uid)
-            if project is None:
-                handled = False
-            else:
-                for key, value in (op.get("f") or {}).items():
-                    if key not in PROJECT_FIELDS:
-                        continue
-                    project["main_project_name" if key == "name" else key] = value
-
-        elif kind == "project.delete":
-            for task_uid in index.drop_project(uid):
-                _add_tombstone(document, task_uid, "task", when)
-                dead.add(task_uid)
-            _add_tombstone(document, uid, "project", when)
-            dead.add(uid)
-
-        elif kind == "task.create":
-            if uid not in index.tasks:
+            elif kind == "task.move":
+                task = index.tasks.get(uid)
                 project = index.projects.get(op.get("project"))
-                if project is None:
+                if task is None or project is None:
                     handled = False
                 else:
-                    fields = {k: v for k, v in (op.get("f") or {}).items() if k in TASK_FIELDS}
-                    task = {
-                        "uid": uid,
-                        "id": _next_local_id(document),
-                        "task_name": "",
-                        "time_entries": [],
-                        "status": "open",
-                        "due_date": None,
-                        "today": False,
-                        "note": "",
-                        "recurring": False,
-                        "frequency": "daily",
-                        "userdefined_days": 1,
-                        "priority": 0,
-                        "last_started": None,
-                    }
-                    task.update(fields)
-                    index.add_task(task, project)
-
-        elif kind == "task.set":
-            task = index.tasks.get(uid)
-            if task is None:
-                handled = False
-            else:
-                for key, value in (op.get("f") or {}).items():
-                    if key in TASK_FIELDS:
-                        task[key] = value
-
-        elif kind == "task.move":
-            task = index.tasks.get(uid)
-            project = index.projects.get(op.get("project"))
-            if task is None or project is None:
-                handled = False
-            else:
-                index.move_task(uid, project)
-
-        elif kind == "task.delete":
-            index.drop_task(uid)
-            _add_tombstone(document, uid, "task", when)
-            dead.add(uid)
-
-        elif kind in ("entry.add", "entry.move"):
-            target_uid = op.get("task")
-            task = index.tasks.get(target_uid)
-            if task is None or target_uid in dead:
-                # The task this time belongs to is gone here - deleted on this
-                # machine, or never created because its project was. The entry
-                # goes with it, which is what deleting a task has always done
-                # locally, and is the only answer that leaves both machines
-                # holding the same document: the one that did the deleting
-                # discarded these hours the moment the user asked it to, and
-                # it has no way to get them back.
-                index.drop_entry(uid)
-                report.discarded_time += 1
-                if on_conflict:
-                    on_conflict('discarded_time',
-                                {'entry': uid, 'task': target_uid})
-                handled = False
-            elif kind == "entry.add":
-                if uid in index.entries:
-                    index.move_entry(uid, task)
+                    index.move_task(uid, project)
+
+            elif kind == "task.delete":
+                index.drop_task(uid)
+                index.bury(uid, "task", when)
+
+            elif kind in ("entry.add", "entry.move"):
+                target_uid = op.get("task")
+                task = index.tasks.get(target_uid)
+                if task is None or target_uid in dead:
+                    # The task this time belongs to is gone here - deleted on
+                    # this machine, or never created because its project was.
+                    # The entry goes with it, which is what deleting a task has
+                    # always done locally, and is the only answer that leaves
+                    # both machines holding the same document: the one that did
+                    # the deleting discarded these hours the moment the user
+                    # asked it to, and it has no way to get them back.
+                    index.drop_entry(uid)
+                    report.discarded_time += 1
+                    if on_conflict:
+                        on_conflict('discarded_time',
+                                    {'entry': uid, 'task': target_uid})
+                    handled = False
+                elif kind == "entry.add":
+                    if uid in index.entries:
+                        index.move_entry(uid, task)
+                    else:
+                        entry = {"uid": uid, "start_time": op.get("start")}
+                        if op.get("end"):
+                            entry["end_time"] = op["end"]
+                        index.add_entry(entry, task)
                 else:
-                    entry = {"uid": uid, "start_time": op.get("start")}
-                    if op.get("end"):
-                        entry["end_time"] = op["end"]
-                    index.add_entry(entry, task)
-            else:
-                if uid in index.entries:
-                    index.move_entry(uid, task)
+                    if uid in index.entries:
+                        index.move_entry(uid, task)
+                    else:
+                        handled = False
+
+            elif kind == "entry.close":
+                entry = index.entries.get(uid)
+                if entry is None:
+                    handled = False
                 else:
+                    end = op.get("end")
+                    start = entry.get("start_time")
+                    # Never before it began: durations are these two subtracted,
+                    # and a negative one does not announce itself, it just makes
+                    # the numbers wrong. Clocks on the two machines are allowed
+                    # to disagree, so this really can happen.
+                    if end and start and end < start:
+                        end = start
+                    if end:
+                        entry["end_time"] = end
+
+            elif kind == "entry.set":
+                entry = index.entries.get(uid)
+                if entry is None:
                     handled = False
+                else:
+                    for key, value in (op.get("f") or {}).items():
+                        if key in ENTRY_FIELDS:
+                            entry[key] = value
+                    start, end = entry.get("start_time"), entry.get("end_time")
+                    if start and end and end < start:
+                        entry["end_time"] = start
+
+            elif kind == "entry.delete":
+                index.drop_entry(uid)
 
-        elif kind == "entry.close":
-            entry = index.entries.get(uid)
-            if entry is None:
-                handled = False
             else:
-                end = op.get("end")
-                start = entry.get("start_time")
-                # Never before it began: durations are these two subtracted,
-                # and a negative one does not announce itself, it just makes
-                # the numbers wrong. Clocks on the two machines are allowed
-                # to disagree, so this really can happen.
-                if end and start and end < start:
-                    end = start
-                if end:
-                    entry["end_time"] = end
-
-        elif kind == "entry.set":
-            entry = index.entries.get(uid)
-            if entry is None:
                 handled = False
-            else:
-                for key, value in (op.get("f") or {}).items():
-                    if key in ENTRY_FIELDS:
-                        entry[key] = value
-                start, end = entry.get("start_time"), entry.get("end_time")
-                if start and end and end < start:
-                    entry["end_time"] = start
-
-        elif kind == "entry.delete":
-            index.drop_entry(uid)
 
-        else:
-            handled = False
-
-        if handled:
-            report.applied += 1
-        else:
-            report.ignored += 1
+            if handled:
+                report.applied += 1
+            else:
+                report.ignored += 1
+    finally:
+        # The lists removals marked are closed up here, each in one pass,
+        # and before _settle, which reads them.
+        index.compact()
 
     _settle(document, report, on_conflict)
     return report
 
 
-def reconcile(document, incoming, local=None, on_conflict=None, now=None):
+def reconcile(document, incoming, local=None, on_conflict=None, now=None, index=None):
     """
     One merge: what came from elsewhere, then this machine's own unsent work.
 
@@ -413,30 +590,169 @@ def reconcile(document, incoming, local=None, on_conflict=None, now=None):
     - a create for something that exists does nothing, a set writes the same
     value again - so an operation the document already reflects costs nothing.
 
+    AND WHY IT REPLAYS ONLY WHAT OVERLAPS
+    -------------------------------------
+    Nothing costs nothing twenty thousand times, though, and a machine that
+    was offline for a while can have that many queued. An operation the
+    incoming ones did not come near is still exactly as it was applied, so
+    replaying it changes nothing; only the ones that overlap are replayed -
+    see Touched for what counts - together with what they depend on.
+
     :param document: The document to bring up to date. Modified.
     :param incoming: Operations from the server, each carrying its sequence.
     :param local: This machine's queued operations, carrying the 'lc' they
                   were queued under. They are ordered by that alone: the
                   server appends a batch in the order it was sent, so 'lc'
                   order is already the order the server will give them.
+    :param index: A UidIndex of the document, shared by both passes; see
+                  apply_ops.
     :return: A Report covering both passes.
     """
-    report = apply_ops(document, incoming, on_conflict=on_conflict, now=now)
+    if index is None or not index.covers(document):
+        index = UidIndex(document)
+    buried_from = len(document.get("_deleted", []))
+    report = apply_ops(document, incoming, on_conflict=on_conflict, now=now, index=index)
     if not local:
         return report
 
-    floor = report.highest_seq
+    touched = Touched()
+    touched.add(incoming, document.get("_deleted", [])[buried_from:])
+    return report.absorb(replay_local(document, local, touched, floor=report.highest_seq,
+                                      on_conflict=on_conflict, now=now, index=index))
+
+
+def replay_local(document, local, touched=None, floor=0, on_conflict=None, now=None,
+                 index=None):
+    """
+    The second pass of reconcile(), for a caller that applied the incoming
+    operations itself - in several calls, say - and kept a Touched of them.
+
+    :param touched: What the incoming operations wrote to. None replays all
+                    of `local`.
+    :param floor: Sequence numbers for the replay start above this.
+    :return: A Report of the replay.
+    """
+    if index is None or not index.covers(document):
+        index = UidIndex(document)
+    if touched is not None:
+        local = touched.overlapping(local, index)
+    if not local:
+        return Report()
+
     replay = []
     for position, op in enumerate(sorted(local, key=lambda o: int(o.get('lc', 0))), 1):
         op = dict(op)
         op['s'] = floor + position
         replay.append(op)
+    return apply_ops(document, replay, on_conflict=on_conflict, now=now, index=index)
+
+
+# Operations that bring an object into being, and the map of the index that
+# holds what they create.
+_CREATES = {"project.create": "projects", "task.create": "tasks", "entry.add": "entries"}
+
+
+def _fields_written(op):
+    """
+    The fields an operation writes, or None when it is about the object as a
+    whole - creating, moving or deleting it, or anything not known here.
+    """
+    kind = op.get("op")
+    if kind in ("project.set", "task.set", "entry.set"):
+        return tuple((op.get("f") or {}).keys())
+    if kind == "entry.close":
+        return ("end_time",)
+    return None
+
 
-    second = apply_ops(document, replay, on_conflict=on_conflict, now=now)
-    return report.absorb(second)
+class Touched:
+    """
+    What incoming operations wrote to, for telling which queued local ones
+    need replaying on top of them.
+
+    A local operation overlaps when any of these holds:
+
+    - an incoming one created, moved or deleted its object, or the task or
+      project it names - deletions include everything a deleted project took
+      with it, which is why the tombstones written are added too;
+    - an incoming one wrote a field it writes;
+    - it creates, moves or deletes its object, and anything incoming named
+      that object at all;
+    - it creates something the document does not hold. The queue is meant
+      to be in the document already; this is the case where it is not, and
+      replaying is what puts it there - or, when its task has gone, what
+      counts the time as discarded.
+
+    What an overlapping operation depends on is replayed with it: every
+    queued operation on the same object, so they keep the order they were
+    made in, and the creation of what it names.
+    """
+
+    def __init__(self):
+        # Set when a snapshot was adopted: it writes to everything.
+        self.everything = False
+        self.whole = set()
+        self.fields = set()
+        self.named = set()
+
+    def add(self, ops, buried=()):
+        """Takes in a pass of incoming operations and the tombstones it wrote."""
+        for op in ops:
+            uid = op.get("uid")
+            if uid is None:
+                continue
+            written = _fields_written(op)
+            if written is None:
+                self.whole.add(uid)
+            else:
+                self.fields.update((uid, name) for name in written)
+            self.named.add(uid)
+        for stone in buried:
+            if stone.get("uid"):
+                self.whole.add(stone["uid"])
+                self.named.add(stone["uid"])
+
+    def _clashes(self, op):
+        uid = op.get("uid")
+        if uid in self.whole:
+            return True
+        for parent in (op.get("task"), op.get("project")):
+            if parent is not None and parent in self.whole:
+                return True
+        written = _fields_written(op)
+        if written is None:
+            return uid in self.named
+        return any((uid, name) in self.fields for name in written)
+
+    @staticmethod
+    def _missing(op, index, dead):
+        kind = op.get("op")
+        if kind not in _CREATES:
+            return False
+        uid = op.get("uid")
+        return uid not in getattr(index, _CREATES[kind]) and uid not in dead
+
+    def overlapping(self, local, index):
+        """The part of `local` that has to be replayed, in its own order."""
+        if self.everything:
+            return list(local)
+        dead = index.tombstones()
+        hit = set()
+        for op in local:
+            uid = op.get("uid")
+            if uid not in hit and (self._clashes(op) or self._missing(op, index, dead)):
+                hit.add(uid)
+        if not hit:
+            return []
+        parents = set()
+        for op in local:
+            if op.get("uid") in hit:
+                parents.update(p for p in (op.get("task"), op.get("project")) if p)
+        return [op for op in local if op.get("uid") in hit
+                or (op.get("op") in _CREATES and op.get("uid") in parents)]
 
 
-def adopt_snapshot(document, snapshot, on_conflict=None, now=None):
+def adopt_snapshot(document, snapshot, on_conflict=None, now=None, index=None):
     """
     Folds a document the server holds into this machine's own.
 
@@ -478,12 +794,13 @@ def adopt_snapshot(document, snapshot, on_conflict=None, now=None):
 
     :param document: This machine's document. Modified.
     :param snapshot: The document the server returned.
+    :param index: A UidIndex of `document`; see apply_ops.
     :return: A Report covering the fold.
     """
     ops = seed_operations(snapshot or {})
     for position, op in enumerate(ops, 1):
         op['s'] = position
-    report = apply_ops(document, ops, on_conflict=on_conflict, now=now)
+    report = apply_ops(document, ops, on_conflict=on_conflict, now=now, index=index)
     report.highest_seq = 0
     return report
 
@@ -30,6 +30,8 @@ import json
 import os
 import platform
 import secrets
+import threading
+import zlib
 from urllib.parse import urlsplit, urlunsplit
 
 import requests
@@ -53,6 +55,31 @@ TIMEOUT = 20
 # ever fires for a lookup that is genuinely stuck.
 DEADLINE = 2 * TIMEOUT + 5
 
+# Connections kept open to the server between calls. A catch-up has the page
+# it waits on and sync_engine.PULL_READ_AHEAD more in flight, and the settings
+# page may check the token meanwhile; a pool smaller than that would open and
+# throw away a connection per page, which is what the pool is there to stop.
+POOL_SIZE = 4
+
+_session = None
+_session_address = None
+_session_lock = threading.Lock()
+# Calls running on each session, the current one or one already replaced.
+# A replaced session is closed when the last of them returns.
+_session_users = {}
+
+# Request encodings this client can produce, best first. Which of them a
+# server reads is learned from its head reply - see _request_encoding().
+ENCODINGS = ('gzip', 'deflate')
+
+# Below this a body goes out as it is. Compressing a handful of operations
+# saves less than announcing it costs.
+COMPRESS_MIN_BYTES = 1024
+
+# What each server said it reads: an encoding, or None for nothing at all
+# (an older server, or one without zlib). An address is missing until asked.
+_encodings = {}
+
 
 def config_dir():
     """
@@ -153,6 +180,8 @@ def load_credentials():
 
 def clear_credentials():
     """Forgets the token. The device identity is deliberately kept."""
+    _reset_session()
+    _encodings.clear()
     try:
         os.remove(_credentials_path())
     except OSError:
@@ -230,7 +259,140 @@ def address_changed(configured):
     return _canonical(configured) != _canonical(creds['base_url'])
 
 
-def _post(base_url, action, payload=None, token=None, params=None):
+def _session_for(base_url):
+    """
+    The connection pool calls to `base_url` go through, opened on first use.
+
+    One per process rather than one per call. A catch-up cycle pulls up to
+    MAX_PAGES_PER_CYCLE pages back to back, and with a fresh connection each
+    time every page paid for its own TCP and TLS handshake - on a shared host
+    often more than the page itself took. A different address gets a new
+    pool: a connection opened to one server is never lent to another.
+
+    Every call made on it has to be followed by _release_session().
+    """
+    global _session, _session_address
+    address = _canonical(base_url)
+    with _session_lock:
+        if _session is None or _session_address != address:
+            _retire_session()
+            session = requests.Session()
+            session.headers['Accept-Encoding'] = ', '.join(ENCODINGS)
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                    pool_maxsize=POOL_SIZE)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            _session, _session_address = session, address
+        _session_users[_session] = _session_users.get(_session, 0) + 1
+        return _session
+
+
+def _release_session(session):
+    """Ends a call made on `session`; the last call on a replaced one closes it."""
+    with _session_lock:
+        _session_users[session] -= 1
+        if not _session_users[session]:
+            del _session_users[session]
+            if session is not _session:
+                session.close()
+
+
+def _retire_session():
+    """
+    Replaces the current session, with _session_lock held.
+
+    It is only closed once nothing uses it any more. The pages of a catch-up
+    are fetched side by side, and closing the pool under them would fail
+    every one still in flight for the sake of the one that broke.
+    """
+    global _session, _session_address
+    if _session is not None and _session not in _session_users:
+        _session.close()
+    _session, _session_address = None, None
+
+
+def _reset_session():
+    """
+    Drops the kept-open connections, so the next call starts from scratch.
+
+    Done whenever a call fails in transport and whenever the credential
+    changes. After a failure the pooled connection is the likeliest thing to
+    be broken - a server or a router that closed it quietly - and reusing it
+    would only fail again. A call abandoned by the deadline may still be
+    running in its thread; the pool it is using is retired with it rather
+    than handed to the next call.
+    """
+    with _session_lock:
+        _retire_session()
+
+
+def _json_bytes(payload):
+    """
+    A payload as the bytes that go out.
+
+    Encoded here rather than handed over as a str, and without ASCII
+    escaping. Two reasons, both about the byte count: requests encodes a str
+    body as latin-1, which German task names are not, and fit_batch measures
+    what it is about to send this same way. Escaping here and measuring there
+    would make every umlaut count for two bytes more than the budget was told
+    about - and the budget exists because the server turns an over-long body
+    into an empty one.
+    """
+    return json.dumps(payload, ensure_ascii=False).encode('utf-8')
+
+
+def _compressor(encoding):
+    # wbits 31 writes the gzip wrapper, 15 the zlib one - which is what HTTP
+    # calls "deflate", however much the name suggests the raw stream.
+    return zlib.compressobj(6, zlib.DEFLATED, 31 if encoding == 'gzip' else 15)
+
+
+def _compress(body, encoding):
+    packer = _compressor(encoding)
+    return packer.compress(body) + packer.flush()
+
+
+def _remember_encoding(base_url, reply):
+    offered = reply.get('encodings') or []
+    _encodings[_canonical(base_url)] = next((e for e in ENCODINGS if e in offered), None)
+
+
+def negotiated_encoding():
+    """
+    The encoding the signed-in server has said it reads, or None.
+
+    None also when it has not been asked yet: this never goes to the network,
+    so it is safe to call while only planning a request.
+    """
+    creds = load_credentials()
+    return _encodings.get(_canonical(creds['base_url'])) if creds else None
+
+
+def _request_encoding(creds):
+    """
+    The encoding to compress a body for this server with, asking it first.
+
+    The question is head, once per server per run. Compressing on trust would
+    be the wrong default: an older server takes a gzip body for broken JSON,
+    and the push fails on every cycle until somebody updates it.
+    """
+    address = _canonical(creds['base_url'])
+    if address not in _encodings:
+        head()
+    return _encodings.get(address)
+
+
+def _outgoing(creds, body):
+    """The body as it will travel, and the encoding it carries if any."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    encoding = _request_encoding(creds)
+    if encoding is None:
+        return body, None
+    return _compress(body, encoding), encoding
+
+
+def _post(base_url, action, payload=None, token=None, params=None, encoding=None):
     """
     Performs one request and converts every failure into a stable code.
 
@@ -239,30 +401,31 @@ def _post(base_url, action, payload=None, token=None, params=None):
     failures get their own codes rather than being folded into a generic
     error.
 
-    :param payload: Sent as a JSON body via POST. None makes it a GET.
+    :param payload: Sent as a JSON body via POST. None makes it a GET;
+                    bytes are sent as they are, already encoded.
     :param params: Extra query parameters beside the action, for the
                    endpoints that read them from the query string.
+    :param encoding: The compression those bytes already carry, if any.
     """
     headers = {'Content-Type': 'application/json'}
     if token:
         headers['X-TC-Token'] = token
+    if encoding:
+        headers['Content-Encoding'] = encoding
     url = _endpoint(base_url)
     query = {'a': action}
     query.update(params or {})
 
     def _send():
-        if payload is None:
-            return requests.get(url, params=query, headers=headers, timeout=TIMEOUT)
-        # Encoded here rather than handed over as a str, and without ASCII
-        # escaping. Two reasons, both about the byte count: requests encodes a
-        # str body as latin-1, which German task names are not, and fit_batch
-        # measures what it is about to send this same way. Escaping here and
-        # measuring there would make every umlaut count for two bytes more
-        # than the budget was told about - and the budget exists because the
-        # server turns an over-long body into an empty one.
-        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
-        return requests.post(url, params=query, headers=headers,
-                             data=body, timeout=TIMEOUT)
+        session = _session_for(base_url)
+        try:
+            if payload is None:
+                return session.get(url, params=query, headers=headers, timeout=TIMEOUT)
+            body = payload if isinstance(payload, bytes) else _json_bytes(payload)
+            return session.post(url, params=query, headers=headers,
+                                data=body, timeout=TIMEOUT)
+        finally:
+            _release_session(session)
 
     try:
         # requests' own timeout does not cover the DNS lookup that runs
@@ -275,12 +438,16 @@ def _post(base_url, action, payload=None, token=None, params=None):
         else:
             response = _send()
     except TimeoutError:
+        _reset_session()
         return {'ok': False, 'error': 'timeout'}
     except requests.exceptions.SSLError:
+        _reset_session()
         return {'ok': False, 'error': 'tls_failed'}
     except requests.exceptions.Timeout:
+        _reset_session()
         return {'ok': False, 'error': 'timeout'}
     except requests.exceptions.RequestException:
+        _reset_session()
         return {'ok': False, 'error': 'unreachable'}
 
     try:
@@ -319,6 +486,8 @@ def login(base_url, username, password):
             # so the address is answering for something else. Saying so
             # beats a KeyError from deep inside the sign-in button.
             return {'ok': False, 'error': 'bad_response'}
+        _reset_session()
+        _encodings.clear()
         _write_private(_credentials_path(), {
             'version': 1,
             'base_url': _endpoint(base_url),
@@ -395,12 +564,24 @@ MAX_OPS_PER_CALL = 500
 # server counts everything: the envelope, and whatever the transfer adds.
 MAX_BYTES_PER_CALL = 512 * 1024
 
+# A compressed batch is bounded twice: by what travels, above, and by what it
+# unpacks to, which the server caps separately (TC_BODY_INFLATED_MAX) because
+# that is what has to fit in its memory. Half of that, for the same reason.
+MAX_INFLATED_BYTES_PER_CALL = 2 * 1024 * 1024
 
-def fit_batch(operations, max_ops=None, max_bytes=None):
+
+def fit_batch(operations, max_ops=None, max_bytes=None, encoding=None):
     """
     Takes as many operations from the front as will actually arrive.
 
+    Compressed, the budget is spent on the compressed size, which is what the
+    server's limit is about. It is measured by compressing as it goes and
+    flushing after every operation, so the running figure is never below what
+    the finished body will weigh.
+
     :param operations: Wire-ready operations, in the order they must be sent.
+    :param encoding: How the batch will travel. Defaults to whatever the
+                     signed-in server has agreed to.
     :return: The prefix that fits. Never empty when given anything: one
              operation too large to send on its own would otherwise sit at
              the head of the queue and block everything behind it for ever.
@@ -408,27 +589,64 @@ def fit_batch(operations, max_ops=None, max_bytes=None):
     """
     max_ops = MAX_OPS_PER_CALL if max_ops is None else max_ops
     max_bytes = MAX_BYTES_PER_CALL if max_bytes is None else max_bytes
+    if encoding is None:
+        encoding = negotiated_encoding()
+    packer = _compressor(encoding) if encoding else None
 
-    batch, total = [], 0
+    batch, total, inflated = [], 0, 0
     for op in operations[:max_ops]:
-        size = len(json.dumps(op, ensure_ascii=False).encode('utf-8')) + 1
-        if batch and total + size > max_bytes:
+        raw = _json_bytes(op) + b','
+        size = len(raw)
+        if packer is None:
+            wire = size
+        else:
+            wire = len(packer.compress(raw)) + len(packer.flush(zlib.Z_SYNC_FLUSH))
+        if batch and (total + wire > max_bytes
+                      or inflated + size > MAX_INFLATED_BYTES_PER_CALL):
             break
         batch.append(op)
-        total += size
+        total += wire
+        inflated += size
     return batch
 
 
+# What a server answers when it could not read a compressed body after all:
+# it has been replaced by an older one since it was asked.
+_UNREADABLE = ('bad_json', 'bad_encoding', 'unsupported_encoding', 'snapshot_not_json')
+
+
 def _authenticated(action, payload=None, params=None):
     creds = load_credentials()
     if not creds:
         return {'ok': False, 'error': 'not_signed_in'}
-    return _post(creds['base_url'], action, payload, token=creds['token'], params=params)
+    body, encoding = None, None
+    if payload is not None:
+        body, encoding = _outgoing(creds, _json_bytes(payload))
+    return _exchange(creds, action, body, encoding, params)
+
+
+def _exchange(creds, action, body, encoding, params):
+    result = _post(creds['base_url'], action, body, token=creds['token'],
+                   params=params, encoding=encoding)
+    if encoding and result.get('error') in _UNREADABLE:
+        # Plain from now on. This call has failed, but the next one - the
+        # next cycle's retry - goes out in a form the server can read.
+        _encodings[_canonical(creds['base_url'])] = None
+    return result
 
 
 def head():
-    """The cheap poll: how far the log has got, without transferring it."""
-    return _authenticated('head')
+    """
+    The cheap poll: how far the log has got, without transferring it.
+
+    Also where a server says which compressed request bodies it reads, which
+    is remembered for every call after it.
+    """
+    creds = load_credentials()
+    result = _authenticated('head')
+    if creds and result.get('ok'):
+        _remember_encoding(creds['base_url'], result)
+    return result
 
 
 def push(base_seq, ops):
@@ -473,6 +691,11 @@ def pull(since, limit=MAX_OPS_PER_CALL):
 # cycle for the rest of the installation's life.
 MAX_SNAPSHOT_BYTES = 4 * 1024 * 1024
 
+# The same document unpacked, when it travels compressed
+# (TC_SNAPSHOT_MAX_INFLATED). The limit above then applies to the compressed
+# bytes, which is what lets a mature account's document through at all.
+MAX_SNAPSHOT_INFLATED_BYTES = 8 * 1024 * 1024
+
 
 def get_snapshot():
     """
@@ -498,7 +721,13 @@ def put_snapshot(seq, document):
     arrived instead of decoding and re-encoding a document it has no business
     understanding.
     """
-    size = len(json.dumps(document, ensure_ascii=False).encode('utf-8'))
-    if size > MAX_SNAPSHOT_BYTES:
-        return {'ok': False, 'error': 'snapshot_too_large', 'bytes': size}
-    return _authenticated('snapshot', document, params={'seq': int(seq)})
+    creds = load_credentials()
+    if not creds:
+        return {'ok': False, 'error': 'not_signed_in'}
+    body = _json_bytes(document)
+    if len(body) > MAX_SNAPSHOT_INFLATED_BYTES:
+        return {'ok': False, 'error': 'snapshot_too_large', 'bytes': len(body)}
+    body, encoding = _outgoing(creds, body)
+    if len(body) > MAX_SNAPSHOT_BYTES:
+        return {'ok': False, 'error': 'snapshot_too_large', 'bytes': len(body)}
+    return _exchange(creds, 'snapshot', body, encoding, {'seq': int(seq)})
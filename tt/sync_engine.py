@@ -41,6 +41,7 @@ waiting.
 import contextlib
 import json
 import os
+import shutil
 import threading
 import time
 from datetime import datetime
@@ -48,8 +49,9 @@ from datetime import datetime
 from tt import sync_client
 from tt.filelock import locked, LockTimeout
 from tt import sync_log
-from tt.sync_apply import Report, adopt_snapshot, reconcile, seed_operations
-from tt.sync_outbox import Outbox
+from tt.sync_apply import (Report, Touched, adopt_snapshot, apply_ops, replay_local,
+                           seed_operations)
+from tt.sync_outbox import Outbox, coalesce
 
 # How long between cycles when everything is working. The user asked for
 # "several minutes": long enough that this is invisible, short enough that
@@ -202,23 +204,31 @@ def _inbox_lock_path():
     return os.path.join(sync_client.config_dir(), 'sync_inbox.lock')
 
 
+def _inbox_records(f):
+    """
+    Yields (record, offset just past it) from an inbox opened in binary mode,
+    one line at a time, so a long catch-up is never held in memory whole.
+    """
+    offset = 0
+    for raw in f:
+        offset += len(raw)
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError:
+            continue
+        if isinstance(record, dict) and 'ops' in record:
+            yield record, offset
+
+
 def _read_inbox_unlocked():
-    out = []
     try:
-        with open(inbox_path(), 'r', encoding='utf-8') as f:
-            for line in f:
-                line = line.strip()
-                if not line:
-                    continue
-                try:
-                    record = json.loads(line)
-                except ValueError:
-                    continue
-                if isinstance(record, dict) and 'ops' in record:
-                    out.append(record)
+        with open(inbox_path(), 'rb') as f:
+            return [record for record, _ in _inbox_records(f)]
     except OSError:
         return []
-    return out
 
 
 def read_inbox():
@@ -226,6 +236,17 @@ def read_inbox():
     return _read_inbox_unlocked()
 
 
+def inbox_waiting():
+    """
+    Tells whether the worker has filed anything not yet applied, without
+    reading it. Cheap enough to ask every few seconds; never raises.
+    """
+    try:
+        return os.path.getsize(inbox_path()) > 0
+    except OSError:
+        return False
+
+
 def _append_inbox(record):
     os.makedirs(sync_client.config_dir(), exist_ok=True)
     with locked(_inbox_lock_path()):
@@ -250,6 +271,31 @@ def _remove_inbox():
         pass
 
 
+def _consume_inbox(offset):
+    """
+    Removes the first `offset` bytes of the inbox - the records that were
+    applied - and keeps whatever follows, byte for byte. The caller holds the
+    inbox lock.
+    """
+    path = inbox_path()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        return
+    if size <= offset:
+        _remove_inbox()
+        return
+    tmp = path + '.tmp'
+    with open(path, 'rb') as src, open(tmp, 'wb') as dst:
+        src.seek(offset)
+        shutil.copyfileobj(src, dst)
+    try:
+        os.chmod(tmp, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp, path)
+
+
 @contextlib.contextmanager
 def taken_inbox():
     """
@@ -264,23 +310,16 @@ def taken_inbox():
     next time. Applying twice is harmless; losing them is not.
     """
     with locked(_inbox_lock_path()):
-        records = _read_inbox_unlocked()
+        records, end = [], 0
+        try:
+            with open(inbox_path(), 'rb') as f:
+                records = [record for record, _ in _inbox_records(f)]
+                end = f.tell()
+        except OSError:
+            pass
         yield records
-        if not records:
-            return
-        remaining = _read_inbox_unlocked()[len(records):]
-        if remaining:
-            tmp = inbox_path() + '.tmp'
-            with open(tmp, 'w', encoding='utf-8') as f:
-                for record in remaining:
-                    f.write(json.dumps(record, ensure_ascii=False) + '\n')
-            try:
-                os.chmod(tmp, 0o600)
-            except OSError:
-                pass
-            os.replace(tmp, inbox_path())
-        else:
-            _remove_inbox()
+        if records:
+            _consume_inbox(end)
 
 
 # ---------------------------------------------------------------------------
@@ -328,6 +367,13 @@ def _since(state):
 # more than it sends; without it a bad answer would spin here for ever.
 MAX_PAGES_PER_CYCLE = 40
 
+# Pages asked for ahead of the one the catch-up is waiting on. The log is
+# numbered without gaps, so once one full page has arrived the next few can
+# be asked for before it is filed - a machine back from a holiday otherwise
+# waits out forty round trips one after the other. Kept small: each is a PHP
+# process on a shared host, and sync_client's pool is sized to match.
+PULL_READ_AHEAD = 2
+
 
 def _current_account():
     creds = sync_client.load_credentials() or {}
@@ -386,7 +432,8 @@ def _run_cycle_locked(outbox):
 
     since = _since(state)
 
-    sending = outbox.pending()
+    queued = outbox.pending()
+    sending, folded = coalesce(queued, outbox.offered())
     # By size, not just by count. The server reads a bounded amount of request
     # body and silently treats anything longer as an empty request - accepted,
     # acknowledged, and carrying nothing - so a batch that is too large does
@@ -396,8 +443,11 @@ def _run_cycle_locked(outbox):
     batch = sending[:len(fitted)]
 
     sync_log.log('push', since=since, sending=len(batch),
-                 queued=len(sending),
+                 queued=len(queued), coalesced=len(queued) - len(sending),
                  bytes=sum(len(json.dumps(o, ensure_ascii=False)) for o in fitted))
+    # Before the request leaves: from then on the server may hold these
+    # whatever becomes of the answer, and they must not be folded again.
+    outbox.offer(op['lc'] for op in batch)
     result = sync_client.push(since, fitted)
     if not result.get('ok'):
         sync_log.log('push.failed', error=result.get('error') or 'unreachable')
@@ -451,28 +501,12 @@ def _run_cycle_locked(outbox):
         # In both cases the push reply is not a usable picture of the order,
         # and pull is: unlike push it includes this machine's own work, so
         # what comes back is the whole sequence, as the server has it.
+        #
+        # The pages are filed as they arrive, so what is already on disk is
+        # the only copy and the inbox records carry the cursor between them.
         incoming = []
-        cursor = since
-        for _page in range(MAX_PAGES_PER_CYCLE):
-            fetched = sync_client.pull(cursor)
-            sync_log.log('pull', since=cursor,
-                         got=len(fetched.get('ops') or []),
-                         more=bool(fetched.get('more')),
-                         error=fetched.get('error') or '-')
-            if not fetched.get('ok'):
-                # Keep the contiguous run we did get; the rest comes next
-                # time. The cursor below advances only over what is in hand.
-                failure = fetched.get('error') or 'unreachable'
-                break
-            page = fetched.get('ops') or []
-            incoming.extend(page)
-            head = max(head, int(fetched.get('head', 0)))
-            cursor = max([int(op.get('s', 0)) for op in page] or [cursor])
-            if not fetched.get('more'):
-                truncated = False
-                break
-        else:
-            truncated = True
+        highest_seen, head, received, truncated, failure = _drain(since, head)
+        filed = max(highest_seen, since)
     else:
         incoming = list(result.get('ops') or [])
         # Our own operations are not echoed back, but we now know where they
@@ -482,15 +516,18 @@ def _run_cycle_locked(outbox):
             seq = seq_of.get(int(op.get('lc', 0)))
             if seq:
                 incoming.append(dict(_wire(op), s=seq))
+        highest_seen = max([int(op.get('s', 0)) for op in incoming] or [0])
+        received = len(incoming)
+        filed = since
 
     # The cursor may only advance as far as we were actually given.
-    highest_seen = max([int(op.get('s', 0)) for op in incoming] or [0])
     complete = not truncated and failure is None
     reached = max(head, highest_seen, since) if complete else max(highest_seen, since)
 
-    if incoming or reached > since:
+    if incoming or reached > filed:
         _append_inbox({'base_seq': reached, 'ops': incoming})
-        sync_log.log('filed', reached=reached, ops=len(incoming),
+    if received or reached > since:
+        sync_log.log('filed', reached=reached, ops=received,
                      complete=complete)
 
     # Only now, once what came back is safely on disk - and only for what is
@@ -500,6 +537,8 @@ def _run_cycle_locked(outbox):
     acknowledged = [lc for lc, seq in seq_of.items() if seq <= reached]
     if complete:
         acknowledged.extend(dups)
+    # What coalesce() folded into an acknowledged operation went with it.
+    acknowledged.extend(lc for sent in list(acknowledged) for lc in folded.get(sent, ()))
     if acknowledged:
         outbox.drop(acknowledged)
         sync_log.log('acknowledged', lcs=len(acknowledged),
@@ -520,12 +559,100 @@ def _run_cycle_locked(outbox):
     # snapshot only from a machine that is at head, and this is the one moment
     # this machine knows it was.
     _offer_staged_snapshot(max(head, reached), outbox)
-    sync_log.log('cycle.ok', sent=len(batch), received=len(incoming),
+    sync_log.log('cycle.ok', sent=len(batch), received=received,
                  head=head, reached=reached)
-    return {'ok': True, 'sent': len(batch), 'received': len(incoming),
+    return {'ok': True, 'sent': len(batch), 'received': received,
             'more': truncated or len(sending) > len(batch)}
 
 
+def _pull_in_background(cursor):
+    """
+    Starts sync_client.pull(cursor) on a thread of its own.
+
+    A daemon thread, for the reason update._call_with_deadline gives: a
+    request nobody is waiting for any more must not hold the app open at
+    exit. The pull itself is bounded by sync_client's deadline.
+
+    :return: A callable that waits for the reply and returns it.
+    """
+    outcome = {}
+
+    def _target():
+        try:
+            outcome['reply'] = sync_client.pull(cursor)
+        except BaseException as exc:
+            outcome['error'] = exc
+
+    worker = threading.Thread(target=_target, daemon=True)
+    worker.start()
+
+    def _wait():
+        worker.join()
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['reply']
+    return _wait
+
+
+def _drain(since, head):
+    """
+    Pulls the log forward from `since`, filing every page as it arrives.
+
+    The requests overlap. The log is numbered without gaps, so a page of n
+    operations ending at s means the next one starts at s, and the one after
+    at s + n - those are asked for while this page is being filed. A guess
+    is only ever used if it starts exactly where the log in hand ends: a
+    shorter page than the last one, or a hole where a segment went missing,
+    makes the guesses above it useless, and they are dropped unread rather
+    than stitched on. So the rule the cursor lives by is unchanged - it
+    advances only over a contiguous run of operations in hand.
+
+    :return: (highest sequence number filed, head, operations received,
+             whether the log goes on past what was read, failure code or None)
+    """
+    cursor, size, received = since, 0, 0
+    asked = {}
+
+    def _ask_ahead(page_no):
+        if cursor not in asked:
+            asked[cursor] = _pull_in_background(cursor)
+        if not size:
+            return
+        for step in range(1, PULL_READ_AHEAD + 1):
+            start = cursor + step * size
+            if start >= head or page_no + step >= MAX_PAGES_PER_CYCLE:
+                break
+            if start not in asked:
+                asked[start] = _pull_in_background(start)
+
+    _ask_ahead(0)
+    for page_no in range(MAX_PAGES_PER_CYCLE):
+        fetched = asked.pop(cursor)()
+        sync_log.log('pull', since=cursor,
+                     got=len(fetched.get('ops') or []),
+                     more=bool(fetched.get('more')),
+                     error=fetched.get('error') or '-')
+        if not fetched.get('ok'):
+            # Keep the contiguous run we did get; the rest comes next time.
+            # What is filed advances the cursor only over what is in hand.
+            return cursor, head, received, True, fetched.get('error') or 'unreachable'
+        page = fetched.get('ops') or []
+        head = max(head, int(fetched.get('head', 0)))
+        cursor = max([int(op.get('s', 0)) for op in page] or [cursor])
+        size = len(page)
+        more = bool(fetched.get('more'))
+        for start in [start for start in asked if start < cursor]:
+            del asked[start]
+        if more and page_no + 1 < MAX_PAGES_PER_CYCLE:
+            _ask_ahead(page_no + 1)
+        if page:
+            _append_inbox({'base_seq': cursor, 'ops': page})
+            received += len(page)
+        if not more:
+            return cursor, head, received, False, None
+    return cursor, head, received, True, None
+
+
 def _wire(op):
     """Strips the queue's own bookkeeping down to what the server accepts."""
     allowed = ('op', 'lc', 'uid', 'f', 'ts', 'project', 'task', 'start', 'end')
@@ -702,9 +829,21 @@ def _record_failure(code):
 # The fast half: putting what arrived into the document.
 # ---------------------------------------------------------------------------
 
+# How much of the inbox one redraw takes on. A catch-up after weeks away can
+# run to tens of thousands of operations, and the drawing thread applying them
+# all at once is the interface frozen for as long as that takes. So the inbox
+# is applied in chunks, in the order it was filed, and a redraw stops starting
+# new ones once the budget is spent; what is left waits for the next redraw,
+# which inbox_waiting() asks for on its own. At least one chunk is always
+# applied, so a slow machine still gets somewhere.
+APPLY_CHUNK_OPS = 500
+APPLY_BUDGET_SECONDS = 0.25
+
+
 def apply_pending(tracker):
     """
-    Applies everything fetched so far to the tracker's document and saves it.
+    Applies what has been fetched to the tracker's document and saves it -
+    all of it, or as many chunks as fit in APPLY_BUDGET_SECONDS.
 
     Must be called on the thread that owns the document - in the interface,
     the one drawing it, immediately after it has reloaded from disk. It works
@@ -714,41 +853,84 @@ def apply_pending(tracker):
     :raises OSError: if the document cannot be saved. Nothing is consumed in
                      that case, so the next call tries again - which is why
                      the caller must not simply swallow it.
-    :return: A summary dict, or None when there was nothing to do.
+    :return: A summary dict, or None when there was nothing to do. 'more' is
+             set when records were left for the next call.
     """
-    if not read_inbox():
+    if not inbox_waiting():
         return None
 
     outbox = tracker.op_outbox or Outbox()
 
     try:
-        with taken_inbox() as records:
-            if not records:
+        with locked(_inbox_lock_path()):
+            try:
+                f = open(inbox_path(), 'rb')
+            except OSError:
                 return None
-
-            # Every record at once, in one pass. They are one stream of
-            # operations that happens to have arrived in instalments, and
-            # apply_ops orders by sequence number anyway. Applying them
-            # record by record would replay this machine's own unsent work
-            # once per record - and count the same discarded time entry once
-            # per record along with it.
-            incoming = [op for record in records for op in (record.get('ops') or [])]
-            reached = max([int(record.get('base_seq', 0)) for record in records]
-                          + [int(read_state().get('base_seq', 0))])
-
-            local, settled = _split_placed(outbox.pending(), incoming)
-
-            # A snapshot goes in first, and in a pass of its own. It stands
-            # for everything up to its own sequence number, so applying it
-            # after the operations that come later would lay an older picture
-            # over a newer one. The separate pass is what orders it: apply_ops
-            # sorts by sequence number within a call and remembers nothing
-            # between calls, so being applied first is the ordering.
-            report = Report()
-            for record in sorted(records, key=lambda r: int(r.get('base_seq', 0))):
-                if record.get('snapshot'):
-                    report.absorb(adopt_snapshot(tracker.data, record['snapshot']))
-            report.absorb(reconcile(tracker.data, incoming, local))
+            with f:
+                report = Report()
+                touched = Touched()
+                local, settled = list(outbox.pending()), []
+                offered = outbox.offered()
+                reached = int(read_state().get('base_seq', 0))
+                deadline = time.monotonic() + APPLY_BUDGET_SECONDS
+                consumed, more = 0, False
+
+                def _apply(chunk):
+                    nonlocal local, reached
+                    # A snapshot only ever opens a chunk, so adopting it
+                    # before the chunk's operations keeps the order it was
+                    # filed in: it stands for everything up to its own
+                    # sequence number, and laying it over anything later
+                    # would put an older picture on top of a newer one.
+                    for record in chunk:
+                        if record.get('snapshot'):
+                            report.absorb(adopt_snapshot(tracker.data, record['snapshot'],
+                                                         index=tracker.uid_index()))
+                            touched.everything = True
+                        reached = max(reached, int(record.get('base_seq', 0)))
+                    ops = [op for record in chunk for op in (record.get('ops') or [])]
+                    local, placed = _split_placed(local, ops, offered)
+                    settled.extend(placed)
+                    buried_from = len(tracker.data.get('_deleted', []))
+                    report.absorb(apply_ops(tracker.data, ops, index=tracker.uid_index()))
+                    touched.add(ops, tracker.data.get('_deleted', [])[buried_from:])
+
+                chunk, size, last = [], 0, 0
+                for record, offset in _inbox_records(f):
+                    if chunk and (record.get('snapshot') or size >= APPLY_CHUNK_OPS):
+                        _apply(chunk)
+                        consumed = last
+                        chunk, size = [], 0
+                        if time.monotonic() >= deadline:
+                            more = True
+                            break
+                    chunk.append(record)
+                    size += len(record.get('ops') or [])
+                    last = offset
+                else:
+                    if chunk:
+                        _apply(chunk)
+                    # Up to the end of the file, not of the last record: a
+                    # torn line the worker left behind would otherwise keep
+                    # the inbox looking non-empty for ever.
+                    consumed = f.tell()
+                    if not last:
+                        # Nothing but torn lines: clear them, so the
+                        # interface stops being asked to redraw for them.
+                        _consume_inbox(consumed)
+                        return None
+
+            # This machine's own unsent work goes back on top once, after
+            # every chunk, rather than once per chunk: replaying it per chunk
+            # would count the same discarded time entry once per chunk. Only
+            # what the chunks came near is replayed - see reconcile() - so
+            # `touched` gathers them all. A redraw that stops early still
+            # replays, so the document it shows and saves has the local edits
+            # above everything applied so far; the next call applies the rest
+            # and replays what that overlaps.
+            report.absorb(replay_local(tracker.data, local, touched,
+                                       index=tracker.uid_index()))
 
             # A session this machine had left running was ended because work
             # began elsewhere. That was worked out here, from the order alone,
@@ -770,19 +952,21 @@ def apply_pending(tracker):
             write_state({'base_seq': reached}, required=True)
             if settled:
                 outbox.drop(settled)
+            _consume_inbox(consumed)
     except LockTimeout:
         return None
 
     sync_log.log('applied', ops=report.applied, ignored=report.ignored,
                  discarded_time=report.discarded_time,
-                 auto_closed=len(report.auto_closed), reached=reached)
+                 auto_closed=len(report.auto_closed), reached=reached, more=more)
     for entry_uid, end in report.auto_closed:
         sync_log.log('auto_closed', entry=entry_uid)
     return {'applied': report.applied, 'discarded_time': report.discarded_time,
-            'auto_closed': len(report.auto_closed), 'base_seq': reached}
+            'auto_closed': len(report.auto_closed), 'base_seq': reached,
+            'more': more}
 
 
-def _split_placed(queued, incoming):
+def _split_placed(queued, incoming, offered=()):
     """
     Separates queued operations the log has already placed from the rest.
 
@@ -802,6 +986,8 @@ def _split_placed(queued, incoming):
     entries answer themselves, since each carries the device and number it was
     sent with.
 
+    :param offered: The queue's numbers sent at least once, which coalesce()
+             must be told to group the queue as it was sent.
     :return: (still unplaced, numbers now known to be in the log)
     """
     try:
@@ -813,6 +999,16 @@ def _split_placed(queued, incoming):
               if op.get('dev') == mine and op.get('lc') is not None}
     if not placed:
         return list(queued), []
+    # An operation coalesce() folded into a later one was placed along with
+    # it: the later one carried it. Asked of the queue as it is now, which
+    # may have grown since that push, so the group may have grown too - but
+    # whatever sits below a placed member went out with that member or an
+    # earlier one, since a push sends a prefix of the coalesced queue.
+    for sent, earlier in coalesce(queued, offered)[1].items():
+        members = sorted(earlier + [sent])
+        top = max((lc for lc in members if lc in placed), default=None)
+        if top is not None:
+            placed.update(lc for lc in members if lc < top)
     return ([op for op in queued if int(op.get('lc', 0)) not in placed],
             sorted(placed))
 
@@ -29,6 +29,36 @@ it, and the next number would then start again at one - which the server has
 already seen and would discard, silently, for ever after. So the high-water
 mark is kept in a file of its own, beside the queue and written under the
 same lock, and survives the queue being emptied.
+
+THE SUMMARY
+-----------
+How many operations are queued, and the highest number among them, are
+needed on every append - the first for the size limit, the second for the
+counter. Reading them off the queue means parsing all of it, which during a
+long outage is thousands of lines per click. So they are kept in a third
+small file, rewritten under the lock after every change to the queue,
+together with the stat() of the queue's files as they were right after that
+change. While the two still match, the summary is the truth; when they do
+not - a crash between the two writes, a line appended by something other
+than this class - the queue is read once in full, and the summary starts
+over from that.
+
+SEGMENTS
+--------
+Acknowledgement used to rewrite the whole queue minus what the server had
+confirmed - after every push, against a queue that during an outage holds
+thousands of operations. Instead the queue is split into segment files of
+SEGMENT_SIZE operations each: new ones are appended to the open segment,
+which is sealed - renamed after the highest number in it - once full. What
+the server confirms is appended to an acknowledgement record, and a segment
+is deleted once everything in it is on that record; the record then forgets
+those numbers, so it never holds much more than one segment's worth.
+
+Every step leaves something a reader can make sense of. A crash after the
+record is written but before a segment goes leaves operations that are
+present but acknowledged, which are not sent. A crash after the segment goes
+but before the record forgets leaves numbers in the record that no longer
+refer to anything, which are harmless since numbers never repeat.
 """
 
 import json
@@ -50,6 +80,15 @@ def _highwater_path():
     return os.path.join(sync_client.config_dir(), 'sync_outbox.hw')
 
 
+def _file_stamp(path):
+    """(mtime, size, inode) of `path`, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_mtime_ns, st.st_size, st.st_ino]
+
+
 class OutboxFull(RuntimeError):
     """Raised when the queue has grown past the point of being useful."""
 
@@ -59,31 +98,80 @@ class OutboxFull(RuntimeError):
 # and a push that can never fit in one request into a permanent blockage.
 MAX_PENDING = 20000
 
+# Operations per segment file. Acknowledging a batch reads only the segments
+# it falls into, so this bounds that work; it is comfortably above what one
+# push sends, so a draining queue usually retires a segment per push or two.
+SEGMENT_SIZE = 1000
+
+
+def _rewrite_numbers(path, numbers):
+    """Replaces a record of numbers with one line holding `numbers`."""
+    numbers = sorted(numbers)
+    tmp = path + '.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        if numbers:
+            f.write(json.dumps(numbers) + '\n')
+    try:
+        os.chmod(tmp, 0o600)
+    except OSError:
+        pass
+    os.replace(tmp, path)
+
 
 class Outbox:
     """
     Append-only queue of operations awaiting acknowledgement.
 
-    Reading and writing are cheap enough to do per change: the queue only
-    holds what has not been sent, which under normal use is a handful of
-    lines drained every few minutes.
+    Appending costs the same however long the queue is (see THE SUMMARY
+    above), and so, near enough, does acknowledging (see SEGMENTS); reading
+    it back is proportional to its length, which under normal use is a
+    handful of lines drained every few minutes.
     """
 
-    def __init__(self, path=None, lock_path=None, highwater_path=None):
+    def __init__(self, path=None, lock_path=None, highwater_path=None,
+                 summary_path=None, acked_path=None, offered_path=None):
         self.path = path or outbox_path()
         self.lock_path = lock_path or _lock_path()
         self.highwater_path = highwater_path or _highwater_path()
+        # Beside the queue they describe, so that a caller which passed its
+        # own path gets a summary and an acknowledgement record of its own.
+        self.summary_path = summary_path or os.path.splitext(self.path)[0] + '.summary'
+        self.acked_path = acked_path or os.path.splitext(self.path)[0] + '.acked'
+        self.offered_path = offered_path or os.path.splitext(self.path)[0] + '.offered'
 
-    # -- reading ---------------------------------------------------------
+    # -- the files -------------------------------------------------------
 
-    def pending(self):
+    def _segments(self):
         """
-        Returns the queued operations in the order they were made.
+        Returns the segment files, oldest first, as (highest lc, path).
 
-        Sorted by 'lc' rather than left in file order. The server stamps a
-        batch in the order it receives it and then refuses anything at or
-        below the highest number it has seen from this device - so sending
-        5 before 3 would make 3 look like a repeat and lose it.
+        The open segment - the one appended to, at self.path - comes last,
+        with None for its bound: it takes every number above the sealed ones.
+        """
+        directory = os.path.dirname(self.path) or '.'
+        prefix = os.path.basename(self.path) + '.'
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            names = []
+        sealed = sorted(
+            (int(name[len(prefix):]), os.path.join(directory, name))
+            for name in names
+            if name.startswith(prefix) and name[len(prefix):].isdigit()
+        )
+        return sealed + [(None, self.path)]
+
+    @staticmethod
+    def _segment_of(lc, segments):
+        for bound, path in segments:
+            if bound is None or lc <= bound:
+                return path
+        return None
+
+    @staticmethod
+    def _read_segment(path):
+        """
+        Returns the operations in one segment file, in file order.
 
         A line that will not parse is skipped rather than raising. The queue
         is appended to by several processes and a machine can be switched off
@@ -92,7 +180,7 @@ class Outbox:
         """
         out = []
         try:
-            with open(self.path, 'r', encoding='utf-8') as f:
+            with open(path, 'r', encoding='utf-8') as f:
                 for line in f:
                     line = line.strip()
                     if not line:
@@ -105,11 +193,189 @@ class Outbox:
                         out.append(entry)
         except OSError:
             return []
+        return out
+
+    def _read_acked(self):
+        """
+        Returns the numbers acknowledged but still present in some segment.
+
+        Each drop() adds one line, a JSON list. One cut short by a crash does
+        not parse and is ignored: those operations then simply count as not
+        yet acknowledged, and are sent again - which the server recognises as
+        repeats. Reading part of it as numbers could instead discard an
+        operation the server never saw.
+        """
+        acked = set()
+        try:
+            with open(self.acked_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        numbers = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(numbers, list):
+                        acked.update(n for n in numbers if isinstance(n, int))
+        except OSError:
+            pass
+        return acked
+
+    def _append_acked(self, numbers):
+        with open(self.acked_path, 'a+b') as f:
+            # Starts on a line of its own even after a write that was cut
+            # short, rather than completing that line into something that
+            # parses.
+            lead = b''
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b'\n':
+                    lead = b'\n'
+            f.write(lead + json.dumps(sorted(numbers)).encode('utf-8') + b'\n')
+        try:
+            os.chmod(self.acked_path, 0o600)
+        except OSError:
+            pass
+
+    def _rewrite_acked(self, numbers):
+        _rewrite_numbers(self.acked_path, numbers)
+
+    # -- reading ---------------------------------------------------------
+
+    def pending(self):
+        """
+        Returns the queued operations in the order they were made.
+
+        Sorted by 'lc' rather than left in file order. The server stamps a
+        batch in the order it receives it and then refuses anything at or
+        below the highest number it has seen from this device - so sending
+        5 before 3 would make 3 look like a repeat and lose it.
+        """
+        acked = self._read_acked()
+        out = []
+        for _bound, path in self._segments():
+            out.extend(e for e in self._read_segment(path)
+                       if int(e.get('lc', 0)) not in acked)
         out.sort(key=lambda e: int(e.get('lc', 0)))
         return out
 
     def count(self):
-        return len(self.pending())
+        return self._summary()[0]
+
+    def offered(self):
+        """
+        Returns the queued numbers that have been sent at least once.
+
+        The server may hold any of them already - a push can land and its
+        answer still be lost - so coalesce() must send them again exactly as
+        they were, under their own numbers, for the server to recognise them
+        as repeats.
+
+        Read like the acknowledgement record: one JSON list per line, and a
+        line cut short by a crash ignored. Losing a line here is the one
+        failure that matters, so offer() writes the record before anything
+        is sent, not after.
+        """
+        offered = set()
+        try:
+            with open(self.offered_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        numbers = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    if isinstance(numbers, list):
+                        offered.update(n for n in numbers if isinstance(n, int))
+        except OSError:
+            pass
+        return offered
+
+    def offer(self, lcs):
+        """
+        Records that these operations are about to be sent. Call it before
+        the push, never after: once the request has left, the server may
+        have them whatever becomes of the answer.
+
+        Only numbers not already on the record are added, so a push retried
+        through a long outage does not grow it; drop() takes them off again
+        once they are acknowledged.
+        """
+        numbers = set(int(x) for x in lcs)
+        if not numbers:
+            return
+        os.makedirs(os.path.dirname(self.offered_path) or '.', exist_ok=True)
+        with locked(self.lock_path):
+            fresh = numbers - self.offered()
+            if not fresh:
+                return
+            with open(self.offered_path, 'a+b') as f:
+                lead = b''
+                if f.tell() > 0:
+                    f.seek(-1, os.SEEK_END)
+                    if f.read(1) != b'\n':
+                        lead = b'\n'
+                f.write(lead + json.dumps(sorted(fresh)).encode('utf-8') + b'\n')
+            try:
+                os.chmod(self.offered_path, 0o600)
+            except OSError:
+                pass
+
+    # -- the summary -----------------------------------------------------
+
+    def _stamp(self, segments=None):
+        """What the summary is valid for: the files as they are right now."""
+        segments = self._segments() if segments is None else segments
+        return {
+            'open': _file_stamp(self.path),
+            'sealed': [bound for bound, _path in segments if bound is not None],
+            'acked': _file_stamp(self.acked_path),
+        }
+
+    def _summary(self):
+        """
+        Returns (number of queued operations, highest 'lc' ever queued,
+        number of lines in the open segment).
+
+        From the summary file while it still describes the files as they
+        are; otherwise from the files themselves. Callers that go on to
+        change the queue must hold the lock, or the answer may be stale by
+        then.
+        """
+        segments = self._segments()
+        try:
+            with open(self.summary_path, 'r', encoding='utf-8') as f:
+                summary = json.load(f)
+            if summary['stamp'] == self._stamp(segments):
+                return int(summary['count']), int(summary['max_lc']), int(summary['open'])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        acked = self._read_acked()
+        count = max_lc = open_lines = 0
+        for bound, path in segments:
+            entries = self._read_segment(path)
+            if bound is None:
+                open_lines = len(entries)
+            for entry in entries:
+                lc = int(entry.get('lc', 0))
+                max_lc = max(max_lc, lc)
+                if lc not in acked:
+                    count += 1
+        return count, max_lc, open_lines
+
+    def _write_summary(self, count, max_lc, open_lines):
+        """
+        Records the queue as it is right now. Only ever called under the lock,
+        straight after changing the queue.
+
+        Best effort: should it fail, the stamp left behind no longer matches
+        and the next reader falls back to the queue itself.
+        """
+        tmp = self.summary_path + '.tmp'
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'count': count, 'max_lc': max_lc, 'open': open_lines,
+                           'stamp': self._stamp()}, f)
+            os.replace(tmp, self.summary_path)
+        except OSError:
+            pass
 
     # -- the counter -----------------------------------------------------
 
@@ -132,6 +398,32 @@ class Outbox:
 
     # -- writing ---------------------------------------------------------
 
+    def _write(self, entries, count, max_lc, open_lines):
+        """
+        Appends numbered entries to the open segment, sealing it whenever it
+        is full, and records the summary. Called under the lock.
+
+        Sealing is a rename to the highest number the segment holds, which
+        is why segments never overlap: everything appended afterwards is
+        numbered above it.
+        """
+        start = 0
+        while start < len(entries):
+            if open_lines >= SEGMENT_SIZE:
+                os.replace(self.path, '%s.%010d' % (self.path, max_lc))
+                open_lines = 0
+            chunk = entries[start:start + SEGMENT_SIZE - open_lines]
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(''.join(json.dumps(e, ensure_ascii=False) + '\n' for e in chunk))
+            try:
+                os.chmod(self.path, 0o600)
+            except OSError:
+                pass
+            open_lines += len(chunk)
+            max_lc = chunk[-1]['lc']
+            start += len(chunk)
+        self._write_summary(count + len(entries), max_lc, open_lines)
+
     def append(self, op, **fields):
         """
         Adds one operation to the queue and returns the number it was given.
@@ -145,19 +437,16 @@ class Outbox:
         # path meant that path.
         os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
         with locked(self.lock_path):
-            existing = self.pending()
-            if len(existing) >= MAX_PENDING:
+            count, max_lc, open_lines = self._summary()
+            if count >= MAX_PENDING:
                 raise OutboxFull(
-                    "%d operations are waiting to be sent" % len(existing))
+                    "%d operations are waiting to be sent" % count)
 
             # Read from disk, not from memory, because the next append may
             # well come from a different process - and taken from the
             # high-water mark as well as the queue, because a successful sync
             # empties the queue and the number must not start over.
-            next_lc = max(
-                self._read_highwater(),
-                max((int(e.get('lc', 0)) for e in existing), default=0),
-            ) + 1
+            next_lc = max(self._read_highwater(), max_lc) + 1
 
             entry = {'op': op, 'lc': next_lc}
             entry.update({k: v for k, v in fields.items() if v is not None})
@@ -167,12 +456,7 @@ class Outbox:
             # server only requires them to rise. The reverse order could hand
             # the same number out twice.
             self._write_highwater(next_lc)
-            with open(self.path, 'a', encoding='utf-8') as f:
-                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-            try:
-                os.chmod(self.path, 0o600)
-            except OSError:
-                pass
+            self._write([entry], count, max_lc, open_lines)
         return next_lc
 
     def extend(self, operations, allow_overflow=False):
@@ -202,57 +486,82 @@ class Outbox:
             return []
         os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
         with locked(self.lock_path):
-            existing = self.pending()
-            if not allow_overflow and len(existing) + len(operations) > MAX_PENDING:
+            count, max_lc, open_lines = self._summary()
+            if not allow_overflow and count + len(operations) > MAX_PENDING:
                 raise OutboxFull(
                     "%d operations would exceed the queue limit" % len(operations))
 
-            next_lc = max(
-                self._read_highwater(),
-                max((int(e.get('lc', 0)) for e in existing), default=0),
-            ) + 1
+            next_lc = max(self._read_highwater(), max_lc) + 1
 
-            lines = []
-            numbers = []
+            entries = []
             for offset, op in enumerate(operations):
                 fields = dict(op)
                 name = fields.pop('op')
                 entry = {'op': name, 'lc': next_lc + offset}
                 entry.update({k: v for k, v in fields.items() if v is not None})
-                lines.append(json.dumps(entry, ensure_ascii=False))
-                numbers.append(entry['lc'])
+                entries.append(entry)
 
-            self._write_highwater(numbers[-1])
-            with open(self.path, 'a', encoding='utf-8') as f:
-                f.write('\n'.join(lines) + '\n')
-            try:
-                os.chmod(self.path, 0o600)
-            except OSError:
-                pass
-        return numbers
+            self._write_highwater(entries[-1]['lc'])
+            self._write(entries, count, max_lc, open_lines)
+        return [entry['lc'] for entry in entries]
 
     def drop(self, acknowledged_lcs):
         """
         Removes operations the server has confirmed.
 
-        Rewrites the file rather than truncating it, because acknowledgement
-        does not have to arrive in order: a batch can be partly accepted and
-        partly reported as already known.
+        Acknowledgement does not have to arrive in order: a batch can be
+        partly accepted and partly reported as already known. So nothing is
+        rewritten; the numbers are added to the acknowledgement record, and
+        only the segments they fall into are looked at, to delete those with
+        nothing left unacknowledged (see SEGMENTS).
         """
         done = set(int(x) for x in acknowledged_lcs)
         if not done:
             return 0
         with locked(self.lock_path):
-            keep = [e for e in self.pending() if int(e.get('lc', 0)) not in done]
-            tmp = self.path + '.tmp'
-            with open(tmp, 'w', encoding='utf-8') as f:
-                for entry in keep:
-                    f.write(json.dumps(entry, ensure_ascii=False) + '\n')
-            try:
-                os.chmod(tmp, 0o600)
-            except OSError:
-                pass
-            os.replace(tmp, self.path)
+            count, max_lc, open_lines = self._summary()
+            acked = self._read_acked()
+            fresh = done - acked
+            if not fresh:
+                return len(done)
+            # Recorded first. Until the segments are gone, this record is
+            # what keeps the operations out of the next push.
+            self._append_acked(fresh)
+            acked |= fresh
+
+            # Every segment with anything acknowledged in it, not only those
+            # this call touched: one whose deletion a crash interrupted would
+            # otherwise stay for good. The record is kept short, so this is
+            # rarely more than a segment or two.
+            segments = self._segments()
+            touched = {self._segment_of(lc, segments) for lc in acked}
+            retired = set()
+            for bound, path in segments:
+                if path not in touched:
+                    continue
+                numbers = {int(e.get('lc', 0)) for e in self._read_segment(path)}
+                count -= len(numbers & fresh)
+                if numbers <= acked:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        continue
+                    retired.add(path)
+                    if bound is None:
+                        open_lines = 0
+
+            # A number whose segment is gone can never turn up again, so the
+            # record only has to remember the rest. Done after the deletion:
+            # the other order would, for a moment, bring the operations back.
+            if retired:
+                self._rewrite_acked(
+                    lc for lc in acked if self._segment_of(lc, segments) not in retired)
+            # Acknowledged numbers no longer need to be remembered as sent:
+            # they are never sent again.
+            offered = self.offered()
+            if offered & fresh:
+                _rewrite_numbers(self.offered_path, offered - fresh)
+            self._write_summary(count, max_lc, open_lines)
         return len(done)
 
     def clear(self):
@@ -264,10 +573,18 @@ class Outbox:
         make everything sent afterwards look like a repeat.
         """
         with locked(self.lock_path):
-            try:
-                os.remove(self.path)
-            except OSError:
-                pass
+            # Segments before the record, for the same reason as in drop().
+            for _bound, path in self._segments():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            for path in (self.acked_path, self.offered_path):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._write_summary(0, 0, 0)
 
 
 def default_outbox_if_enabled(config):
@@ -284,3 +601,93 @@ def default_outbox_if_enabled(config):
     if not isinstance(sync_cfg, dict) or not sync_cfg.get('enabled'):
         return None
     return Outbox()
+
+
+# Operations that only write fields, and so can be folded into a later one of
+# the same kind on the same object without changing what either of them does.
+_FIELD_SETTERS = ('task.set', 'project.set')
+
+# How each kind of object is created and deleted.
+_CREATE_OF_DELETE = {'task.delete': 'task.create', 'project.delete': 'project.create'}
+
+
+def coalesce(ops, offered=()):
+    """
+    Folds queued operations together before they are sent.
+
+    Editing a task a few times offline queues a 'task.set' per edit, and
+    every start and stop another 'task.set' and 'project.set' for
+    last_started. Sent as they are, each costs request bytes here and a row
+    in the server's log for good. Two folds, both of which leave any document
+    they are applied to exactly as the originals would (see
+    tests/test_sync_outbox.py, which replays both through apply_ops):
+
+    *Repeated sets.* A 'task.set' or 'project.set' whose object was last
+      named by another set of the same kind is merged into that one: its
+      fields on top of the earlier ones, under its own - the higher - number.
+      Nothing in between named the object, so nothing in between could have
+      read or changed what the earlier set wrote.
+
+    *Created and deleted again.* Everything that named an object from its
+      create up to its delete goes, leaving the delete alone - which still
+      leaves the tombstone it would have left. Only when nothing else referred
+      to the object meanwhile (no task created in that project, no time booked
+      on that task): those would otherwise reach the other machine naming
+      something it never heard of.
+
+    Time entries are left as they are. An 'entry.add' for an entry the server
+    already has - one whose push landed but whose answer was lost - only
+    moves it, so folding a close into it could lose the close.
+
+    Neither fold touches an operation that has been sent before. Its push may
+    have landed with the answer lost, and the server only recognises it as a
+    repeat by its own number: folded into a later set, its fields would go out
+    again as something new, on top of whatever another machine wrote since.
+
+    :param ops: Queued operations, each with its 'lc'.
+    :param offered: Numbers among them already sent at least once
+             (Outbox.offered()); those go out again as they are.
+    :return: (the operations to send, in 'lc' order; {lc sent: [lcs folded
+             into it]}). Once a sent operation is acknowledged, so are the
+             ones folded into it.
+    """
+    offered = set(offered)
+    out = []
+    folded = {}
+    last_named = {}     # uid -> position in `out` of the last op with that uid
+    naming = {}         # uid -> positions in `out` of every op with that uid
+    created = {}        # uid -> True while nothing else has referred to it
+    for op in sorted(ops, key=lambda e: int(e.get('lc', 0))):
+        kind, uid, lc = op.get('op'), op.get('uid'), int(op.get('lc', 0))
+        for parent in (op.get('task'), op.get('project')):
+            if parent in created:
+                created[parent] = False
+
+        previous = last_named.get(uid)
+        if (kind in _FIELD_SETTERS and previous is not None
+                and out[previous].get('op') == kind
+                and int(out[previous]['lc']) not in offered):
+            earlier = out[previous]
+            op = dict(op, f=dict(earlier.get('f') or {}, **(op.get('f') or {})))
+            folded[lc] = folded.pop(int(earlier['lc']), []) + [int(earlier['lc'])]
+            out[previous] = None
+
+        elif kind in _CREATE_OF_DELETE and created.get(uid):
+            gone = []
+            for position in naming.get(uid, ()):
+                if out[position] is not None and int(out[position]['lc']) not in offered:
+                    gone.append(int(out[position]['lc']))
+                    gone.extend(folded.pop(int(out[position]['lc']), []))
+                    out[position] = None
+            if gone:
+                folded[lc] = sorted(gone)
+
+        if kind in _CREATE_OF_DELETE.values() and uid not in naming:
+            created[uid] = True
+        elif kind in _CREATE_OF_DELETE:
+            created.pop(uid, None)
+
+        last_named[uid] = len(out)
+        naming.setdefault(uid, []).append(len(out))
+        out.append(op)
+    return [op for op in out if op is not None], folded